@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from src.utilities import get_abs_path
+from analysis.simulate_yields import (VERSION, Martha, MarthaArray, simulate, simulate_vectorized, summarize,
+                                      get_percentiles, harvest_after_j_weeks, remove_after_infection_or_k_flushes)
+
+BLOCK_KWARGS = {"simulation_mode": "const",
+                "yield_decay_mode": "linear",
+                "bag_weight": 1000.,
+                "max_lifetime_factor": 0.5,
+                "mean_t_colonization": 6.,
+                "mean_t_fruiting": 6.,
+                "p_infection": 0.25}
+
+SIMULATION_KWARGS = {"harvest_strategy": harvest_after_j_weeks,
+                     "harvest_kwargs": {"j": 8},
+                     "remove_strategy": remove_after_infection_or_k_flushes,
+                     "remove_kwargs": {"k": 3},
+                     "block_kwargs": BLOCK_KWARGS}
+
+# problem sizes of the suite, `blocks` are inserted per week
+SIZES = {"small": {"replications": 10, "weeks": 52, "capacity": 40, "blocks": 8},
+         "medium": {"replications": 100, "weeks": 52, "capacity": 40, "blocks": 8},
+         "large": {"replications": 10, "weeks": 52, "capacity": 1000, "blocks": 200}}
+
+
+def remove_every_other_block(block):
+    return block.id % 2 == 0
+
+
+def benchmark_insert_and_remove(martha, capacity, rounds):
+    """Fill `martha` up to its capacity, then repeatedly remove half of the blocks and refill the empty slots."""
+    martha.insert_blocks(capacity)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        martha.remove_blocks(remove_every_other_block)
+        martha.insert_blocks(capacity)
+    elapsed = time.perf_counter() - start
+    # half of the blocks are removed and inserted again every round
+    return {"seconds_per_round": elapsed / rounds, "blocks_per_second": capacity * rounds / elapsed}
+
+
+def benchmark_memory(martha, weeks, blocks):
+    """Track the memory allocated since the creation of `martha` per living block, week by week."""
+    results = []
+    for w in range(weeks):
+        martha.insert_blocks(blocks)
+        martha.harvest_blocks(harvest_after_j_weeks, j=8)
+        martha.remove_blocks(remove_after_infection_or_k_flushes, k=3)
+        martha.pass_time()
+        current, _ = tracemalloc.get_traced_memory()
+        number_of_blocks = np.sum(martha.get_total_number_of_blocks())
+        results.append({"week": w,
+                        "blocks": number_of_blocks,
+                        "bytes_per_block": (current - martha.baseline) / number_of_blocks})
+    return results
+
+
+def get_marthas(capacity):
+    return {"Martha": Martha(capacity=capacity, block_kwargs=BLOCK_KWARGS, rng=np.random.default_rng(0)),
+            "MarthaArray": MarthaArray([np.random.default_rng(0)], slots=capacity, capacity=capacity,
+                                       **BLOCK_KWARGS)}
+
+
+class Stopwatch:
+    """Sums up the time spent inside its `with` blocks."""
+
+    def __init__(self):
+        self.seconds = 0.
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds += time.perf_counter() - self.start
+
+
+def fill_marthas(size):
+    rngs = np.random.default_rng(0).spawn(size["replications"])
+    marthas = [Martha(capacity=size["capacity"], block_kwargs=BLOCK_KWARGS, rng=rng) for rng in rngs]
+    for martha in marthas:
+        martha.insert_blocks(size["capacity"])
+    return marthas
+
+
+def case_simulate(size, stopwatch, engine=simulate):
+    with stopwatch:
+        data = engine(**size, **SIMULATION_KWARGS, seed=0)
+    # every row is the state of one block in one week
+    return len(data)
+
+
+def case_pass_time(size, stopwatch):
+    marthas = fill_marthas(size)
+    block_weeks = 0
+    for _ in range(size["weeks"]):
+        with stopwatch:
+            for martha in marthas:
+                martha.pass_time()
+        block_weeks += sum(martha.get_total_number_of_blocks() for martha in marthas)
+    return block_weeks
+
+
+def case_harvest_and_remove(size, stopwatch):
+    marthas = fill_marthas(size)
+    block_weeks = 0
+    for _ in range(size["weeks"]):
+        for martha in marthas:
+            martha.pass_time()
+        block_weeks += sum(martha.get_total_number_of_blocks() for martha in marthas)
+        with stopwatch:
+            for martha in marthas:
+                martha.harvest_blocks(harvest_after_j_weeks, j=8)
+                martha.remove_blocks(remove_after_infection_or_k_flushes, k=3)
+        for martha in marthas:
+            martha.insert_blocks(size["blocks"])
+    return block_weeks
+
+
+def case_aggregate(size, stopwatch):
+    """The aggregation of `simulate_yields.main`, without plotting."""
+    data = simulate_vectorized(**size, **SIMULATION_KWARGS, seed=0)
+    with stopwatch:
+        get_percentiles(summarize(data))
+    return len(data)
+
+
+CASES = {"simulate": case_simulate,
+         "simulate_vectorized": lambda size, stopwatch: case_simulate(size, stopwatch, engine=simulate_vectorized),
+         "pass_time": case_pass_time,
+         "harvest_and_remove": case_harvest_and_remove,
+         "aggregate": case_aggregate}
+
+
+def run_case(case, size):
+    """Time `case` and trace its peak memory in a second run, tracing slows down the simulation considerably."""
+    stopwatch = Stopwatch()
+    block_weeks = CASES[case](SIZES[size], stopwatch)
+
+    tracemalloc.start()
+    CASES[case](SIZES[size], Stopwatch())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"case": case,
+            "size": size,
+            **SIZES[size],
+            "seconds": stopwatch.seconds,
+            "peak_bytes": peak,
+            "block_weeks_per_second": block_weeks / stopwatch.seconds}
+
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def main_suite(args):
+    results = [run_case(case, size) for size in args.sizes for case in args.cases]
+    print(pd.DataFrame(results).to_string(index=False))
+
+    history = load_history(args.history)
+    history.append({"timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "commit": get_commit(),
+                    "version": VERSION,
+                    "python": platform.python_version(),
+                    "results": results})
+    os.makedirs(os.path.dirname(args.history), exist_ok=True)
+    with open(args.history, "w") as f:
+        json.dump(history, f, indent=2)
+
+
+def main_thresholds(args):
+    """Store the results of a run of the history, multiplied by `factor`, as thresholds.
+
+    Thresholds are absolute wall times and bytes of the machine that ran the suite, they only apply to that machine.
+    Run `set-thresholds` on every machine that runs `compare`, e.g. the Raspberry Pi or a CI runner.
+    """
+    run = load_history(args.history)[args.run]
+    thresholds = {f"{r['case']}/{r['size']}": {"seconds": r["seconds"] * args.factor,
+                                               "peak_bytes": int(r["peak_bytes"] * args.factor)}
+                  for r in run["results"]}
+    with open(args.thresholds, "w") as f:
+        json.dump(thresholds, f, indent=2)
+
+
+def main_compare(args):
+    """Compare a run of the history against the thresholds, exit with 1 if any of them is exceeded.
+
+    The run and the thresholds have to come from the same machine, see `main_thresholds`.
+    """
+    run = load_history(args.history)[args.run]
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+
+    rows = []
+    for r in run["results"]:
+        threshold = thresholds.get(f"{r['case']}/{r['size']}")
+        if threshold is None:
+            continue
+        for metric in "seconds", "peak_bytes":
+            rows.append({"case": r["case"],
+                         "size": r["size"],
+                         "metric": metric,
+                         "value": r[metric],
+                         "threshold": threshold[metric],
+                         "exceeded": r[metric] > threshold[metric]})
+    comparison = pd.DataFrame(rows, columns=["case", "size", "metric", "value", "threshold", "exceeded"])
+    print(f"run of {run['timestamp']} (commit {run['commit']}):")
+    print(comparison.to_string(index=False))
+    if comparison.exceeded.any():
+        sys.exit(1)
+
+
+def main_insert_and_remove(args):
+    results = []
+    for capacity in args.capacities:
+        for name, martha in get_marthas(capacity).items():
+            results.append({"martha": name,
+                            "capacity": capacity,
+                            **benchmark_insert_and_remove(martha, capacity, args.rounds)})
+    print(pd.DataFrame(results).to_string(index=False))
+
+
+def main_memory(args):
+    results = []
+    tracemalloc.start()
+    for name in "Martha", "MarthaArray":
+        baseline, _ = tracemalloc.get_traced_memory()
+        martha = get_marthas(args.capacity)[name]
+        martha.baseline = baseline
+        results.extend({"martha": name, **r} for r in benchmark_memory(martha, args.weeks, args.blocks))
+        del martha
+    tracemalloc.stop()
+    print(pd.DataFrame(results).pivot(index="week", columns="martha", values="bytes_per_block").to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the yield simulation.")
+    subparsers = parser.add_subparsers(required=True)
+
+    insert_and_remove = subparsers.add_parser("insert-remove", help="time inserting and removing blocks.")
+    insert_and_remove.add_argument("--capacities", default=[1_000, 10_000, 100_000], type=int, nargs="+")
+    insert_and_remove.add_argument("--rounds", default=5, type=int)
+    insert_and_remove.set_defaults(func=main_insert_and_remove)
+
+    memory = subparsers.add_parser("memory", help="track bytes per living block over simulated weeks.")
+    memory.add_argument("--capacity", default=10_000, type=int)
+    memory.add_argument("--blocks", default=1_000, type=int)
+    memory.add_argument("--weeks", default=26, type=int)
+    memory.set_defaults(func=main_memory)
+
+    history = argparse.ArgumentParser(add_help=False)
+    # kept next to the thresholds under version control, `make clean` empties `data`
+    history.add_argument("--history", default=get_abs_path("analysis", "benchmarks", "history.json"),
+                         help="json file that keeps the results of all runs of the suite.")
+    thresholds = argparse.ArgumentParser(add_help=False)
+    thresholds.add_argument("--thresholds", default=get_abs_path("analysis", "benchmark_thresholds.json"))
+    thresholds.add_argument("--run", default=-1, type=int, help="index of the run in the history.")
+
+    suite = subparsers.add_parser("suite", parents=[history], help="run the suite and append it to the history.")
+    suite.add_argument("--cases", default=list(CASES.keys()), choices=CASES.keys(), nargs="+")
+    suite.add_argument("--sizes", default=list(SIZES.keys()), choices=SIZES.keys(), nargs="+")
+    suite.set_defaults(func=main_suite)
+
+    set_thresholds = subparsers.add_parser("set-thresholds", parents=[history, thresholds],
+                                           help="derive the thresholds of this machine from a run of the suite.")
+    set_thresholds.add_argument("--factor", default=2., type=float,
+                                help="allowed slowdown and growth of memory relative to the run.")
+    set_thresholds.set_defaults(func=main_thresholds)
+
+    compare = subparsers.add_parser("compare", parents=[history, thresholds],
+                                    help="fail if a run of the suite exceeds the thresholds of the same machine.")
+    compare.set_defaults(func=main_compare)
+
+    ARGS = parser.parse_args()
+    ARGS.func(ARGS)
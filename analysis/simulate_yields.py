@@ -1,33 +1,46 @@
-import matplotlib.pyplot as plt
+import os
+import glob
+import heapq
+import argparse
+from abc import ABC, abstractmethod
 import numpy as np
 import pandas as pd
-import seaborn as sns
 from copy import copy
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from src.utilities import get_abs_path
 from colorama import Style, Fore
-from dataclasses import dataclass
-from tqdm import trange
+from typing import NamedTuple
+from tqdm import tqdm
 
 
-def sample_time(lam, mode):
+# bump whenever a change to the engines alters their results, this invalidates cached results of parameter sweeps
+VERSION = 3
+PHASES = ["COLONIZATION", "FRUITING"]
+
+
+def sample_time(lam, mode, size=None, rng=np.random):
     if mode == "const":
-        return lam
+        return lam if size is None else np.full(size, lam)
     elif mode == "random":
         # avoid blocks that flush immediately (and later on division by zero)
-        return np.random.poisson(lam - 1) + 1
+        return rng.poisson(np.subtract(lam, 1), size=size) + 1
     else:
         raise ValueError(f"{mode} not recognized, select one of {{'const', 'random'}}.")
 
 
-def sample_weight(mean, std=None, mode="const"):
+def sample_weight(mean, std=None, mode="const", size=None, rng=np.random):
     if mode == "const":
-        return mean
+        return mean if size is None else np.full(size, mean)
     elif mode == "random":
-        return np.random.normal(loc=mean, scale=std)
+        # a block can't yield less than nothing
+        return np.maximum(rng.normal(loc=mean, scale=std, size=size), 0)
+    else:
+        raise ValueError(f"{mode} not recognized, select one of {{'const', 'random'}}.")
 
 
-@dataclass
-class BlockRecord:
+class BlockRecord(NamedTuple):
+    """State of a block in one week. A plain tuple, such that recorders can transpose many of them at once."""
     block_id: int
     age: int
     phase: str
@@ -35,17 +48,7 @@ class BlockRecord:
     flush: int
     substrate_weight: float
     fruit_weight: float
-    harvested: float
-
-    def __init__(self, block_id, age, phase, infected, flush, substrate_weight, fruit_weight, harvested=0):
-        self.block_id = block_id
-        self.age = age
-        self.phase = phase
-        self.infected = infected
-        self.flush = flush
-        self.substrate_weight = substrate_weight
-        self.fruit_weight = fruit_weight
-        self.harvested = harvested
+    harvested: float = 0
 
     def __str__(self):
         identifier = f"Block {self.block_id}"
@@ -61,12 +64,15 @@ class BlockRecord:
 
 
 class Block:
-    counter = 0
-
-    def __init__(self, simulation_mode, yield_decay_mode, bag_weight, max_lifetime_factor,
-                 mean_t_colonization, mean_t_fruiting, p_infection):
-        Block.counter += 1
-        self.id = copy(Block.counter)
+    __slots__ = ["id", "rng", "age", "age_at_last_harvest", "infected", "phase", "flush", "substrate_weight",
+                 "fruit_weight", "harvested", "yields", "simulation_mode", "bag_weight", "max_lifetime_factor",
+                 "std_lifetime_factor", "max_lifetime_yield", "yield_decay_mode", "time_to_colonize",
+                 "p_infection_per_week", "time_to_fruit"]
+
+    def __init__(self, block_id, simulation_mode, yield_decay_mode, bag_weight, max_lifetime_factor,
+                 mean_t_colonization, mean_t_fruiting, p_infection, std_lifetime_factor=0.1, rng=np.random):
+        self.id = block_id
+        self.rng = rng
         self.age = 0
         self.age_at_last_harvest = None
         self.infected = False
@@ -79,18 +85,20 @@ class Block:
         self.simulation_mode = simulation_mode
         self.bag_weight = bag_weight
         self.max_lifetime_factor = max_lifetime_factor
+        self.std_lifetime_factor = std_lifetime_factor
         self.max_lifetime_yield = self.max_lifetime_factor * self.bag_weight
         self.yield_decay_mode = yield_decay_mode
-        self.time_to_colonize = sample_time(mean_t_colonization, self.simulation_mode)
+        self.time_to_colonize = sample_time(mean_t_colonization, self.simulation_mode, rng=self.rng)
         self.p_infection_per_week = 1 - (1 - p_infection) ** (1 / self.time_to_colonize)
-        self.time_to_fruit = sample_time(mean_t_fruiting, self.simulation_mode)
-        self.max_lifetime_yield = sample_weight(self.max_lifetime_yield, self.simulation_mode)
+        self.time_to_fruit = sample_time(mean_t_fruiting, self.simulation_mode, rng=self.rng)
+        self.max_lifetime_yield = sample_weight(self.max_lifetime_yield, std=self.std_lifetime_factor * self.bag_weight,
+                                                mode=self.simulation_mode, rng=self.rng)
 
     def __str__(self):
         return f"Block {self.id}"
 
     def __infect(self):
-        if (self.phase == "COLONIZATION") and (np.random.random() <= self.p_infection_per_week):
+        if (self.phase == "COLONIZATION") and (self.rng.random() <= self.p_infection_per_week):
             self.infected = True
 
     def __grow(self):
@@ -152,50 +160,58 @@ class Block:
         self.__grow()
 
     def inspect(self):
-        record = BlockRecord(block_id=self.id,
-                             age=self.age,
-                             phase=self.phase,
-                             infected=self.infected,
-                             flush=self.flush,
-                             substrate_weight=self.substrate_weight,
-                             fruit_weight=self.fruit_weight,
-                             harvested=copy(self.harvested))
+        record = BlockRecord(self.id, self.age, self.phase, self.infected, self.flush, self.substrate_weight,
+                             self.fruit_weight, self.harvested)
         self.harvested = 0
         return record
 
 
 class Martha:
-    counter = 0
-
-    def __init__(self, capacity=None, block_kwargs=None):
+    def __init__(self, capacity=None, block_kwargs=None, martha_id=0, rng=np.random):
         self.capacity = capacity if capacity else np.inf
-        self.contents = []
-        self.id = copy(Martha.counter)
+        # removing a block leaves an empty slot, inserted blocks fill the lowest empty slots first
+        self.slots = []
+        self.free_slots = []
+        self.number_of_blocks = 0
+        self.id = martha_id
+        self.rng = rng
+        # blocks are numbered per Martha, such that replications can run in separate processes
+        self.block_counter = 0
         self.block_kwargs = block_kwargs if block_kwargs else {}
 
     def __str__(self):
         return f"Martha {self.id}"
 
+    @property
+    def contents(self):
+        return [b for b in self.slots if b is not None]
+
     def insert_blocks(self, num_blocks):
-        for _ in range(num_blocks):
-            if self.get_total_number_of_blocks() < self.capacity:
-                block = Block(**self.block_kwargs)
-                self.contents.append(block)
+        for _ in range(int(min(num_blocks, self.capacity - self.number_of_blocks))):
+            self.block_counter += 1
+            block = Block(block_id=self.block_counter, rng=self.rng, **self.block_kwargs)
+            if self.free_slots:
+                self.slots[heapq.heappop(self.free_slots)] = block
+            else:
+                self.slots.append(block)
+            self.number_of_blocks += 1
 
     def harvest_blocks(self, strategy, *args, **kwargs):
         res = [b.harvest() for b in self.contents if strategy(b, *args, **kwargs)]
         return sum(res)
 
     def remove_blocks(self, strategy, *args, **kwargs):
-        for i, b in enumerate(self.contents):
-            if strategy(b, *args, **kwargs):
-                self.contents.pop(i)
+        for i, b in enumerate(self.slots):
+            if b is not None and strategy(b, *args, **kwargs):
+                self.slots[i] = None
+                heapq.heappush(self.free_slots, i)
+                self.number_of_blocks -= 1
 
     def get_total_yield(self):
         return sum(b.fruit_weight for b in self.contents)
 
     def get_total_number_of_blocks(self):
-        return len(self.contents)
+        return self.number_of_blocks
 
     def inspect(self):
         print(f"{self}")
@@ -213,76 +229,496 @@ class Martha:
         status = pd.DataFrame([b.inspect() for b in self.contents])
         return status
 
+    def record_status(self, recorder, **kwargs):
+        recorder.append_records([b.inspect() for b in self.contents], **kwargs)
+
+
+class MarthaArray:
+    """Many Marthas at once: every attribute of `Block` is an array of shape (replications, slots).
+
+    Like `Martha`, inserted blocks fill the lowest empty slots of their row first and all rows get more slots once a row
+    runs out of them. Hence the order of the living blocks in a row always equals the order of `Martha.contents`.
+    Strategies receive the whole array and have to return a boolean mask of that shape. Every row draws from its own
+    generator in the same order as `Martha` does, so both engines produce the same blocks.
+    """
+    phases = np.array(PHASES)
+    state = ["alive", "block_id", "age", "age_at_last_harvest", "infected", "fruiting", "flush", "fruit_weight",
+             "harvested", "time_to_colonize", "time_to_fruit", "max_lifetime_yield", "p_infection_per_week"]
+
+    def __init__(self, rngs, slots, simulation_mode, yield_decay_mode, bag_weight, max_lifetime_factor,
+                 mean_t_colonization, mean_t_fruiting, p_infection, std_lifetime_factor=0.1, capacity=None):
+        replications = len(rngs)
+        shape = (replications, slots)
+        self.rngs = rngs
+        self.capacity = capacity if capacity else np.inf
+        self.simulation_mode = simulation_mode
+        self.yield_decay_mode = yield_decay_mode
+        self.bag_weight = bag_weight
+        self.max_lifetime_factor = max_lifetime_factor
+        self.std_lifetime_factor = std_lifetime_factor
+        self.mean_t_colonization = mean_t_colonization
+        self.mean_t_fruiting = mean_t_fruiting
+        self.p_infection = p_infection
+        self.inserted = np.zeros(replications, dtype=int)
+        self.alive = np.zeros(shape, dtype=bool)
+        self.block_id = np.zeros(shape, dtype=int)
+        self.age = np.zeros(shape, dtype=int)
+        self.age_at_last_harvest = np.zeros(shape, dtype=int)
+        self.infected = np.zeros(shape, dtype=bool)
+        self.fruiting = np.zeros(shape, dtype=bool)
+        self.flush = np.zeros(shape, dtype=int)
+        self.fruit_weight = np.zeros(shape)
+        self.harvested = np.zeros(shape)
+        self.time_to_colonize = np.zeros(shape)
+        self.time_to_fruit = np.zeros(shape)
+        self.max_lifetime_yield = np.zeros(shape)
+        self.p_infection_per_week = np.zeros(shape)
+
+    @property
+    def id(self):
+        return self.block_id
+
+    @property
+    def phase(self):
+        return self.phases[self.fruiting.astype(int)]
+
+    def get_time_since_colonization_or_last_harvest(self):
+        return np.where(self.flush == 0, self.age - self.time_to_colonize, self.age - self.age_at_last_harvest)
+
+    def get_total_number_of_blocks(self):
+        return self.alive.sum(axis=1)
+
+    def __make_room(self, free):
+        missing = (free - (~self.alive).sum(axis=1)).max()
+        if missing > 0:
+            padding = ((0, 0), (0, max(missing, self.alive.shape[1])))
+            for name in self.state:
+                setattr(self, name, np.pad(getattr(self, name), padding))
+
+    def __sample_blocks(self, rng, n):
+        """Time to colonize, time to fruit and max lifetime yield of `n` new blocks, drawn from `rng` like `Block`."""
+        lam = [self.mean_t_colonization, self.mean_t_fruiting]
+        mean, std = self.max_lifetime_factor * self.bag_weight, self.std_lifetime_factor * self.bag_weight
+        if self.simulation_mode == "const":
+            return np.column_stack([sample_time(lam, self.simulation_mode, size=(n, 2), rng=rng),
+                                    sample_weight(mean, std, self.simulation_mode, size=n, rng=rng)])
+        # a `Block` samples both times and then its yield, hence the draws of blocks can't be batched per kind
+        samples = np.empty((n, 3))
+        for i in range(n):
+            samples[i, :2] = sample_time(lam, self.simulation_mode, size=2, rng=rng)
+            samples[i, 2] = sample_weight(mean, std, self.simulation_mode, rng=rng)
+        return samples
+
+    def insert_blocks(self, num_blocks):
+        free = np.clip(self.capacity - self.get_total_number_of_blocks(), 0, num_blocks).astype(int)
+        self.__make_room(free)
+        empty = ~self.alive
+        rank = np.cumsum(empty, axis=1)
+        new = empty & (rank <= free[:, None])
+        samples = np.concatenate([self.__sample_blocks(rng, n) for rng, n in zip(self.rngs, free)])
+        time_to_colonize = samples[:, 0]
+        self.time_to_colonize[new] = time_to_colonize
+        self.p_infection_per_week[new] = 1 - (1 - self.p_infection) ** (1 / time_to_colonize)
+        self.time_to_fruit[new] = samples[:, 1]
+        self.max_lifetime_yield[new] = samples[:, 2]
+        # slots might have been used by blocks that are removed already
+        for name in "age", "age_at_last_harvest", "infected", "fruiting", "flush", "fruit_weight", "harvested":
+            getattr(self, name)[new] = 0
+        self.block_id[new] = (self.inserted[:, None] + rank)[new]
+        self.alive |= new
+        self.inserted += free
+
+    def harvest_blocks(self, strategy, *args, **kwargs):
+        harvest = strategy(self, *args, **kwargs) & self.alive & ~self.infected
+        self.harvested[harvest] = self.fruit_weight[harvest]
+        self.fruit_weight[harvest] = 0
+        self.flush[harvest] += 1
+        self.age_at_last_harvest[harvest] = self.age[harvest]
+        return self.harvested.sum(axis=1, where=harvest)
+
+    def remove_blocks(self, strategy, *args, **kwargs):
+        self.alive &= ~strategy(self, *args, **kwargs)
+
+    def pass_time(self):
+        alive = self.alive
+        self.age += alive
+        self.fruiting |= alive & ~self.infected & (self.age > self.time_to_colonize)
+
+        colonizing = alive & ~self.fruiting
+        draws = np.concatenate([rng.random(n) for rng, n in zip(self.rngs, colonizing.sum(axis=1))])
+        self.infected[colonizing] |= draws <= self.p_infection_per_week[colonizing]
+
+        growing = alive & (self.age > self.time_to_colonize) & (self.flush < 3) & ~self.infected
+        t = self.get_time_since_colonization_or_last_harvest()[growing]
+        flush = self.flush[growing]
+        max_lifetime_yield = self.max_lifetime_yield[growing]
+        time_to_fruit = self.time_to_fruit[growing]
+        if self.yield_decay_mode == "linear":
+            yield_for_flush = np.maximum(3 - flush, 0) / 6 * max_lifetime_yield
+            self.fruit_weight[growing] = np.round(yield_for_flush * np.minimum(t / time_to_fruit, 1))
+        elif self.yield_decay_mode == "exponential":
+            # see `Block.__get_exponential_iteration_growth`
+            yield_for_flush = max_lifetime_yield * 0.54368 ** (flush + 1)
+            rate = (1 / yield_for_flush) ** (1 / time_to_fruit)
+            progress = np.minimum(time_to_fruit, t)
+            self.fruit_weight[growing] = np.round(yield_for_flush - yield_for_flush * rate ** progress)
+
+    def get_status(self):
+        replication, slot = np.nonzero(self.alive)
+        status = {"replication": replication,
+                  "block_id": self.block_id[replication, slot],
+                  "substrate_weight": self.bag_weight,
+                  "age": self.age[replication, slot],
+                  "phase": self.fruiting[replication, slot],
+                  "infected": self.infected[replication, slot],
+                  "flush": self.flush[replication, slot],
+                  "fruit_weight": self.fruit_weight[replication, slot],
+                  "harvested": self.harvested[replication, slot]}
+        self.harvested[self.alive] = 0
+        return status
+
+    def record_status(self, recorder, replication_ids, **kwargs):
+        status = self.get_status()
+        status["replication"] = replication_ids[status["replication"]]
+        recorder.append(**status, **kwargs)
+
 
 def harvest_after_j_weeks(block, j):
-    return block.phase == "FRUITING" and block.get_time_since_colonization_or_last_harvest() >= j
+    return (block.phase == "FRUITING") & (block.get_time_since_colonization_or_last_harvest() >= j)
 
 
 def remove_after_infection_or_k_flushes(block, k):
-    return block.infected or block.flush >= k
+    return block.infected | (block.flush >= k)
+
+
+COL_ORDER = ["replication", "week", "block_id", "substrate_weight", "age",
+             "phase", "infected", "flush", "fruit_weight", "harvested"]
+
+
+class Recorder(ABC):
+    """Receives the weekly block states of one or many Marthas through `Martha.record_status`."""
+
+    @abstractmethod
+    def append(self, **columns):
+        pass
+
+    def append_records(self, records, **kwargs):
+        """Append `BlockRecord`s, or plain tuples in the same field order, as columns."""
+        if not records:
+            return
+        columns = dict(zip(BlockRecord._fields, zip(*records)))
+        codes = {phase: i for i, phase in enumerate(PHASES)}
+        columns["phase"] = [codes[phase] for phase in columns["phase"]]
+        self.append(**columns, **kwargs)
+
+    @abstractmethod
+    def result(self):
+        pass
+
+
+class StatusRecorder(Recorder):
+    """Collects the weekly block states column-wise in preallocated, typed chunks.
+
+    Without a `path` finished chunks are kept in memory. Otherwise every chunk is written to a parquet file in `path`
+    and its buffers are reused, which bounds the memory to a single chunk. Chunks are no larger than `max_rows`, the
+    most rows the recorder can receive, such that small simulations don't allocate a full chunk.
+    """
+    dtypes = {"replication": np.int64,
+              "week": np.int64,
+              "block_id": np.int64,
+              "substrate_weight": np.float64,
+              "age": np.int64,
+              "phase": np.int8,
+              "infected": bool,
+              "flush": np.int64,
+              "fruit_weight": np.float64,
+              "harvested": np.float64}
+
+    def __init__(self, path=None, prefix="part", rows_per_chunk=2 ** 20, max_rows=None):
+        self.path = path
+        self.prefix = prefix
+        self.rows_per_chunk = min(rows_per_chunk, max_rows) if max_rows is not None else rows_per_chunk
+        self.chunks = []
+        self.files = []
+        self.buffers = None
+        self.size = 0
+
+    def append(self, **columns):
+        """Append rows, `phase` holds the index into `PHASES` and scalars are broadcast to all rows."""
+        n = max((np.size(v) for v in columns.values() if np.ndim(v) > 0), default=0)
+        if n == 0:
+            return
+        start = 0
+        while start < n:
+            if self.buffers is None:
+                self.buffers = {k: np.empty(self.rows_per_chunk, dtype=v) for k, v in self.dtypes.items()}
+            stop = min(n, start + self.rows_per_chunk - self.size)
+            for k, buffer in self.buffers.items():
+                value = columns[k]
+                buffer[self.size:self.size + stop - start] = value if np.ndim(value) == 0 else value[start:stop]
+            self.size += stop - start
+            start = stop
+            if self.size == self.rows_per_chunk:
+                self.flush()
+
+    def flush(self):
+        if not self.size:
+            return
+        if self.path is None:
+            # keep full buffers as they are, don't hold on to the unused part of the last one
+            chunk = {k: v if self.size == self.rows_per_chunk else v[:self.size].copy() for k, v in self.buffers.items()}
+            self.chunks.append(chunk)
+            self.buffers = None
+        else:
+            file_name = os.path.join(self.path, f"{self.prefix}-{len(self.files):05d}.parquet")
+            to_frame({k: v[:self.size] for k, v in self.buffers.items()}).to_parquet(file_name, index=False)
+            self.files.append(file_name)
+        self.size = 0
+
+    def result(self):
+        """All recorded rows as a single data frame, or the written chunks if the recorder streams to disk."""
+        self.flush()
+        if self.path is not None:
+            return StatusChunks(self.path)
+        columns = {k: np.concatenate([c[k] for c in self.chunks]) if self.chunks else np.empty(0, dtype=v)
+                   for k, v in self.dtypes.items()}
+        self.chunks = []
+        return to_frame(columns)
+
+
+class SummaryRecorder(Recorder):
+    """Sums up harvests and blocks per replication and week while the simulation runs.
+
+    Only the summaries are kept, i.e. the memory is O(replications x weeks) instead of O(block-weeks). The result has
+    the same layout as `summarize` applied to the full block states, weeks without living blocks have no row.
+    """
+
+    def __init__(self, replication_ids, weeks):
+        self.replication_ids = np.asarray(replication_ids)
+        shape = (len(self.replication_ids), weeks)
+        self.harvested = np.zeros(shape)
+        self.fruit_weight = np.zeros(shape)
+        self.number_of_blocks = np.zeros(shape, dtype=np.int64)
+        self.number_of_infected_blocks = np.zeros(shape, dtype=np.int64)
+
+    def append(self, replication, week, harvested, fruit_weight, infected, **columns):
+        """Append the blocks of a single week."""
+        n = len(self.replication_ids)
+        rows = np.broadcast_to(np.asarray(replication) - self.replication_ids[0], np.shape(infected))
+        self.harvested[:, week] += np.bincount(rows, weights=harvested, minlength=n)
+        self.fruit_weight[:, week] += np.bincount(rows, weights=fruit_weight, minlength=n)
+        self.number_of_blocks[:, week] += np.bincount(rows, minlength=n)
+        self.number_of_infected_blocks[:, week] += np.bincount(rows, weights=infected, minlength=n).astype(np.int64)
+
+    def result(self):
+        replications, weeks = self.harvested.shape
+        out = pd.DataFrame({"replication": np.repeat(self.replication_ids, weeks),
+                            "week": np.tile(np.arange(weeks), replications),
+                            "harvested": self.harvested.ravel(),
+                            "fruit_weight": self.fruit_weight.ravel(),
+                            "number_of_blocks": self.number_of_blocks.ravel(),
+                            "number_of_infected_blocks": self.number_of_infected_blocks.ravel()})
+        # like the groupby of `summarize`, which has no blocks to group in such weeks
+        return out.loc[out.number_of_blocks > 0].reset_index(drop=True)
+
+
+class StatusChunks:
+    """Re-iterable collection of the chunks `StatusRecorder`s wrote to `path`."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        for file_name in sorted(glob.glob(os.path.join(self.path, "*.parquet"))):
+            yield pd.read_parquet(file_name)
+
+    def to_frame(self):
+        return pd.concat(self, ignore_index=True)
+
+
+def to_frame(columns):
+    return (pd.DataFrame(columns)
+            .assign(phase=lambda x: pd.Categorical.from_codes(x.phase, categories=PHASES))
+            .loc[:, COL_ORDER])
+
+
+def summarize(data):
+    """Sum up harvests and blocks per replication and week, `data` is a frame or an iterable of chunks of one."""
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    # every block shows up once per week, hence the unique blocks of a week can be summed up over chunks
+    sums = [chunk
+            .groupby(["replication", "week"])
+            .agg({"harvested": "sum", "fruit_weight": "sum", "block_id": "nunique", "infected": "sum"})
+            for chunk in chunks]
+    out = (pd.concat(sums)
+           .groupby(level=["replication", "week"])
+           .sum()
+           .rename(columns={"block_id": "number_of_blocks",
+                            "infected": "number_of_infected_blocks"})
+           .reset_index())
+    return out
+
+
+def get_percentiles(summary, q=(0.05, 0.25, 0.5, 0.75, 0.95)):
+    """Percentiles of the weekly summaries over all replications."""
+    return (summary
+            .drop(columns="replication")
+            .groupby("week")
+            .quantile(q)
+            .rename_axis(index=["week", "percentile"])
+            .reset_index())
+
+
+def get_max_rows(replications, capacity, weeks, blocks):
+    """The most block states `replications` can record, every week holds at most `capacity` or all inserted blocks."""
+    blocks_per_week = blocks * weeks if capacity is None else min(capacity, blocks * weeks)
+    return max(replications * weeks * blocks_per_week, 1)
+
+
+def make_recorder(replication_ids, weeks, path=None, rows_per_chunk=2 ** 20, summary_only=False, max_rows=None):
+    if summary_only:
+        return SummaryRecorder(replication_ids, weeks)
+    return StatusRecorder(path, prefix=f"part-{replication_ids[0]:06d}", rows_per_chunk=rows_per_chunk,
+                          max_rows=max_rows)
+
+
+def run_replications(simulate_chunk, replications, chunksize, seed=None, workers=1, path=None):
+    """Run `simulate_chunk` on consecutive chunks of replications, in a process pool if `workers` > 1.
+
+    Every replication draws from its own generator spawned from `seed`, hence the result does not depend on the number
+    of workers. Chunks are merged in replication order. If `path` is given, the chunks stream their results to parquet
+    files in that directory and the files are returned instead of a data frame.
+    """
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+        for file_name in glob.glob(os.path.join(path, "*.parquet")):
+            os.remove(file_name)
+
+    seeds = np.random.SeedSequence(seed).spawn(replications)
+    chunks = [(range(i, min(i + chunksize, replications)), seeds[i:i + chunksize])
+              for i in range(0, replications, chunksize)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            out = list(tqdm(executor.map(simulate_chunk, *zip(*chunks)), total=len(chunks), ncols=80))
+    else:
+        out = [simulate_chunk(*chunk) for chunk in tqdm(chunks, ncols=80)]
 
+    if path is not None:
+        return StatusChunks(path)
+    return pd.concat(out, ignore_index=True)
 
-def simulate(replications, capacity, weeks, blocks, harvest_strategy, harvest_kwargs, remove_strategy, remove_kwargs,
-             block_kwargs=None):
-    out = []
-    block_kwargs = block_kwargs if block_kwargs else {}
-    for i in trange(replications, ncols=80):
-        martha = Martha(capacity=capacity, block_kwargs=block_kwargs)
+
+def simulate_marthas(replication_ids, seeds, capacity, weeks, blocks, harvest_strategy, harvest_kwargs,
+                     remove_strategy, remove_kwargs, block_kwargs, path=None, rows_per_chunk=2 ** 20,
+                     summary_only=False):
+    recorder = make_recorder(replication_ids, weeks, path, rows_per_chunk, summary_only,
+                             max_rows=get_max_rows(len(replication_ids), capacity, weeks, blocks))
+    for i, seed in zip(replication_ids, seeds):
+        martha = Martha(capacity=capacity, block_kwargs=block_kwargs, martha_id=i, rng=np.random.default_rng(seed))
         for w in range(weeks):
             martha.insert_blocks(blocks)
             martha.harvest_blocks(harvest_strategy, **harvest_kwargs)
-
-            status = (martha
-                      .get_status()
-                      .assign(replication=i,
-                              week=w))
-            out.append(status)
+            martha.record_status(recorder, replication=i, week=w)
             martha.remove_blocks(remove_strategy, **remove_kwargs)
             martha.pass_time()
-    col_order = ["replication", "week", "block_id", "substrate_weight", "age",
-                 "phase", "infected", "flush", "fruit_weight", "harvested"]
-    return pd.concat(out).loc[:, col_order]
+    return recorder.result()
+
+
+def simulate_martha_array(replication_ids, seeds, capacity, weeks, blocks, harvest_strategy, harvest_kwargs,
+                          remove_strategy, remove_kwargs, block_kwargs, path=None, rows_per_chunk=2 ** 20,
+                          summary_only=False):
+    recorder = make_recorder(replication_ids, weeks, path, rows_per_chunk, summary_only,
+                             max_rows=get_max_rows(len(replication_ids), capacity, weeks, blocks))
+    marthas = MarthaArray([np.random.default_rng(seed) for seed in seeds], slots=4 * blocks, capacity=capacity,
+                          **block_kwargs)
+    for w in range(weeks):
+        marthas.insert_blocks(blocks)
+        marthas.harvest_blocks(harvest_strategy, **harvest_kwargs)
+        marthas.record_status(recorder, replication_ids=np.asarray(replication_ids), week=w)
+        marthas.remove_blocks(remove_strategy, **remove_kwargs)
+        marthas.pass_time()
+
+    data = recorder.result()
+    if path is None and not summary_only:
+        # same ordering as `simulate_marthas`, which runs one replication after the other
+        data = data.sort_values(["replication", "week"], kind="stable", ignore_index=True)
+    return data
 
 
-def main(args):
+def simulate(replications, capacity, weeks, blocks, harvest_strategy, harvest_kwargs, remove_strategy, remove_kwargs,
+             block_kwargs=None, seed=None, workers=1, path=None, rows_per_chunk=2 ** 20, summary_only=False):
+    simulate_chunk = partial(simulate_marthas, capacity=capacity, weeks=weeks, blocks=blocks,
+                             harvest_strategy=harvest_strategy, harvest_kwargs=harvest_kwargs,
+                             remove_strategy=remove_strategy, remove_kwargs=remove_kwargs,
+                             block_kwargs=block_kwargs if block_kwargs else {},
+                             path=path, rows_per_chunk=rows_per_chunk, summary_only=summary_only)
+    path = None if summary_only else path
+    return run_replications(simulate_chunk, replications, chunksize=1, seed=seed, workers=workers, path=path)
+
+
+def simulate_vectorized(replications, capacity, weeks, blocks, harvest_strategy, harvest_kwargs, remove_strategy,
+                        remove_kwargs, block_kwargs=None, seed=None, workers=1, path=None, rows_per_chunk=2 ** 20,
+                        summary_only=False):
+    simulate_chunk = partial(simulate_martha_array, capacity=capacity, weeks=weeks, blocks=blocks,
+                             harvest_strategy=harvest_strategy, harvest_kwargs=harvest_kwargs,
+                             remove_strategy=remove_strategy, remove_kwargs=remove_kwargs,
+                             block_kwargs=block_kwargs if block_kwargs else {},
+                             path=path, rows_per_chunk=rows_per_chunk, summary_only=summary_only)
+    path = None if summary_only else path
+    # one chunk per worker, the array engine is cheap per replication but has a fixed cost per week
+    chunksize = max(-(-replications // max(workers, 1)), 1)
+    return run_replications(simulate_chunk, replications, chunksize=chunksize, seed=seed, workers=workers, path=path)
+
+
+ENGINES = {"object": simulate, "vectorized": simulate_vectorized}
+
+
+def run(args, path=None):
     block_kwargs = {
         "simulation_mode": args.simulation_mode,
         "yield_decay_mode": args.yield_decay_mode,
         "bag_weight": args.bag_weight,
         "max_lifetime_factor": args.max_lifetime_factor,
+        "std_lifetime_factor": args.std_lifetime_factor,
         "mean_t_colonization": args.mean_t_colonization,
         "mean_t_fruiting": args.mean_t_fruiting,
         "p_infection": args.p_infection}
 
-    data = simulate(replications=args.replications,
-                    capacity=args.capacity,
-                    weeks=args.weeks,
-                    blocks=args.blocks,
-                    harvest_strategy=harvest_after_j_weeks, harvest_kwargs= {"j": args.grow_time},
-                    remove_strategy=remove_after_infection_or_k_flushes, remove_kwargs={"k": args.remove_after_flush},
-                    block_kwargs=block_kwargs)
-
-    harvests = (data
-                .groupby(["replication", "week"])
-                .agg({"harvested": "sum", "fruit_weight": "sum"})
-                .reset_index())
-
-    blocks = (data
-              .groupby(["replication", "week"])
-              .agg({"block_id": "nunique", "infected": "sum"})
-              .rename(columns={"block_id": "number_of_blocks",
-                               "infected": "number_of_infected_blocks"})
-              .reset_index())
-
-    p_harvest = sns.violinplot(data=harvests, x="week", y="harvested")
+    engine = ENGINES[args.engine]
+    data = engine(replications=args.replications,
+                  capacity=args.capacity,
+                  weeks=args.weeks,
+                  blocks=args.blocks,
+                  harvest_strategy=harvest_after_j_weeks, harvest_kwargs= {"j": args.grow_time},
+                  remove_strategy=remove_after_infection_or_k_flushes, remove_kwargs={"k": args.remove_after_flush},
+                  block_kwargs=block_kwargs,
+                  seed=args.seed,
+                  workers=args.workers,
+                  path=path,
+                  rows_per_chunk=args.rows_per_chunk,
+                  summary_only=args.summary_only)
+    return data
+
+
+def main(args):
+    # plotting libraries are only needed here, the sweeps, benchmarks and worker processes import the module without
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # stream the block states to disk instead of keeping them in memory
+    data = run(args, path=get_abs_path("data", args.outfile) if args.outfile else None)
+    summary = data if args.summary_only else summarize(data)
+
+    p_harvest = sns.violinplot(data=summary, x="week", y="harvested")
     plt.show()
-    p_block_total = sns.violinplot(data=blocks, x="week", y="number_of_blocks")
+    p_block_total = sns.violinplot(data=summary, x="week", y="number_of_blocks")
     plt.show()
-    p_block_infected = sns.violinplot(data=blocks, x="week", y="number_of_infected_blocks")
+    p_block_infected = sns.violinplot(data=summary, x="week", y="number_of_infected_blocks")
     plt.show()
 
     if args.outfile:
-        data.to_csv(get_abs_path("data", f"{args.outfile}.csv"))
+        summary.to_csv(get_abs_path("data", f"{args.outfile}_summary.csv"), index=False)
+        get_percentiles(summary).to_csv(get_abs_path("data", f"{args.outfile}_percentiles.csv"), index=False)
         p_harvest.figure.savefig(get_abs_path("analysis", "figures", f"{args.outfile}_harvest.png"))
         p_block_total.figure.savefig(get_abs_path("analysis", "figures", f"{args.outfile}_blocks_total.png"))
         p_block_infected.figure.savefig(get_abs_path("analysis", "figures", f"{args.outfile}_blocks_infected.png"))
@@ -292,13 +728,13 @@ def main(args):
 # todo: add visualizations
 
 
-if __name__ == "__main__":
-    import argparse
+def get_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument("--simulation-mode", default="const")
     parser.add_argument("--yield-decay-mode", default="linear")
     parser.add_argument("--bag-weight", default=1000, type=float)
     parser.add_argument("--max-lifetime-factor", default=0.5, type=float)
+    parser.add_argument("--std-lifetime-factor", default=0.1, type=float)
     parser.add_argument("--mean-t-colonization", default=6, type=float)
     parser.add_argument("--mean-t-fruiting", default=6, type=float)
     parser.add_argument("--p-infection", default=0.25, type=float)
@@ -309,6 +745,15 @@ if __name__ == "__main__":
     parser.add_argument("--grow-time", default=8, type=int)
     parser.add_argument("--remove-after-flush", default=3, type=int)
     parser.add_argument("--outfile", default=None)
+    parser.add_argument("--engine", default="object", choices=ENGINES.keys())
+    parser.add_argument("--seed", default=None, type=int)
+    parser.add_argument("--workers", default=1, type=int)
+    parser.add_argument("--rows-per-chunk", default=2 ** 20, type=int)
+    parser.add_argument("--summary-only", action="store_true",
+                        help="only keep the weekly summaries per replication, not the state of every block.")
+    return parser
+
 
-    ARGS = parser.parse_args()
-    main(ARGS)
\ No newline at end of file
+if __name__ == "__main__":
+    ARGS = get_parser().parse_args()
+    main(ARGS)
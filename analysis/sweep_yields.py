@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+import argparse
+import itertools
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+from src.utilities import get_abs_path
+from analysis.simulate_yields import VERSION, get_parser, run
+
+# arguments that only change how a setting is computed or stored, not its result
+IGNORED = ["outfile", "workers", "rows_per_chunk", "summary_only"]
+
+
+class ResultCache:
+    """Summaries of simulated settings, stored as parquet files named after the hash of the setting.
+
+    The hash covers every parameter, the seed, the engine and the `VERSION` of the engines. Once the files exceed
+    `max_bytes`, the least recently used ones are removed.
+    """
+
+    def __init__(self, path, max_bytes=2 ** 29):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def get_key(setting):
+        payload = json.dumps({"setting": setting, "version": VERSION}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _get_file_name(self, setting):
+        return os.path.join(self.path, f"{self.get_key(setting)}.parquet")
+
+    def __contains__(self, setting):
+        return os.path.exists(self._get_file_name(setting))
+
+    def get(self, setting):
+        file_name = self._get_file_name(setting)
+        try:
+            summary = pd.read_parquet(file_name)
+        except FileNotFoundError:
+            return None
+        # mark as recently used
+        os.utime(file_name)
+        return summary
+
+    def put(self, setting, summary):
+        file_name = self._get_file_name(setting)
+        # write to a temporary file first, such that concurrent sweeps never read half written files
+        summary.to_parquet(f"{file_name}.tmp", index=False)
+        os.replace(f"{file_name}.tmp", file_name)
+        self.evict()
+
+    def get_size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.path) if entry.name.endswith(".parquet"))
+
+    def evict(self):
+        entries = [entry for entry in os.scandir(self.path) if entry.name.endswith(".parquet")]
+        total = 0
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime, reverse=True):
+            total += entry.stat().st_size
+            if total > self.max_bytes:
+                os.remove(entry.path)
+
+
+def get_setting(**params):
+    """Complete `params` with the defaults of `simulate_yields.py` and bring the values to their proper types."""
+    argv = []
+    for key, value in params.items():
+        if value is not None:
+            argv.extend([f"--{key.replace('_', '-')}", str(value)])
+    setting = {k: v for k, v in vars(get_parser().parse_args(argv)).items() if k not in IGNORED}
+    if setting["seed"] is None:
+        raise ValueError("settings of a sweep need a seed, otherwise their results can't be cached.")
+    return setting
+
+
+def expand_grid(grid, settings=None):
+    """Combine every setting in `settings` with every combination of the values in `grid`."""
+    settings = settings if settings else [{}]
+    keys = list(grid.keys())
+    return [get_setting(**{**setting, **dict(zip(keys, values))})
+            for setting in settings
+            for values in itertools.product(*grid.values())]
+
+
+def simulate_setting(setting):
+    args = argparse.Namespace(**setting, outfile=None, workers=1, rows_per_chunk=2 ** 20, summary_only=True)
+    return run(args)
+
+
+def describe(summary):
+    per_replication = (summary
+                       .groupby("replication")
+                       .agg({"harvested": "sum", "number_of_blocks": "mean", "number_of_infected_blocks": "mean"}))
+    return {"harvested_mean": per_replication.harvested.mean(),
+            "harvested_std": per_replication.harvested.std(),
+            "harvested_p05": per_replication.harvested.quantile(0.05),
+            "harvested_p95": per_replication.harvested.quantile(0.95),
+            "number_of_blocks_mean": per_replication.number_of_blocks.mean(),
+            "number_of_infected_blocks_mean": per_replication.number_of_infected_blocks.mean()}
+
+
+def sweep(settings, cache, workers=1):
+    """Simulate every setting that is not cached yet and describe the results of all settings in one table."""
+    results = {}
+    missing = []
+    for setting in settings:
+        key = cache.get_key(setting)
+        if key in results:
+            continue
+        summary = cache.get(setting)
+        if summary is None:
+            missing.append(setting)
+        results[key] = summary
+    print(f"{len(results) - len(missing)} of {len(results)} setting(s) cached, simulating {len(missing)}.")
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            summaries = executor.map(simulate_setting, missing)
+            for setting, summary in zip(missing, tqdm(summaries, total=len(missing), ncols=80)):
+                cache.put(setting, summary)
+                results[cache.get_key(setting)] = summary
+    else:
+        for setting in tqdm(missing, ncols=80):
+            summary = simulate_setting(setting)
+            cache.put(setting, summary)
+            results[cache.get_key(setting)] = summary
+
+    return pd.DataFrame([{**setting, **describe(results[cache.get_key(setting)])} for setting in settings])
+
+
+def parse_grid(entries):
+    grid = {}
+    for entry in entries:
+        key, values = entry.split("=", 1)
+        grid[key.replace("-", "_")] = values.split(",")
+    return grid
+
+
+def main(args):
+    settings = [{}]
+    if args.settings:
+        with open(args.settings) as f:
+            settings = json.load(f)
+    settings = [{"seed": args.seed, **setting} for setting in settings]
+    settings = expand_grid(parse_grid(args.grid), settings)
+    cache = ResultCache(args.cache_dir, max_bytes=args.cache_size * 2 ** 20)
+    table = sweep(settings, cache, workers=args.workers)
+    print(table.to_string())
+    if args.outfile:
+        table.to_csv(get_abs_path("data", f"{args.outfile}.csv"), index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate yields for a grid of parameters.")
+    parser.add_argument("--grid", action="append", default=[],
+                        help="values of a parameter of `simulate_yields.py`, e.g. `--grid capacity=20,40`.")
+    parser.add_argument("--settings", default=None,
+                        help="json file with a list of parameter sets, every one of them is combined with the grid.")
+    parser.add_argument("--seed", default=0, type=int, help="seed of all settings that don't specify their own.")
+    parser.add_argument("--workers", default=1, type=int)
+    parser.add_argument("--cache-dir", default=get_abs_path("data", "sweeps"))
+    parser.add_argument("--cache-size", default=512, type=int, help="maximum size of the cache in MB.")
+    parser.add_argument("--outfile", default=None)
+
+    ARGS = parser.parse_args()
+    main(ARGS)
@@ -21,15 +21,24 @@ create table raw_sensor_readings (
     imported_at timestamp default now(),
     updated_at timestamp default imported_at,
     site varchar,
-    taken_at date,
+    taken_at timestamp,
     sensor varchar,
     variable varchar,
     unit varchar,
     value float
 );
 
+create index raw_sensor_readings_site_variable_taken_at on raw_sensor_readings (site, variable, taken_at);
+
 create trigger update_raw_sensor_readings_update_timestamp before update on raw_sensor_readings for each row execute procedure update_modified_column();
 
+-- number of bytes of every local file of readings that have been synced to raw_sensor_readings
+create table sync_offsets (
+    updated_at timestamp default now(),
+    source varchar primary key,
+    synced_bytes bigint
+);
+
 create table raw_experiments (
     created_at timestamp default now(),
     updated_at timestamp default created_at,
@@ -0,0 +1,19 @@
+-- keep the time of day of readings, rows loaded before only know their date and stay at midnight
+-- the column is only altered while it is a date, altering a timestamp would rewrite the whole table again
+do $$
+begin
+    if exists (select 1 from information_schema.columns
+               where table_schema = current_schema() and table_name = 'raw_sensor_readings'
+                     and column_name = 'taken_at' and data_type = 'date') then
+        alter table raw_sensor_readings alter column taken_at type timestamp using taken_at::timestamp;
+    end if;
+end
+$$;
+
+create index if not exists raw_sensor_readings_site_variable_taken_at on raw_sensor_readings (site, variable, taken_at);
+
+create table if not exists sync_offsets (
+    updated_at timestamp default now(),
+    source varchar primary key,
+    synced_bytes bigint
+);
@@ -0,0 +1,7 @@
+select site, taken_at, sensor, variable, unit, value
+from {table}
+where (%(start)s::timestamp is null or taken_at >= %(start)s::timestamp)
+    and (%(end)s::timestamp is null or taken_at < %(end)s::timestamp)
+    and (%(site)s::varchar is null or site = %(site)s::varchar)
+    and (%(variable)s::varchar is null or variable = %(variable)s::varchar)
+order by taken_at
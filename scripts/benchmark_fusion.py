@@ -0,0 +1,54 @@
+import timeit
+import argparse
+import pandas as pd
+from src.components import Sensor, SensorArray
+
+VARIABLES = ["temperature", "humidity", "co2"]
+
+
+class FakeDevice:
+    temperature = 21.
+    humidity = 80.
+    co2 = 800.
+
+
+class FakeSensor(Sensor):
+    def __init__(self):
+        super(FakeSensor, self).__init__(site="benchmark", interval=3600)
+        self.var2unit = {var: "unit" for var in VARIABLES}
+        self.device = FakeDevice()
+
+
+def read_merged(sensor_array, weights, var):
+    """`SensorArray.read` before `SensorFusion`: a frame of the cached readings merged with a frame of weights."""
+    readings = pd.DataFrame([{"sensor": sensor.__class__.__name__, "variable": var,
+                              "value": sensor_array.get_cached(i, var)}
+                             for i, sensor in enumerate(sensor_array.sensors)])
+    merged = readings.merge(weights)
+    return merged.loc[merged.weight > 0].value.mean()
+
+
+def main(args):
+    sensor_array = SensorArray([FakeSensor() for _ in range(args.sensors)])
+    # every read is answered from the cache, as it is while `read_all` runs
+    sensor_array.take_sensor_readings()
+    weights = pd.DataFrame({"sensor": "FakeSensor", "variable": VARIABLES, "weight": 1})
+
+    results = []
+    for name, read in ("merge", lambda: read_merged(sensor_array, weights, "co2")), \
+                      ("fusion", lambda: sensor_array.read("co2")):
+        seconds = min(timeit.repeat(read, number=args.number, repeat=5)) / args.number
+        results.append({"path": name, "sensors": args.sensors, "microseconds_per_read": seconds * 1e6})
+    results = pd.DataFrame(results)
+    results["speedup"] = results.microseconds_per_read.iloc[0] / results.microseconds_per_read
+    print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the fusion of readings in `SensorArray.read` with the "
+                                                 "merge of frames it replaced.")
+    parser.add_argument("--sensors", default=4, type=int)
+    parser.add_argument("--number", default=1000, type=int, help="reads per repetition.")
+
+    ARGS = parser.parse_args()
+    main(ARGS)
@@ -0,0 +1,52 @@
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import pandas as pd
+from src.utilities import get_abs_path
+
+# drivers that only import on the Raspberry Pi, none of them may be imported by importing a module alone
+HARDWARE_MODULES = ["board", "busio", "RPi", "sysv_ipc", "adafruit_bh1750", "adafruit_bmp280", "adafruit_dht",
+                    "adafruit_scd30"]
+MODULES = ["src.utilities", "src.storage", "src.components", "src.database", "analysis.simulate_yields",
+           "analysis.sweep_yields", "scripts.make_recipe"]
+
+SNIPPET = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                   "hardware": [m for m in {hardware} if m in sys.modules]}}))
+"""
+
+
+def time_import(module, runs=5):
+    """Import `module` in `runs` fresh interpreters, return the median time and the hardware modules it imported."""
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", SNIPPET.format(module=module, hardware=HARDWARE_MODULES)],
+                             capture_output=True, text=True, check=True, cwd=get_abs_path())
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {"module": module,
+            "seconds": statistics.median(r["seconds"] for r in results),
+            "hardware": ",".join(results[0]["hardware"])}
+
+
+def main(args):
+    results = pd.DataFrame([time_import(module, args.runs) for module in args.modules])
+    print(results.to_string(index=False))
+    failed = (results.hardware != "") | (results.seconds > args.max_seconds)
+    if failed.any():
+        print(f"{failed.sum()} module(s) import hardware drivers or take longer than {args.max_seconds} seconds.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the import of modules that have to work without hardware.")
+    parser.add_argument("--modules", default=MODULES, nargs="+")
+    parser.add_argument("--runs", default=5, type=int)
+    parser.add_argument("--max-seconds", default=2., type=float)
+
+    ARGS = parser.parse_args()
+    main(ARGS)
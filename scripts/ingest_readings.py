@@ -0,0 +1,26 @@
+import argparse
+from src.utilities import get_abs_path, CONFIG
+from src.database import Ingestor, ingest_file
+
+
+def main(args):
+    ingestor = Ingestor(table=args.table, retries=args.retries)
+    rows = ingest_file(args.path, start=args.start, end=args.end, batch_size=args.batch_size, ingestor=ingestor)
+    print(f"loaded {rows} reading(s) from {args.path} into {args.table}.")
+    spooled = ingestor.get_spooled()
+    if spooled:
+        print(f"{len(spooled)} batch(es) are waiting in {ingestor.spool_dir}, they are loaded with the next run.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load readings from a csv file or partitioned storage into the database.")
+    parser.add_argument("--path", default=get_abs_path("data", CONFIG.get("GENERAL", "env_data_file_name",
+                                                                           fallback="readings.csv")))
+    parser.add_argument("--table", default="raw_sensor_readings")
+    parser.add_argument("--start", default=None, help="only load readings taken at or after this time.")
+    parser.add_argument("--end", default=None, help="only load readings taken at or before this time.")
+    parser.add_argument("--batch-size", default=10_000, type=int)
+    parser.add_argument("--retries", default=3, type=int)
+
+    ARGS = parser.parse_args()
+    main(ARGS)
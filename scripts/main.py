@@ -6,8 +6,9 @@ import threading
 import pandas as pd
 from datetime import datetime
 from colorama import Fore, Style
-from src.utilities import get_abs_path, CONFIG, interrupt_handler, get_logger, LOG_LEVELS
-from src.components import Relay, Controller, setup_sensors, SensorArray, write_readings
+from src.utilities import get_abs_path, CONFIG, interrupt_handler, get_logger, LOG_LEVELS, EXIT_EVENT
+from src.components import (Relay, Controller, Scheduler, setup_sensors, get_fusion_weights, SensorArray,
+                            write_readings)
 
 
 def random_time_estimator(var, target, increases=True, margin=0.1, unit="seconds", file_name=None, **kwargs):
@@ -68,63 +69,69 @@ def _convert_time_argument(x, unit):
         return x
 
 
-def control(var, relays, active_low, delay, active_min, active_max, unit, estimation_strategy,
-            increases=None, target=None, margin=None, file_name=None):
-    logging.info(f"start controlling {var}")
-    if margin:
-        logging.info(f"try to keep at {target} +/- {margin * 100:.2f}%.")
-
-    relays = [Relay(pin, active_low=active_low) for pin in relays]
-    controller = Controller(relays,
-                            active_min=_convert_time_argument(active_min, unit),
-                            active_max=_convert_time_argument(active_max, unit),
-                            delay=_convert_time_argument(delay, unit))
-    controller.run(estimation_strategy=estimation_strategy,
-                   var=var,
-                   target=target,
-                   increases=increases,
-                   margin=margin,
-                   unit=unit,
-                   active_min=active_min,
-                   active_max=active_max,
-                   delay=delay,
-                   file_name=get_abs_path("data", file_name))
+def get_limits(config):
+    # limits of the controller in seconds
+    unit = config["unit"]
+    return {"active_min": _convert_time_argument(config["active_min"], unit),
+            "active_max": _convert_time_argument(config["active_max"], unit),
+            "delay": _convert_time_argument(config["delay"], unit)}
 
 
-def read_all_sensors():
-    SENSOR_ARRAY.read_all()
+def get_strategy_kwargs(config):
+    # arguments of the estimation strategies, they can change while the controller runs
+    kwargs = {key: config[key] for key in ["var", "target", "increases", "margin", "unit", "active_min", "active_max",
+                                           "delay"]}
+    file_name = get_abs_path("data", config["file_name"]) if config["file_name"] else None
+    return {**kwargs, "file_name": file_name}
+
+
+def add_controller(scheduler, section):
+    config = CONFIG.get_controller_config(section)
+    logging.info(f"start controlling {config['var']}")
+    if config["margin"]:
+        logging.info(f"try to keep at {config['target']} +/- {config['margin'] * 100:.2f}%.")
+
+    relays = [Relay(pin, active_low=config["active_low"]) for pin in config["relays"]]
+    controller = Controller(relays, **get_limits(config))
+
+    def reconfigure(parser):
+        # relays are wired once, everything else is picked up while running
+        new_config = parser.get_controller_config(section)
+        logging.info(f"config of {section} changed, target: {new_config['target']}, margin: {new_config['margin']}.")
+        controller.update(**get_limits(new_config), **get_strategy_kwargs(new_config))
+
+    CONFIG.subscribe(reconfigure)
+    scheduler.add(controller, get_estimation_strategy(config), **get_strategy_kwargs(config))
+
+
+def get_estimation_strategy(config):
+    # controllers with a target keep a variable close to it, the others switch at fixed hours
+    strategy = config["strategy"] or ("random_time" if config["target"] is not None else "constant_time")
+    return ESTIMATION_STRATEGIES[strategy]
 
 
-def make_config(section, estimation_strategy):
-    kwargs = {**CONFIG.get_controller_config(section),
-              "estimation_strategy": estimation_strategy}
-    return kwargs
+def get_controller_sections():
+    return [section for section in CONFIG.sections() if section.startswith("CONTROLLER_")]
+
+
+def read_all_sensors():
+    SENSOR_ARRAY.read_all()
 
 
 def main():
     read_sensor_thread = threading.Thread(target=read_all_sensors,
                                           name="ENV-tracker",
                                           daemon=True)
-    # environmental controls, create new thread here if you want to add another controller
-    control_co2_thread = threading.Thread(target=control,
-                                          kwargs=CO2_CONFIG,
-                                          name="CO2-controller",
-                                          daemon=True)
-    control_humidity_thread = threading.Thread(target=control,
-                                               kwargs=HUMIDITY_CONFIG,
-                                               name="Humidity-Controller",
-                                               daemon=True)
-
-    control_lights_thread = threading.Thread(target=control,
-                                             kwargs=LIGHTS_CONFIG,
-                                             name="Lights-Controller",
-                                             daemon=True)
-
     read_sensor_thread.start()
-    control_co2_thread.start()
-    control_humidity_thread.start()
-    control_lights_thread.start()
-    read_sensor_thread.join()
+    try:
+        # every `CONTROLLER_*` section of `config.ini` runs in this thread, add a section to add a controller
+        SCHEDULER.run()
+        # without controllers the scheduler returns right away, the sensors keep reading until the exit event
+        while read_sensor_thread.is_alive() and not EXIT_EVENT.wait(SHUTDOWN_TIMEOUT):
+            pass
+    finally:
+        # on SIGINT, let the sensors finish their sweep, such that its readings are flushed by the writers
+        read_sensor_thread.join(timeout=SHUTDOWN_TIMEOUT)
 
 
 if __name__ == "__main__":
@@ -134,17 +141,29 @@ if __name__ == "__main__":
 
     SECONDS_IN_MINUTE = 60
     MINUTES_IN_HOUR = 60
+    SHUTDOWN_TIMEOUT = 0.5
 
-    CO2_CONFIG = make_config("CONTROLLER_CO2", random_time_estimator)
-    HUMIDITY_CONFIG = make_config("CONTROLLER_HUMIDITY", random_time_estimator)
-    LIGHTS_CONFIG = make_config("CONTROLLER_LIGHTS", constant_time_estimator)
+    ESTIMATION_STRATEGIES = {"random_time": random_time_estimator,
+                             "constant_time": constant_time_estimator}
 
     SENSORS = setup_sensors(CONFIG)
 
     SENSOR_ARRAY = SensorArray(SENSORS,
                                out_path=get_abs_path("data", CONFIG.get("GENERAL", "env_data_file_name")),
                                retries=CONFIG.getint("SENSORS", "retries"),
-                               delay=CONFIG.getint("SENSORS", "delay"))
+                               delay=CONFIG.getint("SENSORS", "delay"),
+                               concurrent=CONFIG.getboolean("SENSORS", "concurrent", fallback=True),
+                               timeout=CONFIG.getfloat("SENSORS", "timeout", fallback=None),
+                               table=CONFIG.get("DATABASE", "readings_table", fallback=None) or None,
+                               weights=get_fusion_weights(CONFIG),
+                               max_deviation=CONFIG.getfloat("FUSION", "max_deviation", fallback=3.5))
 
     signal.signal(signal.SIGINT, interrupt_handler)
+    # `kill -HUP` or an edit of `config.ini` updates targets and margins of the running controllers
+    signal.signal(signal.SIGHUP, CONFIG.hangup_handler)
+    CONFIG.watch()
+
+    SCHEDULER = Scheduler()
+    for SECTION in get_controller_sections():
+        add_controller(SCHEDULER, SECTION)
     main()
@@ -0,0 +1,23 @@
+import argparse
+from src.utilities import get_abs_path, CONFIG
+from src.storage import migrate_csv, PartitionedStore, rebuild_rollups
+
+
+def main(args):
+    rows = migrate_csv(args.csv, args.out, freq=args.freq, chunksize=args.chunksize)
+    partitions = PartitionedStore(args.out).get_partitions()
+    print(f"copied {rows} readings from {args.csv} into {len(partitions)} partition(s) in {args.out}.")
+    print(f"computed the rollups of the readings in {rebuild_rollups(args.out)}.")
+    print(f"set `env_data_file_name = {args.out.rstrip('/').split('/')[-1]}` in `config.ini` to keep on writing there.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the readings of a csv file into time-partitioned storage.")
+    parser.add_argument("--csv", default=get_abs_path("data", CONFIG.get("GENERAL", "env_data_file_name",
+                                                                          fallback="readings.csv")))
+    parser.add_argument("--out", default=get_abs_path("data", "readings.store"))
+    parser.add_argument("--freq", default="D", choices=["D", "H"], help="one partition per day or per hour.")
+    parser.add_argument("--chunksize", default=100_000, type=int)
+
+    ARGS = parser.parse_args()
+    main(ARGS)
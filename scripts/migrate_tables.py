@@ -0,0 +1,4 @@
+from src.database import run_query
+
+# brings tables created by older versions of `create_tables.sql` up to date, running it again changes nothing
+run_query("migrate_raw_sensor_readings", mode="w")
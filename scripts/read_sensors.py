@@ -1,6 +1,6 @@
 import signal
 from src.utilities import CONFIG, get_logger, get_abs_path, LOG_LEVELS, interrupt_handler
-from src.components import setup_sensors, SensorArray
+from src.components import setup_sensors, get_fusion_weights, SensorArray
 
 
 def main():
@@ -10,7 +10,12 @@ def main():
     sensor_array = SensorArray(sensors,
                                out_path=out_path,
                                retries=CONFIG.getint("SENSORS", "retries"),
-                               delay=CONFIG.getint("SENSORS", "delay"))
+                               delay=CONFIG.getint("SENSORS", "delay"),
+                               concurrent=CONFIG.getboolean("SENSORS", "concurrent", fallback=True),
+                               timeout=CONFIG.getfloat("SENSORS", "timeout", fallback=None),
+                               table=CONFIG.get("DATABASE", "readings_table", fallback=None) or None,
+                               weights=get_fusion_weights(CONFIG),
+                               max_deviation=CONFIG.getfloat("FUSION", "max_deviation", fallback=3.5))
 
     sensor_array.read_all()
 
@@ -0,0 +1,30 @@
+import argparse
+import pandas as pd
+from src.utilities import get_abs_path, CONFIG
+from src.storage import Rollups, get_tier, get_rollups_path, rebuild_rollups
+
+
+def main(args):
+    if args.rebuild:
+        rebuild_rollups(args.path)
+        print(f"rebuilt the rollups of {args.path} in {get_rollups_path(args.path)}.")
+    if args.start is not None:
+        end = pd.Timestamp(args.end) if args.end is not None else pd.Timestamp.now()
+        tier = args.tier or get_tier(args.start, end)
+        rollups = Rollups(get_rollups_path(args.path)).read(tier, start=args.start, end=end)
+        print(rollups.to_string(index=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild and query the 1 minute, 1 hour and 1 day rollups of the "
+                                                 "readings in a csv file or partitioned storage.")
+    parser.add_argument("--path", default=get_abs_path("data", CONFIG.get("GENERAL", "env_data_file_name",
+                                                                           fallback="readings.csv")))
+    parser.add_argument("--rebuild", action="store_true", help="recompute all tiers from the raw readings.")
+    parser.add_argument("--start", default=None, help="print the rollups of the buckets starting at this time.")
+    parser.add_argument("--end", default=None, help="print the rollups of the buckets starting before this time.")
+    parser.add_argument("--tier", default=None, choices=["1min", "1h", "1d"],
+                        help="tier to print, by default the finest one with a few thousand buckets.")
+
+    ARGS = parser.parse_args()
+    main(ARGS)
@@ -0,0 +1,20 @@
+import argparse
+from src.utilities import get_abs_path, CONFIG
+from src.database import Sync
+
+
+def main(args):
+    rows = Sync(args.path, table=args.table, batch_size=args.batch_size).sync()
+    print(f"synced {rows} reading(s) from {args.path} to {args.table}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload the readings appended to a csv file or partitioned storage "
+                                                 "since the last sync.")
+    parser.add_argument("--path", default=get_abs_path("data", CONFIG.get("GENERAL", "env_data_file_name",
+                                                                           fallback="readings.csv")))
+    parser.add_argument("--table", default="raw_sensor_readings")
+    parser.add_argument("--batch-size", default=50_000, type=int)
+
+    ARGS = parser.parse_args()
+    main(ARGS)
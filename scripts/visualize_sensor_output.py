@@ -1,10 +1,14 @@
 import signal
+import argparse
 
+import numpy as np
 import pandas as pd
 from collections import defaultdict
+from matplotlib import dates as mdates
 from matplotlib import pyplot as plt
 from matplotlib.animation import FuncAnimation
 from src.utilities import get_abs_path, CONFIG, interrupt_handler
+from src.storage import ReadingsTail, Rollups, COLUMNS, get_tier, get_rollups_path, is_csv
 plt.style.use("dark_background")
 
 LINESTYLES = defaultdict(lambda: "-")
@@ -15,24 +19,45 @@ COLORS = {"Averaged": "grey",
           "BMP280": "blue",
           "BH1750": "green",
           "DHT22": "orange"}
-
-
-data_path = get_abs_path("data", CONFIG["GENERAL"]["env_data_file_name"])
-fig, axes = plt.subplots(2, 2, sharex=True, sharey=False)
-
-
-def get_data():
-    data = pd.read_csv(data_path, parse_dates=["taken_at"])
-    averaged = (data
-                .assign(taken_at=lambda x: x.taken_at.round("min"))
-                .groupby(["taken_at", "site", "variable", "unit"])
-                .value
-                .mean()
-                .reset_index()
-                .assign(sensor="Averaged"))
+VARIABLES = ["temperature", "humidity", "light_intensity", "co2"]
+
+
+class RollupsSource:
+    """The means of the rollups of the last `window`, in the tier that keeps them to a few thousand points per line."""
+
+    def __init__(self, path, window):
+        self.rollups = Rollups(get_rollups_path(path))
+        self.window = window
+        self.mtime = None
+        self.data = None
+
+    def update(self):
+        mtime = self.rollups.get_modified()
+        if mtime is None or mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        end = pd.Timestamp.now()
+        self.data = self.rollups.read(get_tier(end - self.window, end), start=end - self.window)
+        return True
+
+    def get_readings(self):
+        if self.data is None:
+            return pd.DataFrame(columns=COLUMNS)
+        return self.data.assign(value=self.data["mean"])
+
+    def get_averages(self):
+        if self.data is None:
+            return pd.DataFrame(columns=["taken_at", "site", "variable", "unit", "value"])
+        sums = self.data.groupby(["taken_at", "site", "variable", "unit"])[["sum", "count"]].sum()
+        return (sums["sum"] / sums["count"]).rename("value").reset_index()
+
+
+def get_data(source):
+    """The readings and averages of `source` as of its last `update`."""
+    data = source.get_readings()
+    averaged = source.get_averages().assign(sensor="Averaged")
     df = pd.concat([data, averaged.loc[averaged.taken_at <= data.taken_at.max()]], axis=0)
     out = (df
-           .loc[df.taken_at > df.taken_at.max() - pd.Timedelta(days=2)]
            .sort_values(["variable", "sensor", "taken_at"])
            .reset_index(drop=True))
     return out
@@ -42,38 +67,120 @@ def pretty_label(label):
     return " ".join([lab.capitalize() for lab in label.split("_")])
 
 
-def plot(df):
-    variables = ["temperature", "humidity", "light_intensity", "co2"]
-    for var, ax in zip(variables, axes.flatten()):
-        ax.clear()
-        ax.set_title(pretty_label(var))
-
-        for spine in "top", "right":
-            ax.spines[spine].set_visible(False)
-
-        tmp = df.loc[df.variable == var]
-        for sensor in tmp.sensor.unique():
-            tmp = df.loc[(df.variable == var) & (df.sensor == sensor)]
-            ax.plot(tmp.taken_at, tmp.value, label=sensor,
-                    ls=LINESTYLES[sensor],
-                    color=COLORS[sensor])
-
-        ax.set_ylabel(tmp.unit.iloc[0])
-        ax.legend(frameon=False, loc="lower left")
-
-    for col in 0, 1:
-        axes[-1, col].set_xlabel("Time")
-        for i, label in enumerate(axes[-1, col].xaxis.get_ticklabels()):
-            label.set_visible(i % 3 == 0)
-
-
-def animate(i):
-    tmp = get_data()
-    plot(tmp)
+def decimate(x, y, x_min, x_max, columns):
+    """Keep the minimum and maximum of `y` per pixel column, `x` has to be sorted.
+
+    The line looks the same on screen, but has at most `2 * columns` points no matter how many readings it shows.
+    """
+    keep = ~np.isnan(y)
+    x, y = x[keep], y[keep]
+    if len(x) <= 2 * columns:
+        return x, y
+    column = np.clip(((x - x_min) / (x_max - x_min) * columns).astype(int), 0, columns - 1)
+    starts = np.flatnonzero(np.r_[True, np.diff(column) > 0])
+    return np.repeat(x[starts], 2), np.column_stack([np.minimum.reduceat(y, starts),
+                                                     np.maximum.reduceat(y, starts)]).ravel()
+
+
+class Dashboard:
+    """Live plot of the last `window` of readings.
+
+    Lines are created once and only their data is updated, `FuncAnimation` blits them onto a cached background. The
+    whole figure is only redrawn when a new line shows up or the limits of the axes have to move.
+    """
+
+    def __init__(self, source, window=pd.Timedelta(days=2)):
+        self.source = source
+        self.window = window
+        self.fig, axes = plt.subplots(2, 2, sharex=True, sharey=False)
+        self.axes = dict(zip(VARIABLES, axes.flatten()))
+        self.lines = {}
+        for var, ax in self.axes.items():
+            ax.set_title(pretty_label(var))
+            for spine in "top", "right":
+                ax.spines[spine].set_visible(False)
+            ax.xaxis_date()
+        for ax in axes[-1]:
+            ax.set_xlabel("Time")
+            locator = mdates.AutoDateLocator(minticks=2, maxticks=5)
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+    def _get_line(self, var, sensor, unit):
+        if (var, sensor) not in self.lines:
+            ax = self.axes[var]
+            self.lines[(var, sensor)], = ax.plot([], [], label=sensor, ls=LINESTYLES[sensor], color=COLORS[sensor],
+                                                 animated=True)
+            ax.set_ylabel(unit)
+            ax.legend(frameon=False, loc="lower left")
+        return self.lines[(var, sensor)]
+
+    def _update_limits(self, df, x_max):
+        """Move the axes if the data left them, return whether the figure has to be redrawn."""
+        ax = next(iter(self.axes.values()))
+        left, right = ax.get_xlim()
+        redraw = x_max > right
+        if redraw:
+            # leave some room to the right, such that the limits only move every few percent of the window
+            span = mdates.date2num(pd.Timestamp(0) + self.window) - mdates.date2num(pd.Timestamp(0))
+            ax.set_xlim(x_max - span, x_max + 0.05 * span)
+        for var, ax in self.axes.items():
+            values = df.loc[df.variable == var, "value"]
+            if values.notna().any():
+                low, high = ax.get_ylim()
+                lowest, highest = values.min(), values.max()
+                if redraw or lowest < low or highest > high:
+                    margin = 0.1 * (highest - lowest) or 1
+                    ax.set_ylim(lowest - margin, highest + margin)
+                    redraw = True
+        return redraw
+
+    def update(self, frame):
+        number_of_lines = len(self.lines)
+        if not self.source.update() and number_of_lines:
+            return list(self.lines.values())
+        df = get_data(self.source)
+        if df.empty:
+            return list(self.lines.values())
+
+        redraw = self._update_limits(df, mdates.date2num(df.taken_at.max()))
+        x_min, x_max = self.axes[VARIABLES[0]].get_xlim()
+        for (var, sensor, unit), group in df.loc[df.variable.isin(VARIABLES)].groupby(["variable", "sensor", "unit"]):
+            line = self._get_line(var, sensor, unit)
+            columns = max(int(self.axes[var].bbox.width), 1)
+            line.set_data(*decimate(mdates.date2num(group.taken_at), group.value.to_numpy(dtype=float),
+                                    x_min, x_max, columns))
+
+        if redraw or len(self.lines) > number_of_lines:
+            # refresh the cached background (ticks, legends), the blitted lines are drawn on top of it
+            self.fig.canvas.draw()
+        return list(self.lines.values())
+
+
+def main(args):
+    data_path = get_abs_path("data", CONFIG["GENERAL"]["env_data_file_name"])
+    window = pd.Timedelta(days=args.days)
+    if args.days > 2 and not is_csv(data_path):
+        # longer windows are plotted from the rollups instead of millions of raw readings, only partitioned stores keep
+        # their rollups up to date while readings are written
+        source = RollupsSource(data_path, window=window)
+    else:
+        # only parses the rows appended since the last frame and keeps the last two days in memory
+        source = ReadingsTail(data_path, window=window)
+    dashboard = Dashboard(source, window=window)
+    animation = FuncAnimation(dashboard.fig, dashboard.update, interval=args.interval * 1000, blit=True,
+                              cache_frame_data=False)
+    plt.tight_layout()
+    plt.show()
+    return animation
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live plot of the sensor readings.")
+    parser.add_argument("--interval", default=CONFIG.getfloat("GENERAL", "plot_interval", fallback=10), type=float,
+                        help="seconds between two refreshes.")
+    parser.add_argument("--days", default=2, type=float, help="number of days to show.")
+
+    ARGS = parser.parse_args()
     signal.signal(signal.SIGINT, interrupt_handler)
-    animation = FuncAnimation(plt.gcf(), animate)
-    plt.tight_layout()
-    plt.show()
+    main(ARGS)
@@ -1,10 +1,29 @@
-from ._general import write_readings, Sensor, SensorArray, PINS, I2C
+from ._general import write_readings, get_writer, close_writers, ReadingsWriter, Sensor, SensorArray, Schedule
+from ._hardware import BUSES, PINS
+from ._fusion import SensorFusion
 from .bh1750 import BH1750
 from .bmp280 import BMP280
 from .dht22 import DHT22
 from .scd30 import SCD30
 from .relay import Relay
-from .controller import Controller
+from .controller import Controller, Scheduler
+
+
+def _get_interval(config, sensor):
+    # an empty or missing `interval_<sensor>` reads the sensor at the global delay
+    interval = config.get("SENSORS", f"interval_{sensor}", fallback="")
+    return float(interval) if interval else None
+
+
+def get_fusion_weights(config):
+    """Weights of `weight_<sensor>_<variable>` in the `FUSION` section, e.g. `weight_scd30_co2 = 2`."""
+    weights = {}
+    if config.has_section("FUSION"):
+        for option in config.options("FUSION"):
+            if option.startswith("weight_"):
+                _, sensor, var = option.split("_", 2)
+                weights[(sensor.upper(), var)] = config.getfloat("FUSION", option)
+    return weights
 
 
 def setup_sensors(config, dht22=True, bmp280=True, bh1750=True, scd30=True):
@@ -12,11 +31,15 @@ def setup_sensors(config, dht22=True, bmp280=True, bh1750=True, scd30=True):
     site = config.get("GENERAL", "site")
     sensors = []
     if dht22:
-        sensors.append(DHT22(address=PINS[config.get("SENSORS", "address_dht22")], site=site))
+        sensors.append(DHT22(address=PINS[config.get("SENSORS", "address_dht22")], site=site,
+                             interval=_get_interval(config, "dht22")))
     if bmp280:
-        sensors.append(BMP280(address=int(config.get("SENSORS", "address_bmp280"), base=16), site=site))
+        sensors.append(BMP280(address=config.gethex("SENSORS", "address_bmp280"), site=site,
+                              interval=_get_interval(config, "bmp280")))
     if bh1750:
-        sensors.append(BH1750(address=int(config.get("SENSORS", "address_bh1750"), base=16), site=site))
+        sensors.append(BH1750(address=config.gethex("SENSORS", "address_bh1750"), site=site,
+                              interval=_get_interval(config, "bh1750")))
     if scd30:
-        sensors.append(SCD30(address=int(config.get("SENSORS", "address_scd30"), base=16), site=site))
+        sensors.append(SCD30(address=config.gethex("SENSORS", "address_scd30"), site=site,
+                             interval=_get_interval(config, "scd30")))
     return sensors
@@ -0,0 +1,60 @@
+import numpy as np
+from src.utilities import VAR_SYNONYMS
+
+# scales the median absolute deviation to the standard deviation of normally distributed readings
+MAD_TO_STD = 1.4826
+
+
+class SensorFusion:
+    """Weighted mean of a variable over all sensors that measure it.
+
+    The sensors of every variable (under the sensor's own name of the variable, e.g. "CO2" of the SCD30 for "co2")
+    and their weights are looked up once, `fuse` only works on small NumPy vectors. `weights` maps
+    `(sensor, variable)`, e.g. `("SCD30", "co2")`, to a weight, pairs that are missing have a weight of 1, a weight of 0
+    ignores the sensor.
+
+    Missing readings are rejected, and so are outliers, which are further than `max_deviation` standard deviations
+    from the median of at least three readings. The standard deviation is estimated by the median absolute deviation,
+    but is at least `min_scale` times the median, such that sensors that agree exactly don't reject small differences.
+    """
+
+    def __init__(self, sensors, weights=None, max_deviation=3.5, min_scale=0.01):
+        self.sensors = sensors
+        self.weights = weights if weights else {}
+        self.max_deviation = max_deviation
+        self.min_scale = min_scale
+        sources = {}
+        for i, sensor in enumerate(sensors):
+            sensor_name = sensor.__class__.__name__
+            for sensor_var in sensor.var2unit.keys():
+                var = VAR_SYNONYMS.get(sensor_var, sensor_var)
+                weight = self.weights.get((sensor_name, var), 1.)
+                if weight > 0:
+                    sources.setdefault(var, []).append((i, sensor_var, weight))
+        # variable -> (indices of the sensors, names of the variable on the sensors, weights)
+        self.plans = {var: ([i for i, _, _ in var_sources], [name for _, name, _ in var_sources],
+                            np.array([weight for _, _, weight in var_sources], dtype=float))
+                      for var, var_sources in sources.items()}
+
+    def get_plan(self, var):
+        """Indices of the sensors measuring `var`, the name of `var` on each of them and their weights."""
+        var = VAR_SYNONYMS.get(var, var)
+        return self.plans.get(var, ([], [], np.empty(0)))
+
+    def reject(self, values):
+        """Mask of the `values` that are kept, `nan` marks missing readings."""
+        keep = ~np.isnan(values)
+        if keep.sum() >= 3:
+            median = np.median(values[keep])
+            scale = max(MAD_TO_STD * np.median(np.abs(values[keep] - median)), self.min_scale * abs(median))
+            keep &= np.abs(np.where(keep, values, median) - median) <= self.max_deviation * scale
+        return keep
+
+    def fuse(self, var, values):
+        """Weighted mean of `values`, ordered like the sensors of `get_plan(var)`, `nan` if none of them is kept."""
+        _, _, weights = self.get_plan(var)
+        values = np.asarray(values, dtype=float)
+        keep = self.reject(values)
+        if not keep.any():
+            return np.nan
+        return float(np.average(values[keep], weights=weights[keep]))
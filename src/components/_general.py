@@ -1,104 +1,348 @@
 import os
+import math
+import heapq
+import queue
+import atexit
 import logging
 import itertools
+import threading
 import time
-import board
+import numpy as np
 import pandas as pd
-from src.utilities import Record, EXIT_EVENT
+from concurrent.futures import ThreadPoolExecutor
+from src.utilities import Record, ReadingBatch, EXIT_EVENT, now_ns
+from src.storage import open_storage, is_database
+from src.components._fusion import SensorFusion
 
 
 logger = logging.getLogger(__name__)
-SENSOR_WEIGHTS = pd.DataFrame({
-    "sensor": [*["SCD30"] * 3, *["DHT22"] * 2, "BH1750", *["BMP280"] * 3],
-    "variable": ["temperature", "humidity", "co2",
-                 "temperature", "humidity",
-                 "light_intensity",
-                 "temperature", "pressure", "altitude"],
-    "weight": [1, 1, 1, 1, 1, 1, 1, 1, 1]
-})
+
+
+def concat(batch):
+    # sensors write `ReadingBatch`es, controllers write frames of their decisions
+    if isinstance(batch[0], ReadingBatch):
+        return ReadingBatch.concat(batch)
+    return pd.concat(batch, ignore_index=True)
+
+
+class ReadingsWriter:
+    """Appends frames of readings to a csv file or a `PartitionedStore` (see `open_storage`) from a background thread.
+
+    Frames wait in a bounded queue and are written in batches through a single file handle, once `batch_size` rows
+    are waiting or `flush_interval` seconds have passed since the last batch. Once `EXIT_EVENT` is set, every frame is
+    written as soon as it arrives, such that the last readings taken during a shutdown are kept as well. `close`
+    (called for every writer at exit) writes everything still queued and stops the thread.
+    """
+
+    def __init__(self, out_path, batch_size=100, flush_interval=30, max_queued=1000):
+        self.out_path = out_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"writer-{os.path.basename(out_path)}", daemon=True)
+        self.thread.start()
+
+    def write(self, readings):
+        # blocks once `max_queued` frames are waiting, which slows down the producers instead of growing the queue
+        self.queue.put(readings)
+
+    def close(self):
+        self.closed.set()
+        if self.thread.is_alive():
+            # wake up the thread instead of waiting for its `get` to time out
+            self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        storage = open_storage(self.out_path)
+        try:
+            batch, rows = [], 0
+            last_write = time.monotonic()
+            while True:
+                stopping = self.closed.is_set()
+                exiting = EXIT_EVENT.is_set()
+                try:
+                    # don't wait for new frames when stopping, only drain the queue
+                    readings = self.queue.get_nowait() if stopping else self.queue.get(timeout=0.5)
+                    if readings is not None:
+                        batch.append(readings)
+                        rows += len(readings)
+                except queue.Empty:
+                    pass
+
+                if stopping and not self.queue.empty():
+                    continue
+                due = time.monotonic() - last_write >= self.flush_interval
+                if batch and (stopping or exiting or rows >= self.batch_size or due):
+                    try:
+                        storage.write(concat(batch))
+                    except Exception:
+                        # drop only this batch, the writer keeps on writing the frames that follow
+                        logger.exception(f"could not write {rows} reading(s) to {self.out_path}, dropped them.")
+                    batch, rows = [], 0
+                    last_write = time.monotonic()
+                if stopping:
+                    break
+        finally:
+            storage.close()
+        logger.debug(f"closed {self.out_path}.")
+
+
+_WRITERS = {}
+_WRITERS_LOCK = threading.Lock()
+
+
+def get_writer(out_path, **kwargs):
+    """The writer of `out_path`, all threads writing to the same file share it."""
+    out_path = out_path if is_database(out_path) else os.path.abspath(out_path)
+    with _WRITERS_LOCK:
+        writer = _WRITERS.get(out_path)
+        if writer is None or not writer.thread.is_alive():
+            writer = _WRITERS[out_path] = ReadingsWriter(out_path, **kwargs)
+        return writer
+
+
+@atexit.register
+def close_writers():
+    with _WRITERS_LOCK:
+        writers = list(_WRITERS.values())
+    for writer in writers:
+        writer.close()
 
 
 def write_readings(readings, out_path):
-    if not os.path.exists(out_path):
-        readings.to_csv(out_path, index=False)
-    else:
-        readings.to_csv(out_path, header=None, mode="a", index=False)
+    get_writer(out_path).write(readings)
 
 
 class Sensor:
-    def __init__(self, site):
+    # minimum number of seconds between two reads the hardware can handle
+    min_interval = 0
+
+    def __init__(self, site, interval=None):
         self.site = site
+        # seconds between two reads in `SensorArray.read_all`, `None` falls back to the delay of the array
+        self.interval = max(interval, self.min_interval) if interval is not None else None
         self.var2unit = dict()
         self.device = dict()
+        # sensors on the same bus must not be read at the same time, `None` means the sensor has a bus of its own
+        self.bus = None
         super(Sensor, self).__init__()
 
-    def read_all(self, retries=5, delay=1):
-        readings = [self.read(var=var, retries=retries, delay=delay) for var in self.var2unit.keys()]
-        return readings
+    def read_all(self, retries=5, delay=1, timeout=None):
+        """A `ReadingBatch` of all variables of the sensor, failed reads are `nan`."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        values = [self.read_value(var=var, retries=retries, delay=delay, deadline=deadline)
+                  for var in self.var2unit.keys()]
+        return ReadingBatch.from_values(self.site, self.__class__.__name__, list(self.var2unit.keys()),
+                                        list(self.var2unit.values()), values, taken_at=now_ns())
+
+    def read(self, var, retries=5, delay=1, deadline=None):
+        return Record(self.site, self.__class__.__name__, var, self.var2unit[var],
+                      self.read_value(var, retries, delay, deadline))
 
-    def read(self, var, retries=5, delay=1):
+    def read_value(self, var, retries=5, delay=1, deadline=None):
+        """The value of `var`, `None` if it could not be read within `retries` or before `deadline`."""
         sensor_name = self.__class__.__name__
         assert var in self.var2unit.keys(), f"{sensor_name} is not a sensor for '{var}'. Maybe check spelling?"
-        unit = self.var2unit[var]
         for i in range(retries):
             try:
-                reading = Record(self.site,
-                                 sensor_name,
-                                 var,
-                                 unit,
-                                 getattr(self.device, var))
-                assert reading.value is not None, f"could not read {var} on sensor {sensor_name}."
-                return reading
+                value = getattr(self.device, var)
+                assert value is not None, f"could not read {var} on sensor {sensor_name}."
+                return value
             except (RuntimeError, AssertionError) as e:
                 logger.warning(e)
-                time.sleep(delay)
-                if i + 1 == retries:
+                remaining = deadline - time.monotonic() if deadline is not None else delay
+                if i + 1 == retries or remaining < delay:
                     logger.error(e)
-                continue
-        else:
-            return Record(self.site, sensor_name, var, unit, None)
+                    break
+                if EXIT_EVENT.wait(delay):
+                    break
+        return None
+
+
+# shortest interval between two reads of a sensor, in seconds
+MIN_INTERVAL = 0.01
+
+
+class Schedule:
+    """Due times of periodic jobs, kept in a heap.
+
+    Job `i` is due at `start + k * intervals[i]`, hence slow jobs don't make the schedule drift. Slots that have passed
+    while a job ran too long are skipped instead of being caught up on.
+    """
+
+    def __init__(self, intervals, start=None, resolution=0.01):
+        start = time.monotonic() if start is None else start
+        self.intervals = intervals
+        self.resolution = resolution
+        self.heap = [(start, i) for i in range(len(intervals))]
+        heapq.heapify(self.heap)
+
+    def pop(self):
+        """Remove the next due time and all jobs due within `resolution` of it from the schedule."""
+        due, i = heapq.heappop(self.heap)
+        indices = [i]
+        while self.heap and self.heap[0][0] <= due + self.resolution:
+            indices.append(heapq.heappop(self.heap)[1])
+        return due, sorted(indices)
+
+    def push(self, due, indices, now=None):
+        """Schedule `indices`, which were due at `due`, for their next slot after `now`."""
+        now = time.monotonic() if now is None else now
+        for i in indices:
+            interval = self.intervals[i]
+            missed = max(math.floor((now - due) / interval), 0)
+            heapq.heappush(self.heap, (due + (missed + 1) * interval, i))
 
 
 class SensorArray:
-    def __init__(self, sensors, out_path=None, retries=5, delay=1):
+    """Reads a list of sensors, either one after another or, with `concurrent=True`, one thread per bus.
+
+    Sensors that share a bus (e.g. all I2C devices) are still read one after another in the same thread, such that a
+    sweep takes about as long as its slowest bus instead of the sum of all sensors. Every bus has a lock that is held
+    while one of its sensors is read, by sweeps and by `read` alike. `timeout` bounds the time a single
+    sensor spends on retries. `read_all` reads every sensor at its own `interval`.
+
+    Every successful reading is cached, such that `read` can answer from the readings of `read_all` running in another
+    thread. A cached value is fresh for `ttl[var]` seconds, by default for twice the interval of its sensor. `read`
+    fuses the readings of all sensors of a variable into their weighted mean, see `SensorFusion` for `weights`.
+    """
+
+    def __init__(self, sensors, out_path=None, retries=5, delay=1, concurrent=False, timeout=None, ttl=None,
+                 table=None, weights=None, max_deviation=3.5):
         self.sensors = sensors
+        self.fusion = SensorFusion(sensors, weights=weights, max_deviation=max_deviation)
         self.out_path = out_path
+        # readings are loaded into this table of the database as well
+        self.table = table
         self.retries = retries
         self.delay = delay
+        self.concurrent = concurrent
+        self.timeout = timeout
+        self.ttl = ttl if ttl else {}
+        self.buses = self._group_by_bus(range(len(sensors)))
+        self.bus_locks = {self._get_bus_key(i): threading.Lock() for i in range(len(sensors))}
+        self.executor = None
+        # (index of sensor, variable) -> (time.monotonic() of the reading, reading)
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+
+    def _get_interval(self, sensor, delay=None):
+        delay = delay if delay is not None else self.delay
+        interval = sensor.interval if sensor.interval is not None else max(delay, sensor.min_interval)
+        # an interval of 0 (e.g. from `config.ini`) would read the sensor in a busy loop and break the `Schedule`
+        return max(interval, MIN_INTERVAL)
+
+    def _get_ttl(self, i, var):
+        return self.ttl.get(var, 2 * self._get_interval(self.sensors[i]))
 
-    def take_sensor_readings(self):
-        readings = list(
-            itertools.chain.from_iterable(
-                [sensor.read_all(retries=self.retries) for sensor in self.sensors]))
-        for r in readings:
-            if r.value:
-                logger.debug(f"{r.sensor} {r.variable}: {r.value:.2f} {r.unit}")
-            else:
-                logger.debug(f"could not read {r.variable} on sensor {r.sensor}")
-        out = pd.DataFrame(readings)
-        return out
-
-    def read(self, var, retries=None, delay=None):
+    def _update_cache(self, i, variables, values):
+        now = time.monotonic()
+        with self.cache_lock:
+            for var, value in zip(variables, values):
+                if value is not None and not np.isnan(value):
+                    self.cache[(i, var)] = (now, float(value))
+
+    def get_cached(self, i, var):
+        """The cached value of `var` on the sensor at index `i`, if it is still fresh."""
+        with self.cache_lock:
+            taken_at, value = self.cache.get((i, var), (None, None))
+        if taken_at is None or time.monotonic() - taken_at > self._get_ttl(i, var):
+            return None
+        return value
+
+    def _get_bus_key(self, i):
+        bus = self.sensors[i].bus
+        return bus if bus is not None else ("sensor", i)
+
+    def _group_by_bus(self, indices):
+        buses = {}
+        for i in indices:
+            buses.setdefault(self._get_bus_key(i), []).append(i)
+        return list(buses.values())
+
+    def _read_sensor(self, i):
+        with self.bus_locks[self._get_bus_key(i)]:
+            return self.sensors[i].read_all(retries=self.retries, timeout=self.timeout)
+
+    def _read_sensors(self, indices):
+        return [(i, self._read_sensor(i)) for i in indices]
+
+    def _read_buses_concurrently(self, indices):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.buses), thread_name_prefix="sensor-bus")
+        results = dict(itertools.chain.from_iterable(self.executor.map(self._read_sensors,
+                                                                       self._group_by_bus(indices))))
+        # keep the order of `sensors`, independent of the bus that finished first
+        return [results[i] for i in indices]
+
+    def take_sensor_readings(self, indices=None):
+        """Read the sensors at `indices`, all of them by default."""
+        indices = range(len(self.sensors)) if indices is None else indices
+        if self.concurrent and len(self._group_by_bus(indices)) > 1:
+            readings_per_sensor = self._read_buses_concurrently(indices)
+        else:
+            readings_per_sensor = [self._read_sensor(i) for i in indices]
+        for i, sensor_readings in zip(indices, readings_per_sensor):
+            self._update_cache(i, self.sensors[i].var2unit.keys(), sensor_readings.value)
+        readings = ReadingBatch.concat(readings_per_sensor)
+        if logger.isEnabledFor(logging.DEBUG):
+            for r in readings:
+                if r.value is not None:
+                    logger.debug(f"{r.sensor} {r.variable}: {r.value:.2f} {r.unit}")
+                else:
+                    logger.debug(f"could not read {r.variable} on sensor {r.sensor}")
+        return readings
+
+    def read(self, var, retries=None, delay=None, timeout=None):
+        """Fused value of `var` over all sensors, only sensors without a fresh cached reading are read again.
+
+        Sensors are read again until `timeout` seconds have passed, by default the `timeout` of the array or a single
+        `delay` without one. Controllers call `read` on the scheduler thread, hence a flaky sensor must not keep it
+        from switching off the relays of other controllers.
+        """
         retries = retries if retries is not None else self.retries
         delay = delay if delay is not None else self.delay
-        readings = pd.DataFrame(s.read(var, retries, delay) for s in self.sensors if var in s.var2unit.keys())
-        merged = readings.merge(SENSOR_WEIGHTS)
-        # todo: implement weighted mean
-        return merged.loc[merged.weight > 0].value.mean()
+        timeout = timeout if timeout is not None else self.timeout if self.timeout is not None else delay
+        deadline = time.monotonic() + timeout
+        indices, names, _ = self.fusion.get_plan(var)
+        values = np.full(len(indices), np.nan)
+        for k, (i, name) in enumerate(zip(indices, names)):
+            value = self.get_cached(i, name)
+            if value is None:
+                logger.debug(f"no fresh {name} of {self.sensors[i].__class__.__name__} in cache, reading sensor.")
+                with self.bus_locks[self._get_bus_key(i)]:
+                    # a sweep may have read the sensor while waiting for its bus
+                    value = self.get_cached(i, name)
+                    if value is None:
+                        value = self.sensors[i].read_value(name, retries, delay, deadline)
+                        self._update_cache(i, [name], [value])
+            if value is not None:
+                values[k] = value
+        return self.fusion.fuse(var, values)
 
     def read_all(self, delay=None, retries=None):
+        """Read every sensor at its own interval, sensors without one are read every `delay` seconds."""
         retries = retries if retries is not None else self.retries
         delay = delay if delay is not None else self.delay
+        schedule = Schedule([self._get_interval(s, delay) for s in self.sensors])
         while True:
             if EXIT_EVENT.is_set():
                 break
+            due, indices = schedule.pop()
+            wait = due - time.monotonic()
+            if wait > 0:
+                logger.debug(f"sleeping for {wait:.2f} seconds.")
+                if EXIT_EVENT.wait(wait):
+                    break
             for i in range(retries):
                 try:
-                    results = self.take_sensor_readings()
+                    results = self.take_sensor_readings(indices)
                     if self.out_path:
                         write_readings(results, self.out_path)
-                    logger.debug(f"sleeping for {delay} seconds.")
-                    time.sleep(delay)
+                    if self.table:
+                        write_readings(results, f"postgresql:{self.table}")
                     break
 
                 except Exception as e:
@@ -107,34 +351,5 @@ class SensorArray:
 
                 except KeyboardInterrupt:
                     break
+            schedule.push(due, indices)
 
-
-I2C = board.I2C()
-PINS = {"0": board.D0, 0: board.D0,
-        "1": board.D1, 1: board.D1,
-        "2": board.D2, 2: board.D2,
-        "3": board.D3, 3: board.D3,
-        "4": board.D4, 4: board.D4,
-        "5": board.D5, 5: board.D5,
-        "6": board.D6, 6: board.D6,
-        "7": board.D7, 7: board.D7,
-        "8": board.D8, 8: board.D8,
-        "9": board.D9, 9: board.D9,
-        "10": board.D10, 10: board.D10,
-        "11": board.D11, 11: board.D11,
-        "12": board.D12, 12: board.D12,
-        "13": board.D13, 13: board.D13,
-        "14": board.D14, 14: board.D14,
-        "15": board.D15, 15: board.D15,
-        "16": board.D16, 16: board.D16,
-        "17": board.D17, 17: board.D17,
-        "18": board.D18, 18: board.D18,
-        "19": board.D19, 19: board.D19,
-        "20": board.D20, 20: board.D20,
-        "21": board.D21, 21: board.D21,
-        "22": board.D22, 22: board.D22,
-        "23": board.D23, 23: board.D23,
-        "24": board.D24, 24: board.D24,
-        "25": board.D25, 25: board.D25,
-        "26": board.D26, 26: board.D26,
-        "27": board.D27, 27: board.D27}
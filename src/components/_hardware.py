@@ -0,0 +1,95 @@
+import threading
+from collections.abc import Mapping
+
+# pins of the board that can be configured, e.g. `address_dht22 = 4` in `config.ini`
+PIN_NUMBERS = range(28)
+# clock of `board.I2C()`
+DEFAULT_I2C_FREQUENCY = 100_000
+
+
+class SharedI2C:
+    """An I2C bus on a pair of pins, shared by all devices on them and clocked at the lowest frequency they need.
+
+    Devices only hold on to this object, hence the bus below it can be recreated with a lower clock when a slower
+    device (e.g. the SCD30) is added after the others. All devices lock the same `lock` through `try_lock`.
+    """
+
+    def __init__(self, scl, sda):
+        self.scl = scl
+        self.sda = sda
+        self.frequency = None
+        self.lock = threading.Lock()
+        self._bus = None
+
+    def require(self, frequency):
+        """Lower the clock of the bus to `frequency`, it is only ever lowered."""
+        if self.frequency is not None and self.frequency <= frequency:
+            return
+        import busio
+        with self.lock:
+            if self._bus is not None:
+                self._bus.deinit()
+            self._bus = busio.I2C(self.scl, self.sda, frequency=frequency)
+            self.frequency = frequency
+
+    def try_lock(self):
+        if not self.lock.acquire(blocking=False):
+            return False
+        if self._bus.try_lock():
+            return True
+        self.lock.release()
+        return False
+
+    def unlock(self):
+        self._bus.unlock()
+        self.lock.release()
+
+    def __getattr__(self, name):
+        # e.g. `writeto`, `readfrom_into` and `scan` of the `busio.I2C` below
+        return getattr(self._bus, name)
+
+
+class Buses:
+    """Creates the buses of the board on first use and shares them between all sensors.
+
+    `board` and `busio` only import on a Raspberry Pi (or with Blinka set up), they are imported by the first sensor
+    that needs a bus, such that `src.components` imports anywhere.
+    """
+
+    def __init__(self):
+        self._buses = {}
+        self._lock = threading.Lock()
+
+    def get_i2c(self, frequency=DEFAULT_I2C_FREQUENCY, scl=None, sda=None):
+        """The I2C bus on `scl` and `sda` (the default pins if not given), at most clocked at `frequency`."""
+        import board
+        pins = (scl or board.SCL, sda or board.SDA)
+        with self._lock:
+            if pins not in self._buses:
+                self._buses[pins] = SharedI2C(*pins)
+            self._buses[pins].require(frequency)
+            return self._buses[pins]
+
+
+class Pins(Mapping):
+    """The digital pins of the board by number, e.g. `PINS["4"]` or `PINS[4]` is `board.D4`."""
+
+    def __getitem__(self, key):
+        try:
+            number = int(key)
+        except ValueError:
+            raise KeyError(key)
+        if number not in PIN_NUMBERS:
+            raise KeyError(key)
+        import board
+        return getattr(board, f"D{number}")
+
+    def __iter__(self):
+        return iter(PIN_NUMBERS)
+
+    def __len__(self):
+        return len(PIN_NUMBERS)
+
+
+BUSES = Buses()
+PINS = Pins()
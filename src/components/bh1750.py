@@ -1,14 +1,15 @@
-import adafruit_bh1750
-from src.components import Sensor, I2C
+from src.components import Sensor, BUSES
 
 
 class BH1750(Sensor):
 
-    def __init__(self, address, site):
-        super(BH1750, self).__init__(site=site)
+    def __init__(self, address, site, interval=None):
+        super(BH1750, self).__init__(site=site, interval=interval)
         self.var2unit = {"light_intensity": "Lux"}
         self.address = address
-        self.device = adafruit_bh1750.BH1750(I2C, address=self.address)
+        import adafruit_bh1750
+        self.device = adafruit_bh1750.BH1750(BUSES.get_i2c(), address=self.address)
+        self.bus = "I2C"
         # for readability reasons: copy default name for variable
         self.device.light_intensity = self.device.lux
 
@@ -16,6 +17,6 @@ class BH1750(Sensor):
 if __name__ == "__main__":
     from src.utilities import CONFIG
 
-    bh1750 = BH1750(address=int(CONFIG.get("SENSORS", "address_bh1750"), base=16), site=CONFIG.get("GENERAL", "site"))
+    bh1750 = BH1750(address=CONFIG.gethex("SENSORS", "address_bh1750"), site=CONFIG.get("GENERAL", "site"))
     readings = bh1750.read_all(retries=5)
     print(*readings, sep="\n")
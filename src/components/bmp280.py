@@ -1,22 +1,23 @@
-import adafruit_bmp280
-from src.components import Sensor, I2C
+from src.components import Sensor, BUSES
 
 
 class BMP280(Sensor):
 
-    def __init__(self, address, site):
-        super(BMP280, self).__init__(site=site)
+    def __init__(self, address, site, interval=None):
+        super(BMP280, self).__init__(site=site, interval=interval)
         self.var2unit = {"temperature": "C",
                          "pressure": "hPa",
                          "altitude": "m"}
         self.sea_level_pressure = 1010.2
-        self.device = adafruit_bmp280.Adafruit_BMP280_I2C(I2C, address=address)
+        import adafruit_bmp280
+        self.device = adafruit_bmp280.Adafruit_BMP280_I2C(BUSES.get_i2c(), address=address)
+        self.bus = "I2C"
         self.device.sea_level_pressure = self.sea_level_pressure
 
 
 if __name__ == "__main__":
     from src.utilities import CONFIG
 
-    bmp280 = BMP280(address=int(CONFIG.get("SENSORS", "address_bmp280"), base=16), site=CONFIG.get("GENERAL", "site"))
+    bmp280 = BMP280(address=CONFIG.gethex("SENSORS", "address_bmp280"), site=CONFIG.get("GENERAL", "site"))
     readings = bmp280.read_all(retries=5)
     print(*readings, sep="\n")
@@ -1,4 +1,6 @@
+import heapq
 import logging
+import itertools
 import time
 from logdecorator import log_on_start, log_on_end, log_exception
 from src.components import Relay
@@ -17,6 +19,15 @@ class Controller:
         self.active_min = active_min
         self.active_max = active_max
         self.delay = delay
+        self.kwargs = {}
+
+    def update(self, active_min=None, active_max=None, delay=None, **kwargs):
+        """Change the limits and the arguments of the estimation strategy (e.g. `target`) of a running controller."""
+        self.active_min = active_min if active_min is not None else self.active_min
+        self.active_max = active_max if active_max is not None else self.active_max
+        self.delay = delay if delay is not None else self.delay
+        # swap the whole dict, such that `run` never sees a partial update
+        self.kwargs = {**self.kwargs, **kwargs}
 
     def __sanitize(self, t):
         # handle t larger than maximum value
@@ -33,40 +44,106 @@ class Controller:
             logger.debug(f"received {t} seconds --> passing input through.")
             return t
 
-    def activate_relay(self, seconds):
-        if seconds:
-            for relay in self.relays:
-                logger.debug(f"start {relay} for {seconds} seconds.")
-            for relay in self.relays:
-                relay.arm()
-            time.sleep(seconds)
-            for relay in self.relays:
-                relay.disarm()
-
-    def skip(self):
+    def arm(self, seconds):
+        for relay in self.relays:
+            logger.debug(f"start {relay} for {seconds} seconds.")
+        for relay in self.relays:
+            relay.arm()
+
+    def disarm(self):
         for relay in self.relays:
             relay.disarm()
 
+    def evaluate(self, estimation_strategy):
+        """Run `estimation_strategy` once and switch the relays on, return whether they are on and for how long.
+
+        Raises `StopIteration` once the strategy is done.
+        """
+        turn_on, active_time = estimation_strategy(**self.kwargs)
+        if turn_on:
+            active_time = self.__sanitize(active_time)
+        if turn_on and active_time:
+            self.arm(active_time)
+            return True, active_time
+        self.disarm()
         logger.debug(f"skip this round ({self.delay} seconds).")
-        time.sleep(self.delay)
+        return False, self.delay
 
     @log_on_start(logging.INFO, "start run.")
     @log_on_end(logging.INFO, "end of run.")
     @log_exception("encountered error:")
     def run(self, estimation_strategy, **kwargs):
-        while True:
-            if EXIT_EVENT.is_set():
-                break
-            try:
-                turn_on, active_time = estimation_strategy(**kwargs)
-                active_time = self.__sanitize(active_time)
-                if turn_on:
-                    self.activate_relay(active_time)
-                else:
-                    self.skip()
-
-            except StopIteration:
-                break
+        scheduler = Scheduler()
+        scheduler.add(self, estimation_strategy, **kwargs)
+        scheduler.run()
+
+
+class Scheduler:
+    """Runs any number of controllers in a single thread.
+
+    Every controller has its next event on one heap: either the next evaluation of its estimation strategy or the
+    deadline to turn its relays off again, after which it is evaluated right away. The thread waits for the next due
+    event instead of sleeping once per controller, hence threads and memory stay flat no matter how many controllers
+    run.
+    """
+
+    # at the same time, relays are turned off before the next evaluation may turn them on again
+    OFF, EVALUATE = 0, 1
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+        self.strategies = {}
+
+    def add(self, controller, estimation_strategy, start=None, **kwargs):
+        # arguments passed to `update` before the start are newer than `kwargs`
+        controller.kwargs = {**kwargs, **controller.kwargs}
+        self.strategies[controller] = estimation_strategy
+        self._push(time.monotonic() if start is None else start, self.EVALUATE, controller)
+
+    def _push(self, due, event, controller):
+        heapq.heappush(self.heap, (due, event, next(self.counter), controller))
+
+    def _evaluate(self, controller, now):
+        try:
+            turn_on, seconds = controller.evaluate(self.strategies[controller])
+        except StopIteration:
+            self.remove(controller)
+            return
+        except Exception as e:
+            # a broken controller must not stop all the others
+            logger.exception(e)
+            self.remove(controller)
+            return
+        self._push(now + seconds, self.OFF if turn_on else self.EVALUATE, controller)
+
+    def remove(self, controller):
+        controller.disarm()
+        self.strategies.pop(controller, None)
+
+    def run_pending(self, now=None):
+        """Handle all events due at `now` and return the time of the next one, `None` if no controller is left."""
+        now = time.monotonic() if now is None else now
+        while self.heap and self.heap[0][0] <= now:
+            due, event, _, controller = heapq.heappop(self.heap)
+            if controller not in self.strategies:
+                continue
+            if event == self.OFF:
+                controller.disarm()
+            # relative to `now`, such that a late round is not followed by a burst of rounds to catch up
+            self._evaluate(controller, now)
+        return self.heap[0][0] if self.heap else None
+
+    def run(self):
+        try:
+            while not EXIT_EVENT.is_set():
+                due = self.run_pending()
+                if due is None:
+                    break
+                EXIT_EVENT.wait(max(due - time.monotonic(), 0))
+        finally:
+            for controller in list(self.strategies):
+                self.remove(controller)
 
 
 if __name__ == "__main__":
@@ -77,7 +154,7 @@ if __name__ == "__main__":
 
     def main():
         def random_lux_estimator():
-            bh1750 = BH1750(address=int(CONFIG.get("SENSORS", "address_bh1750"), base=16),
+            bh1750 = BH1750(address=CONFIG.gethex("SENSORS", "address_bh1750"),
                             site=CONFIG.get("GENERAL", "site"))
             current_lux = bh1750.read("light_intensity")
             logging.debug(f"currently: {current_lux} lux.")
@@ -1,16 +1,23 @@
-import adafruit_dht
 from src.components import Sensor
-from sysv_ipc import ExistentialError
 
 
 class DHT22(Sensor):
+    # the sensor can't be read more often than every 2 seconds
+    min_interval = 2
 
-    def __init__(self, address, site):
-        super(DHT22, self).__init__(site=site)
+    def __init__(self, address, site, interval=None):
+        super(DHT22, self).__init__(site=site, interval=interval)
         self.var2unit = {"temperature": "C", "humidity": "%"}
+        import adafruit_dht
         self.device = adafruit_dht.DHT22(address)
+        self.bus = address
 
     def __del__(self):
+        # `__init__` may have failed before the device was created
+        if not hasattr(self, "device") or not hasattr(self.device, "exit"):
+            return
+        # imported along with `adafruit_dht`
+        from sysv_ipc import ExistentialError
         try:
             self.device.exit()
         except ExistentialError:
@@ -1,10 +1,15 @@
 import logging
-import RPi.GPIO as GPIO
 from colorama import Fore, Style
 
 logger = logging.getLogger(__name__)
 
 
+def get_gpio():
+    # only imports on a Raspberry Pi, hence not before the first relay is set up
+    import RPi.GPIO as GPIO
+    return GPIO
+
+
 class Relay:
     counter = 0
 
@@ -14,9 +19,10 @@ class Relay:
         self.active_low = active_low
         self.status = initial_on
 
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setup(self.channel, GPIO.OUT,
-                   initial=self._get_turn_on_signal() if self.status else self._get_turn_off_signal())
+        self.gpio = get_gpio()
+        self.gpio.setmode(self.gpio.BCM)
+        self.gpio.setup(self.channel, self.gpio.OUT,
+                        initial=self._get_turn_on_signal() if self.status else self._get_turn_off_signal())
 
     def __str__(self):
         return f"Relay {Relay.counter}"
@@ -24,20 +30,20 @@ class Relay:
     def __del__(self):
         self.disarm()
         logger.debug(f"cleaning up {self.__str__()}")
-        GPIO.setmode(GPIO.BCM)
-        GPIO.cleanup(self.channel)
+        self.gpio.setmode(self.gpio.BCM)
+        self.gpio.cleanup(self.channel)
 
     def _get_turn_on_signal(self):
         if self.active_low:
-            return GPIO.LOW
+            return self.gpio.LOW
         else:
-            return GPIO.HIGH
+            return self.gpio.HIGH
 
     def _get_turn_off_signal(self):
         if self.active_low:
-            return GPIO.HIGH
+            return self.gpio.HIGH
         else:
-            return GPIO.LOW
+            return self.gpio.LOW
 
     def get_status(self, return_signal=False):
         channel = str(self.channel).rjust(2, "0")
@@ -55,11 +61,11 @@ class Relay:
         logger.info(f"status {self.__str__()} {self.get_status()}")
 
     def arm(self):
-        GPIO.output(self.channel, self._get_turn_on_signal())
+        self.gpio.output(self.channel, self._get_turn_on_signal())
         self._set_status(True)
 
     def disarm(self):
-        GPIO.output(self.channel, self._get_turn_off_signal())
+        self.gpio.output(self.channel, self._get_turn_off_signal())
         self._set_status(False)
 
 
@@ -70,6 +76,7 @@ if __name__ == '__main__':
 
 
     def main():
+        GPIO = get_gpio()
         GPIO.setmode(GPIO.BCM)
         relay = Relay(21)
         while True:
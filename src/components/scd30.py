@@ -1,23 +1,24 @@
-import adafruit_scd30
-import busio
-import board
-from src.components import Sensor
-
-I2C = busio.I2C(board.SCL, board.SDA, frequency=50_000)
+from src.components import Sensor, BUSES
 
 
 class SCD30(Sensor):
-    def __init__(self, address, site):
-        super(SCD30, self).__init__(site=site)
+    # the sensor measures every 2 seconds at most
+    min_interval = 2
+
+    def __init__(self, address, site, interval=None):
+        super(SCD30, self).__init__(site=site, interval=interval)
         self.var2unit = {"temperature": "C",
                          "relative_humidity": "%",
                          "CO2": "ppm"}
-        self.device = adafruit_scd30.SCD30(I2C, address=address)
+        import adafruit_scd30
+        self.device = adafruit_scd30.SCD30(BUSES.get_i2c(frequency=50_000), address=address)
+        # the SCD30 needs a clock of at most 50 kHz, the bus it shares with the other sensors slows down for all of them
+        self.bus = "I2C"
 
 
 if __name__ == "__main__":
     from src.utilities import CONFIG
 
-    scd30 = SCD30(address=int(CONFIG.get("SENSORS", "address_scd30"), base=16), site=CONFIG.get("GENERAL", "site"))
+    scd30 = SCD30(address=CONFIG.gethex("SENSORS", "address_scd30"), site=CONFIG.get("GENERAL", "site"))
     readings = scd30.read_all(retries=5)
     print(*readings, sep="\n")
@@ -1,31 +1,120 @@
 import os
+import re
+import hashlib
+import weakref
+import threading
 import psycopg2
+import pandas as pd
+from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
 from src.utilities import get_abs_path, CONFIG
+from src.storage import COLUMNS
 
 QUERY_PATH = get_abs_path("database", "queries")
+_POOL = None
+_POOL_LOCK = threading.Lock()
+# modification time and sql of every query file that was read
+_QUERIES = {}
+# names of the statements prepared on every connection, they live as long as the session
+_PREPARED = weakref.WeakKeyDictionary()
+_PARAMETER = re.compile(r"%\((\w+)\)s")
+
+
+def get_connection_kwargs():
+    return {"database": CONFIG["DATABASE"]["database"],
+            "port": CONFIG["DATABASE"]["port"],
+            "host": CONFIG["DATABASE"]["host"],
+            "user": CONFIG["DATABASE"]["user"],
+            "password": CONFIG["DATABASE"]["password"],
+            # an unreachable server must not block the writers forever, their batches are spooled instead
+            "connect_timeout": CONFIG.getint("DATABASE", "connect_timeout", fallback=10)}
 
 
 def connect():
-    connection = psycopg2.connect(database=CONFIG["DATABASE"]["database"],
-                                  port=CONFIG["DATABASE"]["port"],
-                                  host=CONFIG["DATABASE"]["host"],
-                                  user=CONFIG["DATABASE"]["user"],
-                                  password=CONFIG["DATABASE"]["password"])
+    connection = psycopg2.connect(**get_connection_kwargs())
     return connection
 
 
+def get_pool(minconn=0, maxconn=4):
+    """The connection pool shared by all threads of the process, created on first use."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.closed:
+            _POOL = ThreadedConnectionPool(minconn, maxconn, **get_connection_kwargs())
+        return _POOL
+
+
+@contextmanager
+def pooled_connection(pool=None):
+    """Borrow a connection from `pool`, commit on success and roll back on errors.
+
+    Connections that broke (e.g. because the database restarted) are closed instead of being returned to the pool.
+    """
+    pool = pool if pool is not None else get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        # includes generators of `stream_query` that are closed before they are exhausted
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+def load_query(name):
+    """The sql template of `name`, it is read from disk again only after the file was modified."""
+    file_name = os.path.join(QUERY_PATH, name.replace(".sql", "") + ".sql")
+    mtime = os.stat(file_name).st_mtime_ns
+    cached = _QUERIES.get(file_name)
+    if cached is None or cached[0] != mtime:
+        with open(file_name) as q:
+            cached = _QUERIES[file_name] = (mtime, q.read())
+    return cached[1]
+
+
 def read_query(name, **kwargs):
-    with open(os.path.join(QUERY_PATH, name.replace(".sql", "") + ".sql")) as q:
-        sql = q.read().format(**kwargs)
+    """The sql of `name`, `kwargs` fill in identifiers like table names, values are passed as parameters instead."""
+    sql = load_query(name)
+    return sql.format(**kwargs) if kwargs else sql
+
 
-    return sql
+def to_prepared(sql):
+    """Replace the `%(name)s` parameters of `sql` by `$1`, `$2`, ... and return it with the names in order."""
+    names = []
 
+    def number(match):
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f"${names.index(match.group(1)) + 1}"
 
-def execute_read_query(sql):
+    return _PARAMETER.sub(number, sql).replace("%%", "%"), names
+
+
+def execute_prepared(cur, sql, params):
+    """Execute `sql` as a prepared statement, it is prepared once per connection and then only bound to `params`."""
+    prepared_sql, names = to_prepared(sql)
+    statement = f"q_{hashlib.sha1(sql.encode()).hexdigest()[:16]}"
+    prepared = _PREPARED.setdefault(cur.connection, set())
+    if statement not in prepared:
+        cur.execute(f"prepare {statement} as {prepared_sql}")
+        prepared.add(statement)
+    if names:
+        cur.execute(f"execute {statement} ({', '.join(['%s'] * len(names))})", [params[n] for n in names])
+    else:
+        cur.execute(f"execute {statement}")
+
+
+def execute_read_query(sql, params=None):
     try:
-        with connect() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(sql)
+                if params is None:
+                    cur.execute(sql)
+                else:
+                    execute_prepared(cur, sql, params)
                 res = cur.fetchall()
                 return res
 
@@ -34,27 +123,59 @@ def execute_read_query(sql):
         raise e
 
 
-def execute_write_query(sql):
+def execute_write_query(sql, params=None):
     try:
-        with connect() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(sql)
-                conn.commit()
+                if params is None:
+                    cur.execute(sql)
+                else:
+                    execute_prepared(cur, sql, params)
 
     except Exception as e:
         print("I am unable to connect to the database")
         raise e
 
 
-def run_query(name, mode="r", **kwargs):
+def run_query(name, mode="r", params=None, **kwargs):
+    """Run the query `name`, bound to the values in `params`.
+
+    Queries with parameters have to be a single statement, they are prepared on the server and reused.
+    """
     sql = read_query(name, **kwargs)
     if mode == "w":
-        execute_write_query(sql)
+        execute_write_query(sql, params)
     if mode == "r":
-        res = execute_read_query(sql)
+        res = execute_read_query(sql, params)
         return res
 
 
+def stream_query(name, params=None, chunksize=10_000, pool=None, **kwargs):
+    """Yield the rows of the query `name` in lists of at most `chunksize`, fetched through a server side cursor."""
+    sql = read_query(name, **kwargs)
+    with pooled_connection(pool) as conn:
+        with conn.cursor(name=f"stream_{name}") as cur:
+            cur.itersize = chunksize
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield rows
+
+
+def stream_readings(start=None, end=None, site=None, variable=None, table="raw_sensor_readings", chunksize=10_000,
+                    pool=None):
+    """Yield the readings taken in [start, end) as frames of at most `chunksize` rows, sorted by time."""
+    params = {"start": start, "end": end, "site": site, "variable": variable}
+    for rows in stream_query("select_readings", params, chunksize=chunksize, pool=pool, table=table):
+        yield pd.DataFrame(rows, columns=COLUMNS)
+
+
+from ._ingestion import Ingestor, ingest_file, copy_readings
+from ._sync import Sync
+
+
 if __name__ == "__main__":
     res = execute_read_query("select version()")
     print(res)
@@ -0,0 +1,115 @@
+import io
+import os
+import time
+import logging
+import psycopg2
+import pandas as pd
+from datetime import datetime
+from src.utilities import get_abs_path, EXIT_EVENT, ReadingBatch
+from src.database import pooled_connection
+from src.storage import COLUMNS, read_readings
+
+logger = logging.getLogger(__name__)
+# errors after which the database may be reachable again, everything else is a problem with the data or the query
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def copy_readings(cur, readings, table="raw_sensor_readings"):
+    buffer = io.StringIO()
+    # empty fields are loaded as null
+    if isinstance(readings, ReadingBatch):
+        readings.to_csv(buffer, header=False)
+    else:
+        readings[COLUMNS].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cur.copy_expert(f"copy {table} ({', '.join(COLUMNS)}) from stdin with (format csv)", buffer)
+
+
+class Ingestor:
+    """Loads batches of readings into `table` with `COPY FROM STDIN`, through a connection pool.
+
+    A batch that can't be loaded because the database is unreachable is retried `retries` times with exponential
+    backoff and then spooled to a csv file in `spool_dir`. Spooled batches are loaded before the next batch, oldest
+    first. `write` and `close` let the writers of `src.components` use an `Ingestor` like a file.
+    """
+
+    def __init__(self, table="raw_sensor_readings", spool_dir=get_abs_path("data", "spool"), retries=3, backoff=1,
+                 pool=None):
+        self.table = table
+        self.spool_dir = spool_dir
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = pool
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    @staticmethod
+    def to_frame(readings):
+        """A frame of readings from a frame, a `ReadingBatch` or a list of `Record`s."""
+        if isinstance(readings, ReadingBatch):
+            readings = readings.to_frame()
+        readings = readings if isinstance(readings, pd.DataFrame) else pd.DataFrame(readings)
+        return readings[COLUMNS]
+
+    def _copy(self, readings):
+        with pooled_connection(self.pool) as conn:
+            with conn.cursor() as cur:
+                copy_readings(cur, readings, self.table)
+
+    def _copy_with_retries(self, readings):
+        for i in range(self.retries):
+            try:
+                self._copy(readings)
+                return True
+            except CONNECTION_ERRORS as e:
+                logger.warning(f"could not load {len(readings)} reading(s) into {self.table}: {e}")
+                # on exit, spool the batch right away instead of backing off
+                if i + 1 < self.retries and EXIT_EVENT.wait(self.backoff * 2 ** i):
+                    break
+        return False
+
+    def get_spooled(self):
+        return sorted(os.path.join(self.spool_dir, name) for name in os.listdir(self.spool_dir)
+                      if name.endswith(".csv"))
+
+    def _spool(self, readings):
+        file_name = os.path.join(self.spool_dir, f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.csv")
+        # write to a temporary file first, such that a crash never leaves half a batch in the spool
+        readings.to_csv(f"{file_name}.tmp", index=False)
+        os.replace(f"{file_name}.tmp", file_name)
+        logger.warning(f"spooled {len(readings)} reading(s) to {file_name}.")
+
+    def flush_spool(self):
+        """Load the spooled batches, return whether the spool is empty afterwards."""
+        for file_name in self.get_spooled():
+            if not self._copy_with_retries(pd.read_csv(file_name, parse_dates=["taken_at"])):
+                return False
+            os.remove(file_name)
+            logger.info(f"loaded spooled readings of {file_name}.")
+        return True
+
+    def ingest(self, readings):
+        """Load `readings` (see `to_frame`), return the number of rows loaded, 0 if spooled."""
+        readings = self.to_frame(readings)
+        if readings.empty:
+            return 0
+        # keep the order of the readings, a batch waits behind the spool
+        if self.flush_spool() and self._copy_with_retries(readings):
+            return len(readings)
+        self._spool(readings)
+        return 0
+
+    def write(self, readings):
+        self.ingest(readings)
+
+    def close(self):
+        pass
+
+
+def ingest_file(path, start=None, end=None, batch_size=10_000, ingestor=None):
+    """Load the readings of a csv file or a `PartitionedStore` taken in [start, end] in batches."""
+    ingestor = ingestor if ingestor is not None else Ingestor()
+    readings = read_readings(path, start=start, end=end)
+    rows = 0
+    for i in range(0, len(readings), batch_size):
+        rows += ingestor.ingest(readings.iloc[i:i + batch_size])
+    return rows
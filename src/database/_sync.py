@@ -0,0 +1,79 @@
+import os
+import logging
+from src.database import pooled_connection
+from src.database._ingestion import copy_readings
+from src.storage import PartitionedStore, is_csv, read_csv_from, read_records_from
+
+logger = logging.getLogger(__name__)
+
+
+class Sync:
+    """Uploads the readings appended to a csv file or the partitions of a `PartitionedStore` since the last sync.
+
+    The number of synced bytes per file is kept in `sync_offsets` and updated in the same transaction as the rows of
+    the batch. An interrupted sync is rolled back as a whole and the next one continues after the last committed
+    batch, hence no reading is uploaded twice. Offsets instead of the latest `taken_at` also catch readings that were
+    written out of order by concurrent writers.
+    """
+
+    def __init__(self, path, table="raw_sensor_readings", batch_size=50_000, pool=None):
+        self.path = path
+        self.table = table
+        self.batch_size = batch_size
+        self.pool = pool
+
+    def get_files(self):
+        return [self.path] if is_csv(self.path) else PartitionedStore(self.path).get_partitions()
+
+    @staticmethod
+    def get_source(file_name):
+        return os.path.abspath(file_name)
+
+    def get_offsets(self):
+        with pooled_connection(self.pool) as conn:
+            with conn.cursor() as cur:
+                cur.execute("select source, synced_bytes from sync_offsets")
+                return dict(cur.fetchall())
+
+    def _read(self, file_name, offset):
+        if is_csv(self.path):
+            # rows of the csv are about 80 bytes long
+            return read_csv_from(file_name, offset, max_bytes=80 * self.batch_size)
+        return read_records_from(file_name, offset, max_records=self.batch_size)
+
+    def _commit(self, source, offset, new_offset, readings):
+        with pooled_connection(self.pool) as conn:
+            with conn.cursor() as cur:
+                copy_readings(cur, readings, self.table)
+                cur.execute("insert into sync_offsets (source, synced_bytes) values (%s, %s) "
+                            "on conflict (source) do update set synced_bytes = excluded.synced_bytes, updated_at = now() "
+                            "where sync_offsets.synced_bytes = %s",
+                            (source, new_offset, offset))
+                if cur.rowcount != 1:
+                    # another sync committed the same batch in the meantime, roll back ours
+                    raise RuntimeError(f"offset of {source} changed during the sync.")
+
+    def sync_file(self, file_name, offset=0):
+        """Upload the new readings of a single file batch by batch, return the number of uploaded readings."""
+        source = self.get_source(file_name)
+        rows = 0
+        while True:
+            readings, new_offset = self._read(file_name, offset)
+            if readings is None:
+                break
+            self._commit(source, offset, new_offset, readings)
+            rows += len(readings)
+            offset = new_offset
+        return rows
+
+    def sync(self):
+        """Upload the readings of all files that were appended since the last sync."""
+        offsets = self.get_offsets()
+        rows = 0
+        for file_name in self.get_files():
+            offset = offsets.get(self.get_source(file_name), 0)
+            if offset == os.path.getsize(file_name):
+                continue
+            rows += self.sync_file(file_name, offset)
+        logger.info(f"synced {rows} reading(s) of {self.path} to {self.table}.")
+        return rows
@@ -0,0 +1,340 @@
+import io
+import os
+import logging
+from collections import deque
+import numpy as np
+import pandas as pd
+from src.utilities import ReadingBatch, SYMBOLS
+
+COLUMNS = ["site", "taken_at", "sensor", "variable", "unit", "value"]
+# one fixed width record per reading, such that partitions can be appended to and read without parsing
+READING_DTYPE = np.dtype([("taken_at", "datetime64[us]"),
+                          ("site", "S32"),
+                          ("sensor", "S8"),
+                          ("variable", "S16"),
+                          ("unit", "S4"),
+                          ("value", "f8")])
+STRING_COLUMNS = ["site", "sensor", "variable", "unit"]
+FORMATS = {"D": "%Y-%m-%d", "H": "%Y-%m-%dT%H"}
+SUFFIX = ".bin"
+STORE_SUFFIX = ".store"
+logger = logging.getLogger(__name__)
+
+
+def to_records(readings):
+    """Convert a `ReadingBatch` or a frame of readings (the fields of `Record`) to an array of `READING_DTYPE`."""
+    if isinstance(readings, ReadingBatch):
+        return batch_to_records(readings)
+    records = np.empty(len(readings), dtype=READING_DTYPE)
+    records["taken_at"] = pd.to_datetime(readings.taken_at).to_numpy("datetime64[us]")
+    for column in STRING_COLUMNS:
+        encoded = readings[column].astype(str).str.encode("utf-8")
+        width = READING_DTYPE[column].itemsize
+        if len(encoded) and encoded.str.len().max() > width:
+            raise ValueError(f"values of `{column}` must not be longer than {width} bytes.")
+        records[column] = encoded.to_numpy()
+    records["value"] = pd.to_numeric(readings.value, errors="coerce")
+    return records
+
+
+def batch_to_records(batch):
+    records = np.empty(len(batch), dtype=READING_DTYPE)
+    records["taken_at"] = (batch.taken_at // 1000).astype("datetime64[us]")
+    names = np.array([name.encode("utf-8") for name in SYMBOLS.names])
+    for column in STRING_COLUMNS:
+        width = READING_DTYPE[column].itemsize
+        if len(batch) and max(len(name) for name in names[np.unique(batch.data[column])]) > width:
+            raise ValueError(f"values of `{column}` must not be longer than {width} bytes.")
+        records[column] = names[batch.data[column]]
+    records["value"] = batch.value
+    return records
+
+
+def from_records(records):
+    return pd.DataFrame({column: (np.char.decode(records[column], "utf-8") if column in STRING_COLUMNS
+                                  else records[column])
+                         for column in COLUMNS}).astype({"taken_at": "datetime64[ns]"})
+
+
+class PartitionedStore:
+    """Readings in binary files of `READING_DTYPE` records, one file per day (`freq="D"`) or hour (`freq="H"`).
+
+    Partitions are named after the start of their period, hence readers only open the files of the range they need.
+    Files are only ever appended to, a record that was cut off by a crash is ignored. With `rollups`, every write also
+    updates the `Rollups` in the `rollups` directory of the store.
+    """
+
+    def __init__(self, path, freq="D", rollups=False):
+        assert freq in FORMATS, f"`freq` must be one of {list(FORMATS)}."
+        self.path = path
+        self.freq = freq
+        self.rollups = Rollups(get_rollups_path(self.path)) if rollups else None
+
+    def get_partitions(self, start=None, end=None):
+        """Files of the partitions that overlap [start, end], sorted by time."""
+        partitions = []
+        for name in os.listdir(self.path) if os.path.isdir(self.path) else []:
+            if not name.endswith(SUFFIX):
+                continue
+            period_start = pd.Timestamp(name[:-len(SUFFIX)])
+            # partitions written with a different `freq` can be mixed with the current ones
+            period_end = period_start + pd.Timedelta(hours=1 if "T" in name else 24)
+            after_start = start is None or period_end > pd.Timestamp(start)
+            before_end = end is None or period_start <= pd.Timestamp(end)
+            if after_start and before_end:
+                partitions.append((period_start, os.path.join(self.path, name)))
+        return [file_name for _, file_name in sorted(partitions)]
+
+    def write(self, readings, sync=True):
+        """Append a frame of readings to the partitions of their `taken_at`."""
+        if readings.empty:
+            return
+        records = to_records(readings)
+        # only writers create the directory, readers of a missing store get no readings
+        os.makedirs(self.path, exist_ok=True)
+        keys = pd.DatetimeIndex(records["taken_at"]).strftime(FORMATS[self.freq])
+        for key in np.unique(keys):
+            with open(os.path.join(self.path, f"{key}{SUFFIX}"), "ab") as f:
+                f.write(records[keys == key].tobytes())
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        if self.rollups is not None:
+            self.rollups.update(from_records(records))
+
+    def read(self, start=None, end=None):
+        """All readings taken in [start, end], sorted by `taken_at`."""
+        chunks = []
+        for file_name in self.get_partitions(start, end):
+            count = os.path.getsize(file_name) // READING_DTYPE.itemsize
+            chunks.append(np.fromfile(file_name, dtype=READING_DTYPE, count=count))
+        records = np.concatenate(chunks) if chunks else np.empty(0, dtype=READING_DTYPE)
+        mask = np.ones(len(records), dtype=bool)
+        if start is not None:
+            mask &= records["taken_at"] >= np.datetime64(pd.Timestamp(start))
+        if end is not None:
+            mask &= records["taken_at"] <= np.datetime64(pd.Timestamp(end))
+        records = records[mask]
+        return from_records(records[np.argsort(records["taken_at"], kind="stable")])
+
+    def close(self):
+        pass
+
+
+class CsvFile:
+    """Appends frames to a csv file through a single file handle, the header is only written to empty files."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a", newline="")
+        self.header = self.file.tell() == 0
+
+    def write(self, readings, sync=True):
+        readings.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def is_store(path):
+    """Whether `path` is a `PartitionedStore`, i.e. an existing directory or a path ending in `.store`."""
+    return path.rstrip("/").endswith(STORE_SUFFIX) or os.path.isdir(path)
+
+
+def is_csv(path):
+    return not is_store(path)
+
+
+def is_database(path):
+    return path.startswith("postgresql:")
+
+
+def open_storage(path):
+    """A `CsvFile`, a `PartitionedStore` or, for `postgresql:<table>`, an `Ingestor` to `write(readings)` to.
+
+    Only a `PartitionedStore` updates its `Rollups` on every write. Csv files also hold the decisions of controllers,
+    which are no readings, the rollups of a csv file of readings are computed with `rebuild_rollups`.
+    """
+    if is_database(path):
+        # only import the database driver if it is used
+        from src.database import Ingestor
+        return Ingestor(table=path.split(":", 1)[1])
+    return CsvFile(path) if is_csv(path) else PartitionedStore(path, rollups=True)
+
+
+def read_readings(path, start=None, end=None):
+    """Readings taken in [start, end] from either a csv file or a `PartitionedStore` at `path`."""
+    if not is_csv(path):
+        return PartitionedStore(path).read(start, end)
+    readings = pd.read_csv(path, parse_dates=["taken_at"])
+    if start is not None:
+        readings = readings.loc[readings.taken_at >= pd.Timestamp(start)]
+    if end is not None:
+        readings = readings.loc[readings.taken_at <= pd.Timestamp(end)]
+    return readings.reset_index(drop=True)
+
+
+def migrate_csv(csv_path, path, freq="D", chunksize=100_000):
+    """Copy the readings of a csv file into a `PartitionedStore` at `path`, chunk by chunk."""
+    store = PartitionedStore(path, freq=freq)
+    rows = 0
+    for chunk in pd.read_csv(csv_path, parse_dates=["taken_at"], chunksize=chunksize):
+        store.write(chunk[COLUMNS], sync=False)
+        rows += len(chunk)
+    return rows
+
+
+def read_csv_from(path, offset=0, max_bytes=-1):
+    """The complete rows a csv file holds after byte `offset`, at most `max_bytes` of them, and the offset after them.
+
+    A row that is only partially written yet is left for the next call. A file that got shorter than `offset` was
+    replaced (e.g. rotated), it is read from the start again.
+    """
+    if os.path.getsize(path) < offset:
+        logger.warning(f"{path} got shorter than {offset} bytes, reading it from the start again.")
+        offset = 0
+    with open(path, "rb") as f:
+        header = f.readline()
+        if not header.endswith(b"\n"):
+            return None, offset
+        offset = max(offset, len(header))
+        f.seek(offset)
+        data = f.read(max_bytes)
+    data = data[:data.rfind(b"\n") + 1]
+    if not data:
+        return None, offset
+    columns = header.decode().strip().split(",")
+    return pd.read_csv(io.BytesIO(data), names=columns, parse_dates=["taken_at"]), offset + len(data)
+
+
+def seek_csv(path, window, block_size=1 << 16):
+    """The offset of the first row of a csv file (sorted by time) within `window` of its last row.
+
+    Blocks before the end of the file are read, each twice as large as the one before, until the first row of a block
+    is older than the window. Hence only about twice the rows of the window are read, no matter how large the file is.
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        if not header.endswith(b"\n"):
+            return 0
+        column = header.decode().strip().split(",").index("taken_at")
+        size = f.seek(0, os.SEEK_END)
+        while True:
+            start = max(size - block_size, len(header))
+            f.seek(start)
+            data = f.read(size - start)
+            # the first row of a block is usually cut off
+            skip = data.find(b"\n") + 1 if start > len(header) else 0
+            rows = data[skip:].split(b"\n")[:-1]
+            if start == len(header):
+                return start
+            if rows:
+                first, last = (pd.Timestamp(row.split(b",")[column].decode()) for row in (rows[0], rows[-1]))
+                if first <= last - window:
+                    return start + skip
+            block_size *= 2
+
+
+def read_records_from(path, offset=0, max_records=-1):
+    """The readings a partition holds after byte `offset`, at most `max_records` of them, and the offset after them."""
+    count = (os.path.getsize(path) - offset) // READING_DTYPE.itemsize
+    count = min(count, max_records) if max_records >= 0 else count
+    if count <= 0:
+        return None, offset
+    records = np.fromfile(path, dtype=READING_DTYPE, count=count, offset=offset)
+    return from_records(records), offset + count * READING_DTYPE.itemsize
+
+
+class ReadingsTail:
+    """Reads only the readings appended to a csv file or a `PartitionedStore` since the last `update`.
+
+    The readings of the last `window` (relative to the latest reading) are kept in a ring of chunks, together with the
+    sums and counts of their values per minute, site and variable. Hence an update costs as much as the newly
+    appended rows and the window, no matter how large the file has grown. The first update only reads the end of the
+    file (or the last partitions) that covers the window. A csv file that got shorter is tailed from its end again.
+    """
+    keys = ["taken_at", "site", "variable", "unit"]
+
+    def __init__(self, path, window=pd.Timedelta(days=2)):
+        self.path = path
+        self.window = window
+        # bytes consumed per file
+        self.offsets = {}
+        self._reset()
+
+    def _reset(self):
+        self.chunks = deque()
+        self.latest = None
+        self.minutes = pd.DataFrame(columns=["sum", "count"], dtype=float,
+                                    index=pd.MultiIndex.from_tuples([], names=self.keys))
+
+    def _read_csv(self):
+        if not os.path.exists(self.path):
+            return None
+        offset = self.offsets.get(self.path)
+        if offset is not None and os.path.getsize(self.path) < offset:
+            logger.warning(f"{self.path} got shorter than {offset} bytes, tailing it from its end again.")
+            self._reset()
+            offset = None
+        if offset is None:
+            offset = seek_csv(self.path, self.window)
+        new, self.offsets[self.path] = read_csv_from(self.path, offset)
+        return new
+
+    def _read_store(self):
+        if self.latest is not None:
+            start = self.latest - self.window
+        else:
+            # the latest reading is in the last partition, hence after its start
+            partitions = PartitionedStore(self.path).get_partitions()
+            if not partitions:
+                return None
+            start = pd.Timestamp(os.path.basename(partitions[-1])[:-len(SUFFIX)]) - self.window
+        chunks = []
+        for file_name in PartitionedStore(self.path).get_partitions(start=start):
+            new, self.offsets[file_name] = read_records_from(file_name, self.offsets.get(file_name, 0))
+            if new is not None:
+                chunks.append(new)
+        return pd.concat(chunks, ignore_index=True) if chunks else None
+
+    def update(self):
+        """Read the new readings, move the window forward and return the number of new readings."""
+        new = self._read_csv() if is_csv(self.path) else self._read_store()
+        if new is None or new.empty:
+            return 0
+        self.chunks.append(new)
+        latest = new.taken_at.max()
+        self.latest = latest if self.latest is None else max(self.latest, latest)
+        start = self.latest - self.window
+
+        while self.chunks and self.chunks[0].taken_at.max() <= start:
+            self.chunks.popleft()
+        if self.chunks:
+            self.chunks[0] = self.chunks[0].loc[self.chunks[0].taken_at > start]
+
+        minutes = (new
+                   .assign(taken_at=lambda x: x.taken_at.dt.round("min"))
+                   .groupby(self.keys)
+                   .value
+                   .agg(["sum", "count"]))
+        self.minutes = self.minutes.add(minutes, fill_value=0)
+        self.minutes = self.minutes.loc[self.minutes.index.get_level_values("taken_at") > start]
+        return len(new)
+
+    def get_readings(self):
+        """The readings within the window."""
+        if not self.chunks:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(list(self.chunks), ignore_index=True)
+
+    def get_averages(self):
+        """Mean value per minute, site and variable within the window."""
+        averages = self.minutes["sum"] / self.minutes["count"]
+        return averages.rename("value").reset_index()
+
+
+from ._rollups import Rollups, TIERS, get_tier, get_rollups_path, rebuild_rollups
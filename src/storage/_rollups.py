@@ -0,0 +1,184 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from src.storage import PartitionedStore, READING_DTYPE, STRING_COLUMNS, SUFFIX, is_csv, read_records_from
+
+KEYS = ["taken_at", "site", "sensor", "variable", "unit"]
+# resolution of a tier and the period of its partition files
+TIERS = {"1min": ("min", "D"), "1h": ("h", "M"), "1d": ("D", "Y")}
+PERIOD_FORMATS = {"D": "%Y-%m-%d", "M": "%Y-%m", "Y": "%Y"}
+# `taken_at` is the start of the bucket, `last` the value taken at `last_at`, the latest reading of the bucket
+ROLLUP_DTYPE = np.dtype([*[(key, READING_DTYPE[key]) for key in KEYS],
+                         ("count", "i8"),
+                         ("min", "f8"),
+                         ("max", "f8"),
+                         ("sum", "f8"),
+                         ("last", "f8"),
+                         ("last_at", "datetime64[us]")])
+OPEN = "open"
+
+
+def aggregate(readings, resolution):
+    """Partial rollups of a frame of readings per bucket of `resolution`, failed reads are left out."""
+    readings = readings.loc[readings.value.notna()]
+    return (readings
+            .assign(taken_at=readings.taken_at.dt.floor(resolution), last_at=readings.taken_at)
+            .sort_values("last_at", kind="stable")
+            .groupby(KEYS, observed=True)
+            .agg(count=("value", "count"), min=("value", "min"), max=("value", "max"), sum=("value", "sum"),
+                 last=("value", "last"), last_at=("last_at", "last"))
+            .reset_index())
+
+
+def combine(partials):
+    """Merge the partial rollups of the same bucket, e.g. of several writes or of a restart."""
+    if partials.empty:
+        return partials
+    return (partials
+            .sort_values("last_at", kind="stable")
+            .groupby(KEYS, observed=True)
+            .agg({"count": "sum", "min": "min", "max": "max", "sum": "sum", "last": "last", "last_at": "last"})
+            .reset_index())
+
+
+def to_rollup_records(rollups):
+    records = np.empty(len(rollups), dtype=ROLLUP_DTYPE)
+    for column in ROLLUP_DTYPE.names:
+        values = rollups[column]
+        if column in STRING_COLUMNS:
+            values = values.astype(str).str.encode("utf-8")
+        records[column] = values.to_numpy()
+    return records
+
+
+def from_rollup_records(records):
+    return pd.DataFrame({column: (np.char.decode(records[column], "utf-8") if column in STRING_COLUMNS
+                                  else records[column])
+                         for column in ROLLUP_DTYPE.names}).astype({"taken_at": "datetime64[ns]",
+                                                                     "last_at": "datetime64[ns]"})
+
+
+def read_rollup_records(file_name):
+    # a record that was cut off by a crash is ignored
+    return np.fromfile(file_name, dtype=ROLLUP_DTYPE, count=os.path.getsize(file_name) // ROLLUP_DTYPE.itemsize)
+
+
+class Rollups:
+    """Min, max, mean, count and last value per site, sensor and variable in buckets of 1 minute, 1 hour and 1 day.
+
+    Every tier is a directory of binary files of `ROLLUP_DTYPE` below `path`. `update` aggregates new readings into
+    the open buckets. Buckets the readings have moved past are appended to the partition files of their tier, the open
+    ones are rewritten to `open.bin` after every update, such that readers see them as well. Readings that arrive after
+    their bucket was closed add another row for it, `read` merges the rows of a bucket. A crash can lose or repeat the
+    last update of the open buckets, `rebuild_rollups` recomputes all tiers from the raw readings.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.latest = None
+        self.open = {}
+        for tier in TIERS:
+            self.open[tier] = self._read_open(tier)
+
+    def _get_file_name(self, tier, name):
+        return os.path.join(self.path, tier, f"{name}{SUFFIX}")
+
+    def _read_open(self, tier):
+        file_name = self._get_file_name(tier, OPEN)
+        if not os.path.exists(file_name):
+            return from_rollup_records(np.empty(0, dtype=ROLLUP_DTYPE))
+        return from_rollup_records(read_rollup_records(file_name))
+
+    def _write_open(self, tier):
+        file_name = self._get_file_name(tier, OPEN)
+        # directories are only created by writers, readers of a store without rollups leave it as it is
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        # replace the file at once, such that readers never see half of it
+        to_rollup_records(self.open[tier]).tofile(f"{file_name}.tmp")
+        os.replace(f"{file_name}.tmp", file_name)
+
+    def _append(self, tier, rollups):
+        records = to_rollup_records(rollups)
+        keys = pd.DatetimeIndex(records["taken_at"]).strftime(PERIOD_FORMATS[TIERS[tier][1]])
+        os.makedirs(os.path.join(self.path, tier), exist_ok=True)
+        for key in np.unique(keys):
+            with open(self._get_file_name(tier, key), "ab") as f:
+                f.write(records[keys == key].tobytes())
+
+    def update(self, readings):
+        """Add a frame of readings (see `from_records`) to all tiers."""
+        readings = readings.loc[readings.value.notna()]
+        if readings.empty:
+            return
+        latest = readings.taken_at.max()
+        self.latest = latest if self.latest is None else max(self.latest, latest)
+        for tier, (resolution, _) in TIERS.items():
+            rollups = combine(pd.concat([self.open[tier], aggregate(readings, resolution)], ignore_index=True))
+            closed = rollups.taken_at < self.latest.floor(resolution)
+            if closed.any():
+                self._append(tier, rollups.loc[closed])
+            self.open[tier] = rollups.loc[~closed].reset_index(drop=True)
+            self._write_open(tier)
+
+    def get_modified(self):
+        """The modification time of the open buckets, it changes with every update, `None` before the first one."""
+        try:
+            return os.stat(self._get_file_name(next(iter(TIERS)), OPEN)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def get_partitions(self, tier, start=None, end=None):
+        """Files of the partitions of `tier` that overlap [start, end], sorted by time."""
+        freq = TIERS[tier][1]
+        partitions = []
+        directory = os.path.join(self.path, tier)
+        for name in os.listdir(directory) if os.path.isdir(directory) else []:
+            if not name.endswith(SUFFIX) or name == f"{OPEN}{SUFFIX}":
+                continue
+            period = pd.Period(name[:-len(SUFFIX)], freq=freq)
+            after_start = start is None or period.end_time >= pd.Timestamp(start)
+            before_end = end is None or period.start_time <= pd.Timestamp(end)
+            if after_start and before_end:
+                partitions.append((period.start_time, os.path.join(self.path, tier, name)))
+        return [file_name for _, file_name in sorted(partitions)] + [self._get_file_name(tier, OPEN)]
+
+    def read(self, tier, start=None, end=None):
+        """The buckets of `tier` that start in [start, end], with their `mean`, sorted by time."""
+        chunks = [read_rollup_records(file_name) for file_name in self.get_partitions(tier, start, end)
+                  if os.path.exists(file_name)]
+        rollups = combine(from_rollup_records(np.concatenate(chunks) if chunks else np.empty(0, dtype=ROLLUP_DTYPE)))
+        if start is not None:
+            rollups = rollups.loc[rollups.taken_at >= pd.Timestamp(start).floor(TIERS[tier][0])]
+        if end is not None:
+            rollups = rollups.loc[rollups.taken_at <= pd.Timestamp(end)]
+        return rollups.assign(mean=rollups["sum"] / rollups["count"]).reset_index(drop=True)
+
+
+def get_tier(start, end, max_buckets=5000):
+    """The finest tier with at most `max_buckets` buckets per sensor and variable in [start, end]."""
+    for tier, (resolution, _) in TIERS.items():
+        if (pd.Timestamp(end) - pd.Timestamp(start)) / pd.Timedelta(1, resolution) <= max_buckets:
+            return tier
+    return tier
+
+
+def get_rollups_path(path):
+    """The rollups of a `PartitionedStore` live in its directory, those of a csv file next to it."""
+    return f"{os.path.splitext(path)[0]}_rollups" if is_csv(path) else os.path.join(path, "rollups")
+
+
+def rebuild_rollups(path):
+    """Recompute the rollups of the readings in the csv file or `PartitionedStore` at `path`, return their path."""
+    rollups_path = get_rollups_path(path)
+    shutil.rmtree(rollups_path, ignore_errors=True)
+    rollups = Rollups(rollups_path)
+    if is_csv(path):
+        for chunk in pd.read_csv(path, parse_dates=["taken_at"], chunksize=100_000):
+            rollups.update(chunk)
+    else:
+        for file_name in PartitionedStore(path).get_partitions():
+            readings, _ = read_records_from(file_name)
+            if readings is not None:
+                rollups.update(readings)
+    return rollups_path
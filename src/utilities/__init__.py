@@ -1,3 +1,3 @@
 from ._general import get_abs_path, CONFIG, EXIT_EVENT, interrupt_handler, clear, get_logger, LOG_LEVELS
-from ._datatypes import Record
+from ._datatypes import Record, ReadingBatch, SYMBOLS, VAR_SYNONYMS, now_ns
 
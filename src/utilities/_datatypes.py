@@ -1,6 +1,27 @@
-from datetime import datetime
+import io
+import csv
+import time
+import threading
+import numpy as np
+from datetime import datetime, timedelta
 from dataclasses import dataclass
 
+# different sensors can have different names for the same variable
+VAR_SYNONYMS = {
+    "relative_humidity": "humidity",
+    "CO2": "co2"
+}
+EPOCH = datetime(1970, 1, 1)
+
+
+def now_ns():
+    # nanoseconds since the epoch of the local wall clock, the same naive local time as `datetime.now()`
+    return time.time_ns() + time.localtime().tm_gmtoff * 1_000_000_000
+
+
+def from_ns(ns):
+    return EPOCH + timedelta(microseconds=int(ns) // 1000)
+
 
 @dataclass
 class Record:
@@ -11,16 +32,12 @@ class Record:
     unit: str
     value: float
 
-    def __init__(self, site, sensor, variable, unit, value):
-        self.var_synonyms = {
-            "relative_humidity": "humidity",
-            "CO2": "co2"
-        }
+    def __init__(self, site, sensor, variable, unit, value, taken_at=None):
         self.site = site
-        self.taken_at = datetime.now()
+        self.taken_at = taken_at if taken_at is not None else datetime.now()
         self.sensor = sensor
         # different sensors can have different names for the same variable
-        self.variable = self.var_synonyms.get(variable, variable)
+        self.variable = VAR_SYNONYMS.get(variable, variable)
         self.unit = unit
         self.value = value
 
@@ -31,3 +48,133 @@ class Record:
         by_part = f"by sensor {self.sensor}"
 
         return f"{var_part} {val_part} {taken_at_part} {by_part}"
+
+
+class Symbols:
+    """Interns the strings of readings (sites, sensors, variables and units), every string gets a small integer code.
+
+    Codes only grow and are never reused, hence they stay valid for the lifetime of the process.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+        self.lock = threading.Lock()
+
+    def intern(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(name)
+                if code is None:
+                    code = self.codes[name] = len(self.names)
+                    self.names.append(name)
+        return code
+
+    def decode(self, codes):
+        return np.array(self.names, dtype=object)[codes]
+
+
+SYMBOLS = Symbols()
+BATCH_DTYPE = np.dtype([("taken_at", "i8"),
+                        ("site", "u4"),
+                        ("sensor", "u4"),
+                        ("variable", "u4"),
+                        ("unit", "u4"),
+                        ("value", "f8")])
+
+
+class ReadingBatch:
+    """Readings in a single structured array of `BATCH_DTYPE`.
+
+    Strings are stored as codes of `SYMBOLS`, `taken_at` as nanoseconds since the epoch of the local time and failed
+    reads as `nan`. Columns are available as arrays (e.g. `batch.value`), single readings as `Record`s.
+    """
+
+    __slots__ = ("data",)
+    columns = ["site", "taken_at", "sensor", "variable", "unit", "value"]
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def from_values(cls, site, sensor, variables, units, values, taken_at=None):
+        """The readings of `variables` on one sensor, all of them taken at `taken_at` (now by default)."""
+        data = np.empty(len(variables), dtype=BATCH_DTYPE)
+        data["taken_at"] = taken_at if taken_at is not None else now_ns()
+        data["site"] = SYMBOLS.intern(site)
+        data["sensor"] = SYMBOLS.intern(sensor)
+        data["variable"] = [SYMBOLS.intern(VAR_SYNONYMS.get(var, var)) for var in variables]
+        data["unit"] = [SYMBOLS.intern(unit) for unit in units]
+        data["value"] = [np.nan if value is None else value for value in values]
+        return cls(data)
+
+    @classmethod
+    def concat(cls, batches):
+        return cls(np.concatenate([batch.data for batch in batches]) if batches else np.empty(0, dtype=BATCH_DTYPE))
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def empty(self):
+        return len(self.data) == 0
+
+    def __getitem__(self, i):
+        row = self.data[i]
+        value = float(row["value"])
+        return Record(SYMBOLS.names[row["site"]], SYMBOLS.names[row["sensor"]], SYMBOLS.names[row["variable"]],
+                      SYMBOLS.names[row["unit"]], None if np.isnan(value) else value, taken_at=from_ns(row["taken_at"]))
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getattr__(self, column):
+        # `batch.value`, `batch.taken_at`, ... are views of the columns
+        if column in BATCH_DTYPE.names:
+            return self.data[column]
+        raise AttributeError(column)
+
+    def to_frame(self):
+        """A frame with `Record`'s columns, strings become categoricals of the codes and `taken_at` a datetime."""
+        import pandas as pd
+        categories = list(SYMBOLS.names)
+        return pd.DataFrame({column: (self.data[column].view("datetime64[ns]") if column == "taken_at"
+                                      else self.data[column] if column == "value"
+                                      else pd.Categorical.from_codes(self.data[column], categories))
+                             for column in self.columns})
+
+    def _get_rows(self):
+        names = np.array(SYMBOLS.names, dtype=object)
+        # the format of `to_frame().to_csv` in microseconds (the precision of postgres), nothing for failed reads
+        taken_at = np.datetime_as_string(self.data["taken_at"].view("datetime64[ns]").astype("datetime64[us]"))
+        taken_at = np.char.replace(taken_at, "T", " ")
+        values = self.data["value"]
+        values = np.where(np.isnan(values), "", values.astype(str))
+        return zip(names[self.data["site"]], taken_at, names[self.data["sensor"]], names[self.data["variable"]],
+                   names[self.data["unit"]], values)
+
+    def to_csv(self, path_or_buf=None, header=True, index=False):
+        """Write the readings as csv straight from the array, `index` is only accepted for the frames' signature."""
+        if path_or_buf is None:
+            buffer = io.StringIO()
+            self.to_csv(buffer, header=header)
+            return buffer.getvalue()
+        if isinstance(path_or_buf, str):
+            with open(path_or_buf, "w", newline="") as f:
+                return self.to_csv(f, header=header)
+        writer = csv.writer(path_or_buf, lineterminator="\n")
+        if header:
+            writer.writerow(self.columns)
+        writer.writerows(self._get_rows())
+
+    def to_parquet(self, path, **kwargs):
+        """Write the readings as parquet straight from the array, strings become dictionary columns of the codes."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        dictionary = pa.array(SYMBOLS.names, type=pa.string())
+        arrays = [pa.array(self.data[column].view("datetime64[ns]")) if column == "taken_at"
+                  else pa.array(self.data[column], from_pandas=True) if column == "value"
+                  else pa.DictionaryArray.from_arrays(self.data[column].astype(np.int32), dictionary)
+                  for column in self.columns]
+        pq.write_table(pa.Table.from_arrays(arrays, names=self.columns), path, **kwargs)
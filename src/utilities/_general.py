@@ -4,22 +4,136 @@ import time
 import signal
 import threading
 import logging
-from configparser import ConfigParser, NoSectionError, NoOptionError
+from configparser import ConfigParser, SectionProxy, NoSectionError, NoOptionError
 from pathlib import Path
 
 
 EXIT_EVENT = threading.Event()
 _UNSET = object()
+logger = logging.getLogger(__name__)
+
+
+def _parse_hex(value):
+    return int(value, base=16)
+
+
+def _parse_int_list(value):
+    return [int(i) for i in value.split(",")]
 
 
 class MyConfigParser(ConfigParser):
-    def __init__(self, path, *args, **kwargs):
+    """Parses `path` once and caches the values returned by `get`, `getint`, `gethex`, ... and controller configs.
+
+    The file is parsed again only after its modification time or inode changed (checked at most every
+    `check_interval` seconds) or after a SIGHUP, see `hangup_handler`. Callbacks added with `subscribe` are called with
+    the parser after every reload. A reload parses into a new parser and swaps its sections in, such that readers in
+    other threads see either the old or the new config, never an empty one.
+    """
+
+    def __init__(self, path, *args, check_interval=1., **kwargs):
+        kwargs.setdefault("converters", {"hex": _parse_hex, "intlist": _parse_int_list})
         super().__init__(*args, **kwargs)
+        self._parser_args = args, kwargs
         self.path = path
-        self.read(self.path)
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._cache = {}
+        self._subscribers = []
+        self._stat = None
+        self._checked = time.monotonic()
+        self._stale = False
+        self.reload(force=True)
+
+    def _get_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def reload(self, force=False):
+        """Parse the file again if it changed, or if `force` is set, and return whether it was parsed."""
+        with self._lock:
+            self._stale = False
+            stat = self._get_stat()
+            if not force and stat == self._stat:
+                return False
+            try:
+                with open(self.path) as f:
+                    text = f.read()
+            except FileNotFoundError:
+                text = ""
+            parser = ConfigParser(*self._parser_args[0], **self._parser_args[1])
+            parser.optionxform = self.optionxform
+            parser.read_string(text, source=self.path)
+            proxies = {name: SectionProxy(self, name) for name in [self.default_section, *parser.sections()]}
+            self._sections, self._defaults, self._proxies, self._cache = (parser._sections, parser._defaults, proxies,
+                                                                          {})
+            self._stat = stat
+        for callback in list(self._subscribers):
+            try:
+                callback(self)
+            except Exception:
+                # one broken subscriber must neither keep the others from the new config nor stop the watcher
+                logger.exception(f"subscriber {callback} failed to apply the reloaded config.")
+        return True
+
+    def check(self):
+        now = time.monotonic()
+        if not self._stale and now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+        return self.reload(force=self._stale)
+
+    def hangup_handler(self, signum, frame):
+        # only mark the config, it is parsed by the next `check` outside of the signal handler
+        self._stale = True
+        self._checked = 0.
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def watch(self, interval=5.):
+        """Check the file in a background thread, such that subscribers learn about changes nobody asked for yet."""
+        def check_until_exit():
+            while not EXIT_EVENT.wait(interval):
+                self.check()
+
+        thread = threading.Thread(target=check_until_exit, name="config-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def _memoize(self, key, compute):
+        self.check()
+        cache = self._cache
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        with self._lock:
+            cache = self._cache
+            if key not in cache:
+                cache[key] = compute()
+            return cache[key]
 
     def get(self, section, option, *, raw=False, vars=None, fallback=_UNSET):
-        self.read(self.path)
+        self.check()
+        if vars is not None or not self.has_option(section, option):
+            return self._get_uncached(section, option, raw=raw, vars=vars, fallback=fallback)
+        return self._memoize(("get", section, self.optionxform(option), raw),
+                             lambda: self._get_uncached(section, option, raw=raw))
+
+    def _get(self, section, conv, option, **kwargs):
+        # `getint`, `getfloat`, `getboolean` and the getters of `converters` end up here
+        if kwargs.get("vars") is not None:
+            return conv(self.get(section, option, **kwargs))
+        return self._memoize((conv, section, self.optionxform(option), kwargs.get("raw", False)),
+                             lambda: conv(self.get(section, option, **kwargs)))
+
+    def _get_uncached(self, section, option, *, raw=False, vars=None, fallback=_UNSET):
         try:
             d = self._unify_values(section, vars)
         except NoSectionError:
@@ -43,12 +157,14 @@ class MyConfigParser(ConfigParser):
                                                   d)
 
     def get_controller_config(self, var):
-        self.read(self.path)
+        return dict(self._memoize(("controller", var), lambda: self._read_controller_config(var)))
+
+    def _read_controller_config(self, var):
         assert var in self.sections(), f"controller config for {var} not defined in `config.ini`"
         assert var not in ["GENERAL", "SENSORS", "DATABASE"], f"{var} is not a config for a controller."
         out = {
             "var": self.get(var, "var"),
-            "relays": [int(i) for i in self.get(var, "relays").split(",")],
+            "relays": self.getintlist(var, "relays"),
             "active_low": self.getboolean(var, "active_low"),
             "increases": self.getboolean(var, "increases", fallback=None),
             "target": self.getfloat(var, "target", fallback=None),
@@ -57,7 +173,8 @@ class MyConfigParser(ConfigParser):
             "active_min": self.getint(var, "active_min"),
             "active_max": self.getint(var, "active_max"),
             "unit": self.get(var, "unit"),
-            "file_name": self.get(var, "file_name", fallback=None)}
+            "file_name": self.get(var, "file_name", fallback=None),
+            "strategy": self.get(var, "strategy", fallback=None)}
         return out
 
 
@@ -72,9 +189,9 @@ def clear():
 def interrupt_handler(signum, frame):
     print(f'Handling signal {signum} ({signal.Signals(signum).name}).')
 
+    # every wait of the control and sampling loops is on `EXIT_EVENT` and returns right away, relays are disarmed and
+    # writers are flushed by the `finally` blocks and `atexit` handlers while the interpreter exits
     EXIT_EVENT.set()
-
-    time.sleep(1)
     sys.exit(0)
 
 
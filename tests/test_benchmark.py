@@ -0,0 +1,47 @@
+import os
+import json
+import argparse
+import unittest
+import tempfile
+from unittest import mock
+from analysis import benchmark_yields
+from analysis.benchmark_yields import main_suite, main_thresholds, main_compare
+
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.args = argparse.Namespace(history=os.path.join(self.tmp.name, "history.json"),
+                                       thresholds=os.path.join(self.tmp.name, "thresholds.json"),
+                                       cases=["pass_time", "harvest_and_remove"], sizes=["tiny"], run=-1)
+        self.sizes = mock.patch.dict(benchmark_yields.SIZES,
+                                     {"tiny": {"replications": 2, "weeks": 5, "capacity": 10, "blocks": 2}})
+        self.sizes.start()
+
+    def tearDown(self):
+        self.sizes.stop()
+        self.tmp.cleanup()
+
+    def test_history(self):
+        main_suite(self.args)
+        main_suite(self.args)
+        with open(self.args.history) as f:
+            history = json.load(f)
+        self.assertEqual(len(history), 2)
+        self.assertEqual([r["case"] for r in history[-1]["results"]], self.args.cases)
+        for result in history[-1]["results"]:
+            self.assertGreater(result["block_weeks_per_second"], 0)
+
+    def test_compare(self):
+        main_suite(self.args)
+        with self.subTest("within thresholds"):
+            main_thresholds(argparse.Namespace(**vars(self.args), factor=2.))
+            main_compare(self.args)
+        with self.subTest("exceeded thresholds"):
+            main_thresholds(argparse.Namespace(**vars(self.args), factor=0.5))
+            with self.assertRaises(SystemExit):
+                main_compare(self.args)
+
+
+if __name__ == '__main__':
+    unittest.main()
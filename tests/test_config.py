@@ -1,5 +1,25 @@
+import os
+import signal
+import threading
 import unittest
+import tempfile
+from unittest import mock
+from configparser import ConfigParser
 from src.utilities import CONFIG
+from src.utilities._general import MyConfigParser
+
+CONTROLLER = """
+[CONTROLLER_CO2]
+var = co2
+relays = 5,6
+active_low = true
+target = {target}
+margin = 0.1
+delay = 1
+active_min = 1
+active_max = 10
+unit = minutes
+"""
 
 
 class TestConfig(unittest.TestCase):
@@ -33,5 +53,82 @@ class TestConfig(unittest.TestCase):
                 self.assertFalse(CONFIG["DATABASE"][entry] == "")
 
 
+class TestMyConfigParser(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "config.ini")
+        self.write(target=800)
+        self.config = MyConfigParser(self.path, check_interval=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, target):
+        with open(self.path, "w") as f:
+            f.write("[SENSORS]\naddress_bh1750 = 0x23\n" + CONTROLLER.format(target=target))
+        # make sure the modification time changes, even on file systems with a coarse resolution
+        if hasattr(self, "config"):
+            os.utime(self.path, ns=(0, self.config._stat[1] + 1))
+
+    def test_typed_values(self):
+        self.assertEqual(self.config.gethex("SENSORS", "address_bh1750"), 0x23)
+        self.assertEqual(self.config.getintlist("CONTROLLER_CO2", "relays"), [5, 6])
+        self.assertEqual(self.config.get_controller_config("CONTROLLER_CO2")["target"], 800.)
+        self.assertEqual(self.config.getfloat("SENSORS", "missing", fallback=None), None)
+
+    def test_file_is_parsed_once(self):
+        with mock.patch.object(ConfigParser, "read_string") as parse:
+            for _ in range(10):
+                self.config.get_controller_config("CONTROLLER_CO2")
+                self.config.gethex("SENSORS", "address_bh1750")
+            parse.assert_not_called()
+
+    def test_reload(self):
+        callback = mock.Mock()
+        self.config.subscribe(callback)
+        with self.subTest("unchanged file is not parsed again"):
+            self.assertFalse(self.config.check())
+            callback.assert_not_called()
+        with self.subTest("changed file is parsed again and subscribers are notified"):
+            self.write(target=1000)
+            self.assertEqual(self.config.get_controller_config("CONTROLLER_CO2")["target"], 1000.)
+            callback.assert_called_once_with(self.config)
+        with self.subTest("SIGHUP forces a reload"):
+            self.config.hangup_handler(signal.SIGHUP, None)
+            self.assertTrue(self.config.check())
+            self.assertEqual(callback.call_count, 2)
+
+    def test_concurrent_reload(self):
+        errors = []
+
+        def read():
+            try:
+                for _ in range(2000):
+                    self.config.gethex("SENSORS", "address_bh1750")
+                    self.config.get_controller_config("CONTROLLER_CO2")
+            except Exception as e:
+                errors.append(e)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        while reader.is_alive():
+            self.config.reload(force=True)
+        reader.join()
+        self.assertEqual(errors, [])
+
+    def test_failing_subscriber(self):
+        callback = mock.Mock()
+        self.config.subscribe(mock.Mock(side_effect=AssertionError("section removed")))
+        self.config.subscribe(callback)
+        with self.assertLogs("src.utilities._general", level="ERROR"):
+            self.assertTrue(self.config.reload(force=True))
+        callback.assert_called_once_with(self.config)
+
+    def test_check_interval(self):
+        self.config.check_interval = 3600
+        self.write(target=1000)
+        self.assertEqual(self.config.get_controller_config("CONTROLLER_CO2")["target"], 800.)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import unittest
+from unittest import mock
+from src.components import Controller, Scheduler
+from src.utilities import EXIT_EVENT
+
+
+class FakeRelay:
+    def __init__(self):
+        self.status = False
+        self.switches = 0
+
+    def arm(self):
+        self.status = True
+        self.switches += 1
+
+    def disarm(self):
+        self.status = False
+
+
+def make_controller(active_min=1, active_max=10, delay=5):
+    return Controller([FakeRelay()], active_min=active_min, active_max=active_max, delay=delay)
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler()
+
+    def test_events(self):
+        on = make_controller()
+        off = make_controller()
+        self.scheduler.add(on, lambda **kwargs: (True, 3), start=0)
+        self.scheduler.add(off, lambda **kwargs: (False, 0), start=0)
+
+        with self.subTest("relays are switched on until their deadline"):
+            self.assertEqual(self.scheduler.run_pending(now=0), 3)
+            self.assertTrue(on.relays[0].status)
+            self.assertFalse(off.relays[0].status)
+        with self.subTest("relays are switched off at the deadline and the controller is evaluated again"):
+            with mock.patch.object(on, "disarm", wraps=on.disarm) as disarm:
+                self.assertEqual(self.scheduler.run_pending(now=3), 5)
+                disarm.assert_called_once()
+            self.assertEqual(on.relays[0].switches, 2)
+        with self.subTest("controllers that aren't switched on wait for their delay"):
+            self.assertEqual(self.scheduler.run_pending(now=5), 6)
+            self.assertEqual(self.scheduler.run_pending(now=6), 9)
+
+    def test_limits(self):
+        controller = make_controller(active_min=2, active_max=4)
+        self.scheduler.add(controller, lambda **kwargs: (True, 100), start=0)
+        self.assertEqual(self.scheduler.run_pending(now=0), 4)
+
+    def test_update(self):
+        controller = make_controller()
+        strategy = mock.Mock(return_value=(False, 0))
+        self.scheduler.add(controller, strategy, start=0, target=800)
+        self.scheduler.run_pending(now=0)
+        controller.update(delay=1, target=1000)
+        self.assertEqual(self.scheduler.run_pending(now=5), 6)
+        strategy.assert_called_with(target=1000)
+
+    def test_finished_and_broken_controllers_are_removed(self):
+        done = make_controller()
+        broken = make_controller()
+        self.scheduler.add(done, mock.Mock(side_effect=StopIteration), start=0)
+        self.scheduler.add(broken, mock.Mock(side_effect=RuntimeError("sensor unplugged")), start=0)
+        with self.assertLogs("src.components.controller", level="ERROR"):
+            self.assertIsNone(self.scheduler.run_pending(now=0))
+        self.assertEqual(self.scheduler.strategies, {})
+
+    def test_single_thread(self):
+        controllers = [make_controller(active_min=0.01, delay=0.01) for _ in range(50)]
+        calls = []
+        threads = set()
+
+        def strategy(**kwargs):
+            calls.append(1)
+            threads.add(threading.get_ident())
+            if len(calls) >= 500:
+                raise StopIteration
+            return len(calls) % 2 == 0, 0.01
+
+        for controller in controllers:
+            self.scheduler.add(controller, strategy)
+        before = threading.active_count()
+        thread = threading.Thread(target=self.scheduler.run)
+        thread.start()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(threads), 1)
+        self.assertEqual(threading.active_count(), before)
+        self.assertFalse(any(c.relays[0].status for c in controllers))
+        self.assertFalse(EXIT_EVENT.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
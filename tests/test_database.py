@@ -0,0 +1,210 @@
+import os
+import shutil
+import socket
+import unittest
+import tempfile
+import subprocess
+from unittest import mock
+import numpy as np
+import pandas as pd
+from src.storage import PartitionedStore
+from src.utilities._general import MyConfigParser
+
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+    import src.database
+    from src.database import (Ingestor, Sync, ingest_file, read_query, load_query, to_prepared, execute_prepared,
+                              stream_readings, get_connection_kwargs)
+except ImportError:
+    psycopg2 = None
+
+POSTGRES_AVAILABLE = psycopg2 is not None and shutil.which("initdb") is not None and shutil.which("pg_ctl") is not None
+if os.environ.get("REQUIRE_POSTGRES") and not POSTGRES_AVAILABLE:
+    # `make test-db` must fail instead of skipping the tests that need a server
+    raise RuntimeError("REQUIRE_POSTGRES is set, but psycopg2, initdb or pg_ctl is missing.")
+
+
+def make_readings(periods=10, start="2026-10-18"):
+    return pd.DataFrame({"site": "home",
+                         "taken_at": pd.date_range(start, periods=periods, freq="min"),
+                         "sensor": "DHT22",
+                         "variable": "temperature",
+                         "unit": "C",
+                         "value": np.arange(periods, dtype=float)})
+
+
+def get_free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+@unittest.skipUnless(psycopg2 is not None, "needs psycopg2")
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # nothing listens on this port, every connection fails
+        self.pool = ThreadedConnectionPool(0, 1, host="localhost", port=get_free_port(), dbname="none",
+                                           connect_timeout=1)
+        self.ingestor = Ingestor(spool_dir=self.tmp.name, retries=2, backoff=0, pool=self.pool)
+
+    def tearDown(self):
+        self.pool.closeall()
+        self.tmp.cleanup()
+
+    def test_unreachable_database(self):
+        self.assertEqual(self.ingestor.ingest(make_readings()), 0)
+        self.assertEqual(self.ingestor.ingest(make_readings()), 0)
+        self.assertEqual(len(self.ingestor.get_spooled()), 2)
+
+
+@unittest.skipUnless(psycopg2 is not None, "needs psycopg2")
+class TestQueries(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.tmp.name, "query.sql")
+        with open(self.file_name, "w") as f:
+            f.write("select 1")
+        patcher = mock.patch.object(src.database, "QUERY_PATH", self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cache(self):
+        with self.subTest("file is read once"), mock.patch("builtins.open", wraps=open) as opened:
+            self.assertEqual(load_query("query"), "select 1")
+            self.assertEqual(load_query("query.sql"), "select 1")
+            self.assertEqual(opened.call_count, 1)
+        with self.subTest("modified file is read again"):
+            with open(self.file_name, "w") as f:
+                f.write("select 2")
+            os.utime(self.file_name, ns=(0, os.stat(self.file_name).st_mtime_ns + 1))
+            self.assertEqual(load_query("query"), "select 2")
+
+    def test_connect_timeout(self):
+        with open(self.file_name, "w") as f:
+            f.write("[DATABASE]\ndatabase = dev\nport = 5432\nhost = localhost\nuser = dev\npassword =\n")
+        with mock.patch.object(src.database, "CONFIG", MyConfigParser(self.file_name)):
+            self.assertEqual(get_connection_kwargs()["connect_timeout"], 10)
+
+    def test_to_prepared(self):
+        sql, names = to_prepared("select %(a)s, %(b)s where x = %(a)s and y like 'z%%'")
+        self.assertEqual(sql, "select $1, $2 where x = $1 and y like 'z%'")
+        self.assertEqual(names, ["a", "b"])
+
+
+@unittest.skipUnless(POSTGRES_AVAILABLE, "needs psycopg2 and a local PostgreSQL installation")
+class TestIngestion(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.data_dir = os.path.join(cls.tmp.name, "db")
+        cls.port = get_free_port()
+        subprocess.run(["initdb", "-D", cls.data_dir, "-A", "trust", "-U", "postgres"], check=True,
+                       capture_output=True)
+        subprocess.run(["pg_ctl", "start", "-w", "-D", cls.data_dir, "-l", os.path.join(cls.tmp.name, "log"),
+                        "-o", f"-p {cls.port} -k {cls.tmp.name} -c listen_addresses=''"], check=True,
+                       capture_output=True)
+        cls.connection_kwargs = {"host": cls.tmp.name, "port": cls.port, "user": "postgres", "dbname": "postgres"}
+        with psycopg2.connect(**cls.connection_kwargs) as conn:
+            with conn.cursor() as cur:
+                cur.execute(read_query("create_tables"))
+                # migrations must apply to up to date tables as well
+                cur.execute(read_query("migrate_raw_sensor_readings"))
+
+    @classmethod
+    def tearDownClass(cls):
+        subprocess.run(["pg_ctl", "stop", "-D", cls.data_dir, "-m", "immediate"], capture_output=True)
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.spool_dir = tempfile.TemporaryDirectory()
+        self.pool = ThreadedConnectionPool(0, 2, **self.connection_kwargs)
+        self.ingestor = Ingestor(spool_dir=self.spool_dir.name, retries=2, backoff=0, pool=self.pool)
+        self.execute("truncate raw_sensor_readings, sync_offsets")
+
+    def tearDown(self):
+        self.pool.closeall()
+        self.spool_dir.cleanup()
+
+    def execute(self, sql):
+        with psycopg2.connect(**self.connection_kwargs) as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                return cur.fetchall() if cur.description else None
+
+    def test_ingest(self):
+        readings = make_readings().assign(value=lambda x: x.value.where(x.value > 0))
+        self.assertEqual(self.ingestor.ingest(readings), len(readings))
+        self.assertEqual(self.execute("select count(*), count(value) from raw_sensor_readings"), [(10, 9)])
+
+    def test_ingest_file(self):
+        path = os.path.join(self.spool_dir.name, "readings.csv")
+        make_readings(periods=25).to_csv(path, index=False)
+        self.assertEqual(ingest_file(path, batch_size=10, ingestor=self.ingestor), 25)
+        self.assertEqual(self.execute("select count(*) from raw_sensor_readings"), [(25,)])
+
+    def test_spool_is_loaded_first(self):
+        self.ingestor._spool(make_readings(periods=3))
+        self.assertEqual(self.ingestor.ingest(make_readings(periods=5)), 5)
+        self.assertEqual(self.ingestor.get_spooled(), [])
+        self.assertEqual(self.execute("select count(*) from raw_sensor_readings"), [(8,)])
+
+    def test_sync(self):
+        path = os.path.join(self.spool_dir.name, "readings.csv")
+        make_readings(periods=25).to_csv(path, index=False)
+        sync = Sync(path, batch_size=10, pool=self.pool)
+        with self.subTest("all readings are synced once"):
+            self.assertEqual(sync.sync(), 25)
+            self.assertEqual(sync.sync(), 0)
+        with self.subTest("only appended readings are synced"):
+            make_readings(periods=5, start="2026-10-19").to_csv(path, mode="a", index=False, header=False)
+            self.assertEqual(sync.sync(), 5)
+        with self.subTest("timestamps keep the time of day"):
+            self.assertEqual(self.execute("select count(*), count(distinct taken_at) from raw_sensor_readings"),
+                             [(30, 30)])
+
+    def test_interrupted_sync(self):
+        path = os.path.join(self.spool_dir.name, "readings.store")
+        store = PartitionedStore(path)
+        store.write(make_readings(periods=25))
+        store.close()
+        sync = Sync(path, batch_size=10, pool=self.pool)
+        commit = sync._commit
+        calls = []
+
+        def fail_on_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise psycopg2.OperationalError("connection lost")
+            return commit(*args)
+
+        with mock.patch.object(sync, "_commit", side_effect=fail_on_second_batch):
+            self.assertRaises(psycopg2.OperationalError, sync.sync)
+        self.assertEqual(self.execute("select count(*) from raw_sensor_readings"), [(10,)])
+        self.assertEqual(sync.sync(), 15)
+        self.assertEqual(self.execute("select count(*), count(distinct value) from raw_sensor_readings"), [(25, 25)])
+
+    def test_prepared_statements(self):
+        self.ingestor.ingest(make_readings())
+        sql = "select count(*) from raw_sensor_readings where value >= %(value)s"
+        with self.pool.getconn() as conn:
+            with conn.cursor() as cur:
+                for value, expected in (0, 10), (5, 5):
+                    execute_prepared(cur, sql, {"value": value})
+                    self.assertEqual(cur.fetchall(), [(expected,)])
+                cur.execute("select count(*) from pg_prepared_statements")
+                self.assertEqual(cur.fetchall(), [(1,)])
+
+    def test_stream_readings(self):
+        self.ingestor.ingest(make_readings(periods=25))
+        chunks = list(stream_readings(start="2026-10-18 00:05", chunksize=10, pool=self.pool))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10])
+        self.assertEqual(chunks[0].taken_at.min(), pd.Timestamp("2026-10-18 00:05"))
+
+
+if __name__ == '__main__':
+    unittest.main()
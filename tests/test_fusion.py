@@ -0,0 +1,69 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+from src.components import Sensor, SensorArray, SensorFusion, get_fusion_weights
+from src.utilities._general import MyConfigParser
+
+
+class FakeDevice:
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+
+class SCD30(Sensor):
+    def __init__(self, co2=800., temperature=21.):
+        super(SCD30, self).__init__(site="test")
+        self.var2unit = {"CO2": "ppm", "temperature": "C"}
+        self.device = FakeDevice({"CO2": co2, "temperature": temperature})
+
+
+class DHT22(Sensor):
+    def __init__(self, temperature=21.):
+        super(DHT22, self).__init__(site="test")
+        self.var2unit = {"temperature": "C"}
+        self.device = FakeDevice({"temperature": temperature})
+
+
+class TestFusion(unittest.TestCase):
+    def test_plan(self):
+        fusion = SensorFusion([SCD30(), DHT22()], weights={("DHT22", "temperature"): 0})
+        with self.subTest("sensors are found under their own name of the variable"):
+            self.assertEqual(fusion.get_plan("co2")[:2], ([0], ["CO2"]))
+        with self.subTest("sensors with weight 0 are left out"):
+            self.assertEqual(fusion.get_plan("temperature")[:2], ([0], ["temperature"]))
+        with self.subTest("unknown variables have no sensors"):
+            self.assertEqual(fusion.get_plan("pressure")[0], [])
+            self.assertTrue(np.isnan(fusion.fuse("pressure", [])))
+
+    def test_weighted_mean(self):
+        fusion = SensorFusion([SCD30(), DHT22()], weights={("SCD30", "temperature"): 3})
+        self.assertEqual(fusion.fuse("temperature", [20., 24.]), 21.)
+
+    def test_rejection(self):
+        fusion = SensorFusion([DHT22(), DHT22(), DHT22(), DHT22()])
+        with self.subTest("missing readings"):
+            self.assertEqual(fusion.fuse("temperature", [20., np.nan, 22., np.nan]), 21.)
+            self.assertTrue(np.isnan(fusion.fuse("temperature", [np.nan] * 4)))
+        with self.subTest("outliers"):
+            self.assertEqual(fusion.fuse("temperature", [20., 21., 22., 85.]), 21.)
+        with self.subTest("small differences of sensors that agree"):
+            self.assertAlmostEqual(fusion.fuse("temperature", [21., 21., 21., 21.1]), 21.025)
+
+    def test_sensor_array(self):
+        sensor_array = SensorArray([SCD30(temperature=20.), DHT22(temperature=22.), DHT22(temperature=None)],
+                                   retries=1, delay=0)
+        self.assertEqual(sensor_array.read("temperature"), 21.)
+        self.assertEqual(sensor_array.read("co2"), 800.)
+
+    def test_config(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "config.ini")
+            with open(path, "w") as f:
+                f.write("[FUSION]\nweight_scd30_co2 = 2\nweight_bh1750_light_intensity = 0\nmax_deviation = 3\n")
+            config = MyConfigParser(path)
+            self.assertEqual(get_fusion_weights(config), {("SCD30", "co2"): 2., ("BH1750", "light_intensity"): 0.})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import io
+import os
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from src.utilities import ReadingBatch, Record
+from src.storage import PartitionedStore, to_records, from_records
+
+
+def make_batch(values=(21., None, 800.), taken_at=1_792_000_000_000_000_000):
+    return ReadingBatch.from_values("home", "SCD30", ["temperature", "relative_humidity", "co2"], ["C", "%", "ppm"],
+                                    list(values), taken_at=taken_at)
+
+
+class TestReadingBatch(unittest.TestCase):
+    def test_values(self):
+        batch = ReadingBatch.concat([make_batch(), make_batch(values=(22., 80., 900.))])
+        self.assertEqual(len(batch), 6)
+        with self.subTest("failed reads are nan"):
+            self.assertTrue(np.isnan(batch.value[1]))
+            self.assertIsNone(batch[1].value)
+        with self.subTest("variables are renamed like in `Record`"):
+            self.assertEqual(batch[1].variable, Record("home", "SCD30", "relative_humidity", "%", None).variable)
+        with self.subTest("single readings print like `Record`s"):
+            record = Record("home", "SCD30", "co2", "ppm", 800., taken_at=batch[2].taken_at)
+            self.assertEqual(str(batch[2]), str(record))
+
+    def test_frame(self):
+        frame = make_batch().to_frame()
+        self.assertEqual(list(frame.columns), ReadingBatch.columns)
+        self.assertEqual(list(frame.variable), ["temperature", "humidity", "co2"])
+        self.assertEqual(frame.taken_at[0], pd.Timestamp(1_792_000_000_000_000_000))
+        self.assertTrue(frame.value.isna()[1])
+
+        buffer = io.StringIO()
+        make_batch().to_csv(buffer)
+        buffer.seek(0)
+        pd.testing.assert_frame_equal(pd.read_csv(buffer, parse_dates=["taken_at"]), frame, check_dtype=False,
+                                      check_categorical=False)
+
+    def test_storage(self):
+        batch = make_batch()
+        expected = from_records(to_records(batch.to_frame()))
+        pd.testing.assert_frame_equal(from_records(to_records(batch)), expected)
+        with tempfile.TemporaryDirectory() as path:
+            store = PartitionedStore(os.path.join(path, "readings"))
+            store.write(batch)
+            store.write(ReadingBatch.concat([]))
+            pd.testing.assert_frame_equal(store.read().reset_index(drop=True), expected, check_dtype=False)
+
+    def test_files(self):
+        batch = make_batch(taken_at=1_792_000_000_123_456_000)
+        frame = batch.to_frame()
+        with self.subTest("csv is written like the frame's csv"):
+            self.assertEqual(batch.to_csv(header=False).splitlines()[1],
+                             "home,2026-10-14 17:46:40.123456,SCD30,humidity,%,")
+            pd.testing.assert_frame_equal(pd.read_csv(io.StringIO(batch.to_csv()), parse_dates=["taken_at"]),
+                                          pd.read_csv(io.StringIO(frame.to_csv(index=False)), parse_dates=["taken_at"]))
+        with self.subTest("parquet reads back as the frame"):
+            with tempfile.TemporaryDirectory() as path:
+                batch.to_parquet(os.path.join(path, "readings.parquet"))
+                pd.testing.assert_frame_equal(pd.read_parquet(os.path.join(path, "readings.parquet")), frame,
+                                              check_categorical=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import sys
+import time
+import types
+import threading
+import unittest
+from unittest import mock
+from src.components import Sensor, SensorArray, Schedule
+from src.components._hardware import Buses
+from src.utilities import EXIT_EVENT
+
+
+class FakeDevice:
+    def __init__(self, seconds, failures=0):
+        self.seconds = seconds
+        self.failures = failures
+        self.reads = 0
+        self.value_read = 1.
+
+    @property
+    def value(self):
+        self.reads += 1
+        time.sleep(self.seconds)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("checksum did not validate.")
+        return self.value_read
+
+
+class FakeSensor(Sensor):
+    def __init__(self, bus, seconds, failures=0, interval=None):
+        super(FakeSensor, self).__init__(site="test", interval=interval)
+        self.var2unit = {"value": "unit"}
+        self.device = FakeDevice(seconds, failures)
+        self.bus = bus
+
+
+class TestSensorArray(unittest.TestCase):
+    def test_concurrent(self):
+        sensors = [FakeSensor("I2C", 0.1), FakeSensor("I2C", 0.1), FakeSensor("D4", 0.2), FakeSensor(None, 0.2)]
+        sensor_array = SensorArray(sensors, concurrent=True)
+        start = time.monotonic()
+        readings = sensor_array.take_sensor_readings()
+        elapsed = time.monotonic() - start
+
+        with self.subTest("sweep takes as long as the slowest bus"):
+            self.assertLess(elapsed, 0.35)
+        with self.subTest("readings keep the order of the sensors"):
+            self.assertEqual(len(readings), len(sensors))
+            self.assertTrue((readings.value == 1.).all())
+
+    def test_shared_i2c(self):
+        class FakeI2C:
+            def __init__(self, scl, sda, frequency):
+                self.frequency = frequency
+                self.locked = False
+
+            def try_lock(self):
+                self.locked, was_locked = True, self.locked
+                return not was_locked
+
+            def unlock(self):
+                self.locked = False
+
+            def deinit(self):
+                pass
+
+        modules = {"board": types.SimpleNamespace(SCL="SCL", SDA="SDA"), "busio": types.SimpleNamespace(I2C=FakeI2C)}
+        with mock.patch.dict(sys.modules, modules):
+            buses = Buses()
+            bus = buses.get_i2c()
+            with self.subTest("devices on the same pins share one bus at the lowest frequency"):
+                self.assertIs(buses.get_i2c(frequency=50_000), bus)
+                self.assertIs(buses.get_i2c(), bus)
+                self.assertEqual(bus.frequency, 50_000)
+            with self.subTest("the bus is locked for all devices at once"):
+                self.assertTrue(bus.try_lock())
+                self.assertFalse(buses.get_i2c().try_lock())
+                bus.unlock()
+                self.assertTrue(bus.try_lock())
+                bus.unlock()
+
+    def test_timeout(self):
+        sensor = FakeSensor(None, 0, failures=10)
+        start = time.monotonic()
+        readings = sensor.read_all(retries=10, delay=0.05, timeout=0.12)
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertIsNone(readings[0].value)
+
+    def test_schedule(self):
+        schedule = Schedule([1, 2], start=0)
+        with self.subTest("jobs due at the same time are popped together"):
+            self.assertEqual(schedule.pop(), (0, [0, 1]))
+        with self.subTest("slow jobs don't shift the schedule"):
+            schedule.push(0, [0, 1], now=0.4)
+            self.assertEqual(schedule.pop(), (1, [0]))
+        with self.subTest("missed slots are skipped"):
+            schedule.push(1, [0], now=3.5)
+            self.assertEqual(schedule.pop(), (2, [1]))
+            self.assertEqual(schedule.pop(), (4, [0]))
+
+    def test_intervals(self):
+        sensors = [FakeSensor(None, 0, interval=0.05), FakeSensor(None, 0, interval=0.2)]
+        sensor_array = SensorArray(sensors, delay=1)
+        timer = threading.Timer(0.5, EXIT_EVENT.set)
+        timer.start()
+        try:
+            sensor_array.read_all()
+        finally:
+            EXIT_EVENT.clear()
+        self.assertGreaterEqual(sensors[0].device.reads, 8)
+        self.assertLessEqual(sensors[1].device.reads, 4)
+
+    def test_zero_interval(self):
+        sensors = [FakeSensor(None, 0, interval=0), FakeSensor(None, 0)]
+        sensor_array = SensorArray(sensors, delay=0)
+        timer = threading.Timer(0.2, EXIT_EVENT.set)
+        timer.start()
+        try:
+            sensor_array.read_all()
+        finally:
+            EXIT_EVENT.clear()
+        self.assertLessEqual(sensors[0].device.reads, 0.2 / 0.01 + 1)
+        self.assertGreater(sensors[1].device.reads, 1)
+
+    def test_logging(self):
+        sensors = [FakeSensor(None, 0, failures=1), FakeSensor(None, 0)]
+        sensors[1].device.value_read = 0.
+        sensor_array = SensorArray(sensors, retries=1)
+        with self.assertLogs("src.components._general", level="DEBUG") as logs:
+            sensor_array.take_sensor_readings()
+        self.assertIn("could not read value on sensor FakeSensor", "\n".join(logs.output))
+        self.assertIn("FakeSensor value: 0.00 unit", "\n".join(logs.output))
+
+    def test_cache(self):
+        sensors = [FakeSensor("I2C", 0), FakeSensor("D4", 0)]
+        sensor_array = SensorArray(sensors, ttl={"value": 0.1})
+        sensor_array.take_sensor_readings()
+        with self.subTest("fresh values are read from the cache"):
+            sensor_array.read("value")
+            self.assertEqual([s.device.reads for s in sensors], [1, 1])
+        with self.subTest("stale values are read from the sensors"):
+            time.sleep(0.15)
+            sensor_array.read("value")
+            self.assertEqual([s.device.reads for s in sensors], [2, 2])
+
+        with self.subTest("stale values of flaky sensors are not retried past the timeout"):
+            sensors[0].device.failures = 10
+            time.sleep(0.15)
+            start = time.monotonic()
+            sensor_array.read("value", retries=10, delay=0.1)
+            self.assertLess(time.monotonic() - start, 0.15)
+
+    def test_bus_lock(self):
+        active, overlaps = [], []
+
+        class TrackedDevice(FakeDevice):
+            @property
+            def value(self):
+                active.append(self)
+                overlaps.append(len(active))
+                time.sleep(self.seconds)
+                active.remove(self)
+                return self.value_read
+
+        sensors = [FakeSensor("I2C", 0.05), FakeSensor("I2C", 0.05)]
+        for sensor in sensors:
+            sensor.device = TrackedDevice(0.05)
+        sensor_array = SensorArray(sensors, concurrent=True, ttl={"value": 0})
+        sweep = threading.Thread(target=sensor_array.take_sensor_readings)
+        sweep.start()
+        sensor_array.read("value")
+        sweep.join()
+        self.assertEqual(max(overlaps), 1)
+
+if __name__ == '__main__':
+    unittest.main()
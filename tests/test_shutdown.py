@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import signal
+import unittest
+import tempfile
+import subprocess
+import pandas as pd
+from src.utilities import get_abs_path
+
+# reads a sensor that keeps failing (waits between retries) and one that is read once an hour, while a controller keeps
+# its relay on for an hour, until SIGINT arrives
+CHILD = """
+import signal
+import threading
+from src.components import Sensor, SensorArray, Controller, Scheduler
+from src.utilities import interrupt_handler, EXIT_EVENT
+
+
+class Device:
+    temperature = 21.
+
+    @property
+    def humidity(self):
+        raise RuntimeError("checksum did not validate.")
+
+
+class FakeSensor(Sensor):
+    def __init__(self, var):
+        super().__init__(site="test", interval=3600)
+        self.var2unit = {{var: "C"}}
+        self.device = Device()
+        self.bus = var
+
+
+class FakeRelay:
+    def arm(self):
+        print("armed", flush=True)
+
+    def disarm(self):
+        print("disarmed", flush=True)
+
+
+def strategy(**kwargs):
+    print("ready", flush=True)
+    return True, 3600
+
+
+signal.signal(signal.SIGINT, interrupt_handler)
+array = SensorArray([FakeSensor("temperature"), FakeSensor("humidity")], out_path={out_path!r}, retries=100,
+                    delay=60, concurrent=True)
+sampler = threading.Thread(target=array.read_all, daemon=True)
+sampler.start()
+scheduler = Scheduler()
+scheduler.add(Controller([FakeRelay()], active_min=1, active_max=3600, delay=3600), strategy)
+# same as `scripts/main.py`
+try:
+    scheduler.run()
+    while sampler.is_alive() and not EXIT_EVENT.wait(0.5):
+        pass
+finally:
+    sampler.join(timeout=0.5)
+"""
+
+
+class TestShutdown(unittest.TestCase):
+    def test_sigint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out_path = os.path.join(tmp, "readings.csv")
+            process = subprocess.Popen([sys.executable, "-c", CHILD.format(out_path=out_path)], cwd=get_abs_path(),
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            try:
+                lines = []
+                while "ready" not in lines:
+                    lines.append(process.stdout.readline().strip())
+                # give the sensors time to take their first readings and to start waiting for the next retry
+                time.sleep(0.5)
+                start = time.monotonic()
+                process.send_signal(signal.SIGINT)
+                lines.extend(line.strip() for line in process.stdout)
+                process.wait(timeout=5)
+                latency = time.monotonic() - start
+            finally:
+                process.kill()
+
+            self.assertLess(latency, 1.)
+            self.assertEqual(lines[-1], "disarmed")
+            readings = pd.read_csv(out_path)
+            self.assertEqual(readings.value.notna().sum(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from analysis.simulate_yields import (Martha, MarthaArray, Recorder, StatusRecorder, simulate, simulate_vectorized,
+                                      harvest_after_j_weeks, remove_after_infection_or_k_flushes, summarize)
+
+
+def run(engine, simulation_mode="const", yield_decay_mode="linear", p_infection=0.25, replications=5, capacity=40,
+        weeks=30, blocks=8, seed=42, workers=1, **kwargs):
+    block_kwargs = {"simulation_mode": simulation_mode,
+                    "yield_decay_mode": yield_decay_mode,
+                    "bag_weight": 1000.,
+                    "max_lifetime_factor": 0.5,
+                    "mean_t_colonization": 6.,
+                    "mean_t_fruiting": 6.,
+                    "p_infection": p_infection}
+    return engine(replications=replications, capacity=capacity, weeks=weeks, blocks=blocks,
+                  harvest_strategy=harvest_after_j_weeks, harvest_kwargs={"j": 8},
+                  remove_strategy=remove_after_infection_or_k_flushes, remove_kwargs={"k": 3},
+                  block_kwargs=block_kwargs, seed=seed, workers=workers, **kwargs)
+
+
+class TestSimulation(unittest.TestCase):
+    def test_engines_agree(self):
+        for simulation_mode in "const", "random":
+            for yield_decay_mode in "linear", "exponential":
+                for capacity in None, 40:
+                    with self.subTest("compare engines", simulation_mode=simulation_mode,
+                                      yield_decay_mode=yield_decay_mode, capacity=capacity):
+                        kwargs = {"simulation_mode": simulation_mode,
+                                  "yield_decay_mode": yield_decay_mode,
+                                  "capacity": capacity}
+                        expected = run(simulate, **kwargs)
+                        actual = run(simulate_vectorized, **kwargs)
+                        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+
+    def test_lifetime_yield(self):
+        block_kwargs = {"yield_decay_mode": "linear", "bag_weight": 1000., "max_lifetime_factor": 0.5,
+                        "mean_t_colonization": 6., "mean_t_fruiting": 6., "p_infection": 0.}
+        for simulation_mode in "const", "random":
+            martha = Martha(block_kwargs={**block_kwargs, "simulation_mode": simulation_mode},
+                            rng=np.random.default_rng(0))
+            marthas = MarthaArray([np.random.default_rng(0)], slots=8, simulation_mode=simulation_mode,
+                                  **block_kwargs)
+            martha.insert_blocks(8)
+            marthas.insert_blocks(8)
+            weights = np.array([block.max_lifetime_yield for block in martha.contents])
+            with self.subTest("engines sample the same yields", simulation_mode=simulation_mode):
+                np.testing.assert_array_equal(weights, marthas.max_lifetime_yield[0])
+            with self.subTest("yields only vary in random mode", simulation_mode=simulation_mode):
+                self.assertEqual(len(np.unique(weights)) > 1, simulation_mode == "random")
+                self.assertAlmostEqual(weights.mean(), 500., delta=100.)
+
+    def test_seed(self):
+        for engine in simulate, simulate_vectorized:
+            with self.subTest("same seed, same result", engine=engine.__name__):
+                pd.testing.assert_frame_equal(run(engine, simulation_mode="random", seed=1),
+                                              run(engine, simulation_mode="random", seed=1))
+            with self.subTest("different seed, different result", engine=engine.__name__):
+                self.assertFalse(run(engine, simulation_mode="random", seed=1)
+                                 .equals(run(engine, simulation_mode="random", seed=2)))
+
+    def test_workers(self):
+        for engine in simulate, simulate_vectorized:
+            with self.subTest("result does not depend on number of workers", engine=engine.__name__):
+                expected = run(engine, simulation_mode="random", workers=1)
+                actual = run(engine, simulation_mode="random", workers=3)
+                pd.testing.assert_frame_equal(expected, actual)
+
+    def test_streaming(self):
+        for engine in simulate, simulate_vectorized:
+            with self.subTest("chunks on disk hold the same rows", engine=engine.__name__), \
+                    tempfile.TemporaryDirectory() as path:
+                expected = run(engine, simulation_mode="random")
+                chunks = run(engine, simulation_mode="random", path=path, rows_per_chunk=1000)
+                self.assertGreater(len(list(chunks)), 1)
+                pd.testing.assert_frame_equal(expected.sort_values(["replication", "week", "block_id"],
+                                                                   ignore_index=True),
+                                              chunks.to_frame().sort_values(["replication", "week", "block_id"],
+                                                                            ignore_index=True))
+
+                pd.testing.assert_frame_equal(summarize(expected), summarize(chunks))
+
+    def test_summarize(self):
+        data = run(simulate, simulation_mode="random")
+        summary = summarize(data)
+        expected = (data
+                    .groupby(["replication", "week"])
+                    .agg({"harvested": "sum", "fruit_weight": "sum", "block_id": "nunique", "infected": "sum"})
+                    .reset_index())
+        pd.testing.assert_series_equal(summary.harvested, expected.harvested)
+        pd.testing.assert_series_equal(summary.number_of_blocks, expected.block_id, check_names=False)
+        pd.testing.assert_series_equal(summary.number_of_infected_blocks, expected.infected, check_names=False)
+
+    def test_summary_only(self):
+        for engine in simulate, simulate_vectorized:
+            with self.subTest("online summaries equal summaries of block states", engine=engine.__name__):
+                expected = summarize(run(engine, simulation_mode="random"))
+                actual = run(engine, simulation_mode="random", summary_only=True, workers=2)
+                pd.testing.assert_frame_equal(expected, actual)
+
+    def test_no_blocks(self):
+        for engine in simulate, simulate_vectorized:
+            with self.subTest("weeks without living blocks record no rows", engine=engine.__name__):
+                self.assertEqual(len(run(engine, blocks=0)), 0)
+            with self.subTest("online summaries skip the same weeks", engine=engine.__name__):
+                expected = summarize(run(engine, blocks=0))
+                actual = run(engine, blocks=0, summary_only=True)
+                self.assertEqual(len(actual), 0)
+                pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_index_type=False)
+
+    def test_recorder(self):
+        with self.subTest("chunks are no larger than the rows a recorder can receive"):
+            recorder = StatusRecorder(max_rows=10)
+            recorder.append(replication=0, week=0, block_id=np.arange(3), substrate_weight=1., age=0, phase=0,
+                            infected=False, flush=0, fruit_weight=0., harvested=0.)
+            self.assertEqual(len(recorder.buffers["block_id"]), 10)
+            self.assertEqual(len(recorder.result()), 3)
+        with self.subTest("incomplete recorders fail when they are created"):
+            self.assertRaises(TypeError, type("Incomplete", (Recorder,), {"append": lambda self, **columns: None}))
+
+    def test_remove_blocks(self):
+        block_kwargs = {"simulation_mode": "const",
+                        "yield_decay_mode": "linear",
+                        "bag_weight": 1000.,
+                        "max_lifetime_factor": 0.5,
+                        "mean_t_colonization": 6.,
+                        "mean_t_fruiting": 6.,
+                        "p_infection": 0.25}
+        martha = Martha(capacity=10, block_kwargs=block_kwargs)
+        marthas = MarthaArray([np.random.default_rng(i) for i in range(3)], slots=4, capacity=10, **block_kwargs)
+        for m in martha, marthas:
+            with self.subTest("remove every matching block", martha=type(m).__name__):
+                m.insert_blocks(8)
+                m.remove_blocks(lambda b: b.flush == 0)
+                self.assertTrue(np.all(m.get_total_number_of_blocks() == 0))
+
+            with self.subTest("refill empty slots up to capacity", martha=type(m).__name__):
+                m.insert_blocks(8)
+                m.insert_blocks(8)
+                self.assertTrue(np.all(m.get_total_number_of_blocks() == 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
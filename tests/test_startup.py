@@ -0,0 +1,13 @@
+import unittest
+from scripts.benchmark_startup import MODULES, time_import
+
+
+class TestStartup(unittest.TestCase):
+    def test_no_hardware_on_import(self):
+        for module in MODULES:
+            with self.subTest("importing does not need the board", module=module):
+                self.assertEqual(time_import(module, runs=1)["hardware"], "")
+
+
+if __name__ == '__main__':
+    unittest.main()
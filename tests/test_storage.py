@@ -0,0 +1,178 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from src.storage import (PartitionedStore, CsvFile, READING_DTYPE, ReadingsTail, Rollups, TIERS, read_readings,
+                         migrate_csv, open_storage, get_tier, get_rollups_path, rebuild_rollups)
+
+
+def make_readings(start="2026-10-17 20:00", periods=10, freq="2h"):
+    return pd.DataFrame({"site": "home",
+                         "taken_at": pd.date_range(start, periods=periods, freq=freq),
+                         "sensor": "DHT22",
+                         "variable": "temperature",
+                         "unit": "C",
+                         "value": np.arange(periods, dtype=float)})
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "readings.store")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_readings_equal(self, left, right):
+        pd.testing.assert_frame_equal(left.reset_index(drop=True), right.reset_index(drop=True), check_dtype=False)
+
+    def test_partitions(self):
+        readings = make_readings()
+        for freq, number_of_partitions in ("D", 2), ("H", 10):
+            with self.subTest("one file per period", freq=freq):
+                store = PartitionedStore(os.path.join(self.path, freq), freq=freq)
+                store.write(readings)
+                self.assertEqual(len(store.get_partitions()), number_of_partitions)
+                self.assert_readings_equal(store.read(), readings)
+
+    def test_time_range(self):
+        store = PartitionedStore(self.path)
+        store.write(make_readings())
+        start, end = pd.Timestamp("2026-10-18 01:00"), pd.Timestamp("2026-10-18 09:00")
+        with self.subTest("only overlapping partitions are read"):
+            self.assertEqual(len(store.get_partitions(start=start)), 1)
+        with self.subTest("readings are filtered to the range"):
+            expected = make_readings().loc[lambda x: (x.taken_at >= start) & (x.taken_at <= end)]
+            self.assert_readings_equal(store.read(start, end), expected)
+
+    def test_store_detection(self):
+        with self.subTest("paths without an extension are csv files unless they are directories"):
+            self.assertIsInstance(open_storage(os.path.join(self.tmp.name, "decisions")), CsvFile)
+            self.assertIsInstance(open_storage(self.tmp.name), PartitionedStore)
+            self.assertIsInstance(open_storage(self.path), PartitionedStore)
+        with self.subTest("reading a missing store doesn't create it"):
+            self.assertTrue(read_readings(self.path).empty)
+            ReadingsTail(self.path).update()
+            self.assertFalse(os.path.exists(self.path))
+
+    def test_truncated_record(self):
+        store = PartitionedStore(self.path)
+        store.write(make_readings(periods=3, freq="min"))
+        with open(store.get_partitions()[0], "ab") as f:
+            f.write(b"\0" * (READING_DTYPE.itemsize // 2))
+        self.assertEqual(len(store.read()), 3)
+
+    def test_migrate(self):
+        csv_path = os.path.join(self.tmp.name, "readings.csv")
+        readings = make_readings()
+        csv = open_storage(csv_path)
+        csv.write(readings.iloc[:4])
+        csv.write(readings.iloc[4:])
+        csv.close()
+
+        self.assertEqual(migrate_csv(csv_path, self.path, chunksize=3), len(readings))
+        self.assert_readings_equal(read_readings(self.path), read_readings(csv_path))
+
+    def test_tail(self):
+        readings = make_readings(periods=100, freq="37s").assign(value=lambda x: x.value.where(x.value % 7 > 0))
+        window = pd.Timedelta(minutes=20)
+        csv_path = os.path.join(self.tmp.name, "readings.csv")
+        for path in csv_path, self.path:
+            with self.subTest("window and averages equal a full read", storage=type(open_storage(path)).__name__):
+                storage = open_storage(path)
+                tail = ReadingsTail(path, window=window)
+                for start in range(0, 100, 30):
+                    storage.write(readings.iloc[start:start + 30])
+                    self.assertEqual(tail.update(), len(readings.iloc[start:start + 30]))
+                    self.assertEqual(tail.update(), 0)
+                storage.close()
+
+                data = read_readings(path)
+                start = data.taken_at.max() - window
+                self.assert_readings_equal(tail.get_readings(), data.loc[data.taken_at > start])
+                expected = (data
+                            .assign(taken_at=lambda x: x.taken_at.dt.round("min"))
+                            .groupby(["taken_at", "site", "variable", "unit"])
+                            .value
+                            .mean()
+                            .reset_index()
+                            .loc[lambda x: x.taken_at > start])
+                self.assert_readings_equal(tail.get_averages(), expected)
+
+    def test_rollups(self):
+        readings = (pd.concat([make_readings(periods=500, freq="7min"),
+                               make_readings(periods=500, freq="7min").assign(sensor="SCD30", value=lambda x: -x.value)])
+                    .assign(value=lambda x: x.value.where(x.value % 11 > 0)))
+        # the readings of the second sensor arrive after the buckets of the first one were closed
+        batches = [readings.iloc[i:i + 150] for i in range(0, len(readings), 150)]
+        for batch in batches:
+            storage = open_storage(self.path)
+            storage.write(batch)
+            # reopening continues with the open buckets of the previous run
+            storage.close()
+
+        rollups = Rollups(get_rollups_path(self.path))
+        data = readings.loc[readings.value.notna()]
+        for tier, (resolution, _) in TIERS.items():
+            with self.subTest("tiers equal an aggregation of the raw readings", tier=tier):
+                expected = (data
+                            .sort_values("taken_at", kind="stable")
+                            .assign(taken_at=lambda x: x.taken_at.dt.floor(resolution))
+                            .groupby(["taken_at", "site", "sensor", "variable", "unit"])
+                            .value
+                            .agg(["count", "min", "max", "mean", "last"])
+                            .reset_index())
+                actual = rollups.read(tier)[expected.columns]
+                self.assert_readings_equal(actual, expected)
+
+            with self.subTest("range of a tier", tier=tier):
+                start, end = pd.Timestamp("2026-10-18 03:30"), pd.Timestamp("2026-10-19 12:00")
+                actual = rollups.read(tier, start, end)
+                self.assertGreaterEqual(actual.taken_at.min(), start.floor(resolution))
+                self.assertLessEqual(actual.taken_at.max(), end)
+
+            with self.subTest("rebuilt tiers equal the incremental ones", tier=tier):
+                rebuilt = Rollups(rebuild_rollups(self.path)).read(tier)
+                self.assert_readings_equal(rebuilt.drop(columns="last_at"), rollups.read(tier).drop(columns="last_at"))
+
+        with self.subTest("finest tier with few buckets"):
+            self.assertEqual(get_tier("2026-10-01", "2026-10-02"), "1min")
+            self.assertEqual(get_tier("2026-10-01", "2026-11-01"), "1h")
+            self.assertEqual(get_tier("2025-10-01", "2026-10-01"), "1d")
+
+    def test_tail_partial_row(self):
+        csv_path = os.path.join(self.tmp.name, "readings.csv")
+        make_readings(periods=3).to_csv(csv_path, index=False)
+        with open(csv_path, "a") as f:
+            f.write("home,2026-10-18 02:00:00,DH")
+        tail = ReadingsTail(csv_path)
+        self.assertEqual(tail.update(), 3)
+        with open(csv_path, "a") as f:
+            f.write("T22,temperature,C,3.0\n")
+        self.assertEqual(tail.update(), 1)
+
+    def test_tail_seek(self):
+        csv_path = os.path.join(self.tmp.name, "readings.csv")
+        readings = make_readings(periods=20_000, freq="min")
+        window = pd.Timedelta(hours=1)
+        readings.to_csv(csv_path, index=False)
+        for path in csv_path, self.path:
+            if path == self.path:
+                PartitionedStore(self.path).write(readings)
+            with self.subTest("the first update only reads the window", storage=type(open_storage(path)).__name__):
+                tail = ReadingsTail(path, window=window)
+                self.assertLess(tail.update(), 2 * 24 * 60)
+                start = readings.taken_at.max() - window
+                self.assert_readings_equal(tail.get_readings(), readings.loc[readings.taken_at > start])
+
+        with self.subTest("a csv file that got shorter is tailed again"):
+            tail = ReadingsTail(csv_path, window=window)
+            tail.update()
+            readings.iloc[:100].to_csv(csv_path, index=False)
+            self.assertGreater(tail.update(), 0)
+            self.assert_readings_equal(tail.get_readings(), readings.iloc[40:100])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import unittest
+import tempfile
+from unittest import mock
+import pandas as pd
+from analysis import sweep_yields
+from analysis.sweep_yields import ResultCache, get_setting, expand_grid, sweep
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(self.tmp.name)
+        self.grid = {"capacity": [20, 40], "engine": ["vectorized"], "replications": [3], "weeks": [10]}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_settings(self):
+        with self.subTest("values are converted to the types of `simulate_yields.py`"):
+            self.assertEqual(get_setting(capacity="40", seed="1"), get_setting(capacity=40, seed=1))
+            self.assertEqual(self.cache.get_key(get_setting(capacity="40", seed="1")),
+                             self.cache.get_key(get_setting(capacity=40, seed=1)))
+        with self.subTest("seed is part of the key"):
+            self.assertNotEqual(self.cache.get_key(get_setting(seed=1)), self.cache.get_key(get_setting(seed=2)))
+        with self.subTest("settings need a seed"):
+            self.assertRaises(ValueError, get_setting, capacity=40)
+        with self.subTest("grid expands to all combinations"):
+            settings = expand_grid({"capacity": [20, 40], "blocks": [4, 8]}, [{"seed": 1}, {"seed": 2}])
+            self.assertEqual(len(settings), 8)
+
+    def test_cache_hits_are_skipped(self):
+        settings = expand_grid(self.grid, [{"seed": 1}])
+        with mock.patch.object(sweep_yields, "simulate_setting", wraps=sweep_yields.simulate_setting) as simulate:
+            expected = sweep(settings, self.cache)
+            self.assertEqual(simulate.call_count, 2)
+
+            actual = sweep(settings + expand_grid({**self.grid, "capacity": [60]}, [{"seed": 1}]), self.cache)
+            self.assertEqual(simulate.call_count, 3)
+
+        pd.testing.assert_frame_equal(expected, actual.iloc[:2])
+
+    def test_eviction(self):
+        summary = pd.DataFrame({"replication": range(1000), "harvested": 1.})
+        settings = [get_setting(seed=seed) for seed in range(3)]
+        self.cache.put(settings[0], summary)
+        size = self.cache.get_size()
+        self.cache.max_bytes = 2 * size
+
+        self.cache.put(settings[1], summary)
+        os.utime(self.cache._get_file_name(settings[0]), (1, 1))
+        os.utime(self.cache._get_file_name(settings[1]), (2, 2))
+        # reading a setting makes it the most recently used one
+        self.cache.get(settings[0])
+        self.cache.put(settings[2], summary)
+
+        self.assertIn(settings[0], self.cache)
+        self.assertNotIn(settings[1], self.cache)
+        self.assertIn(settings[2], self.cache)
+        self.assertLessEqual(self.cache.get_size(), self.cache.max_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import time
+import unittest
+import tempfile
+import pandas as pd
+from src.components import ReadingsWriter
+from src.utilities import EXIT_EVENT
+from src.storage import read_readings
+
+
+def make_readings(n, start=0):
+    return pd.DataFrame({"sensor": "DHT22", "variable": "temperature", "value": range(start, start + n)})
+
+
+class TestReadingsWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out_path = os.path.join(self.tmp.name, "readings.csv")
+
+    def tearDown(self):
+        EXIT_EVENT.clear()
+        self.tmp.cleanup()
+
+    def test_batches(self):
+        writer = ReadingsWriter(self.out_path, batch_size=10, flush_interval=60)
+        for i in range(3):
+            writer.write(make_readings(3, start=3 * i))
+        time.sleep(0.2)
+        with self.subTest("small batches wait in memory"):
+            self.assertEqual(os.path.getsize(self.out_path), 0)
+
+        writer.write(make_readings(3, start=9))
+        time.sleep(0.2)
+        with self.subTest("full batches are written"):
+            self.assertEqual(len(pd.read_csv(self.out_path)), 12)
+
+        writer.write(make_readings(1, start=12))
+        writer.close()
+        with self.subTest("closing writes the rest"):
+            pd.testing.assert_frame_equal(pd.read_csv(self.out_path), make_readings(13))
+
+    def test_interval(self):
+        writer = ReadingsWriter(self.out_path, batch_size=100, flush_interval=0.1)
+        writer.write(make_readings(2))
+        time.sleep(0.8)
+        self.assertEqual(len(pd.read_csv(self.out_path)), 2)
+        writer.close()
+
+    def test_exit_event(self):
+        writer = ReadingsWriter(self.out_path, batch_size=100, flush_interval=60)
+        writer.write(make_readings(5))
+        EXIT_EVENT.set()
+        time.sleep(0.8)
+        with self.subTest("queued frames are written right away on exit"):
+            self.assertEqual(len(pd.read_csv(self.out_path)), 5)
+        with self.subTest("frames written during the shutdown are kept as well"):
+            writer.write(make_readings(2, start=5))
+            writer.close()
+            self.assertFalse(writer.thread.is_alive())
+            self.assertEqual(len(pd.read_csv(self.out_path)), 7)
+
+        with self.subTest("appending to an existing file doesn't repeat the header"):
+            EXIT_EVENT.clear()
+            writer = ReadingsWriter(self.out_path, batch_size=100, flush_interval=60)
+            writer.write(make_readings(3, start=7))
+            writer.close()
+            pd.testing.assert_frame_equal(pd.read_csv(self.out_path), make_readings(10))
+
+    def test_failed_write(self):
+        path = os.path.join(self.tmp.name, "readings.store")
+        readings = pd.DataFrame({"site": "home", "taken_at": pd.Timestamp("2026-10-18"), "sensor": "DHT22",
+                                 "variable": "temperature", "unit": "C", "value": [1.]})
+        writer = ReadingsWriter(path, batch_size=1, flush_interval=60)
+        with self.assertLogs("src.components._general", level="ERROR"):
+            writer.write(readings.assign(site="a site with a name far longer than 32 bytes"))
+            time.sleep(0.8)
+        self.assertTrue(writer.thread.is_alive())
+        writer.write(readings)
+        writer.close()
+        self.assertEqual(len(read_readings(path)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()